@@ -2,42 +2,192 @@
 
 from __future__ import annotations
 
+import os
+import sys
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
 
 import numpy as np
+import pandas as pd
 import streamlit as st
 from PIL import Image
-from tensorflow.keras.applications.resnet50 import preprocess_input
-from tensorflow.keras.models import load_model
+
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parent))
+    import cache_predicoes  # type: ignore
+    import inferencia  # type: ignore
+else:  # pragma: no cover
+    from . import cache_predicoes, inferencia
+
+WORKERS_DECODIFICACAO = min(16, (os.cpu_count() or 1) * 2)
+
+
+def _artefato_atual() -> Optional[Tuple[str, str]]:
+    """Caminho e identidade do artefato que `inferencia.carregar_modelo` usaria agora."""
+
+    artefato = inferencia.resolver_artefato()
+    if artefato is None:
+        return None
+    return os.fspath(artefato), cache_predicoes.identidade_artefato(artefato)
+
+
+@st.cache_resource(max_entries=1)
+def _carregamento(artefato: str, identidade: str) -> Future:
+    """Começa a carregar e aquecer o modelo em segundo plano, uma vez por artefato.
+
+    A identidade entra na chave do cache do Streamlit: se o arquivo do modelo
+    mudar, a próxima execução do script dispara um novo carregamento.
+    """
+
+    futuro = inferencia.iniciar_carregamento(artefato)
+    futuro.add_done_callback(_registrar_partida)
+    return futuro
+
+
+@st.cache_resource
+def _abertura() -> dict:
+    """Marca o instante em que o processo atendeu a primeira sessão."""
+
+    return {"inicio": time.perf_counter()}
 
 
 @st.cache_resource
+def _cache_predicoes() -> cache_predicoes.CachePredicoes:
+    """Cache de predições compartilhado entre sessões (memória e, se configurado, disco)."""
+
+    return cache_predicoes.criar_cache()
+
+
 def carregar_modelo():
-    """Carrega o modelo treinado a partir do diretório models."""
+    """Carrega o modelo treinado a partir do diretório models (aguarda o carregamento em segundo plano)."""
+
+    atual = _artefato_atual()
+    modelo = _carregamento(*atual).result()[0] if atual else None
+    if modelo is None:
+        st.error("Modelo não encontrado. Execute o pipeline de treinamento primeiro.")
+    return modelo
+
+
+def _registrar_partida(futuro: Future) -> None:
+    """Imprime a partida a frio medida em segundo plano: carga, aquecimento e uma predição fixa."""
+
+    if futuro.cancelled() or futuro.exception() is not None:
+        return
+    _, tempos = futuro.result()
+    if "ate_primeira_predicao_s" in tempos:
+        print(
+            f"[app] Partida a frio: carga {tempos['carga_s']}s, aquecimento {tempos['aquecimento_s']}s, "
+            f"primeira predição {tempos['primeira_predicao_s']}s ({tempos['ate_primeira_predicao_s']}s no total)."
+        )
 
-    modelos_dir = Path(__file__).resolve().parents[1] / "models"
-    candidatos = [
-        modelos_dir / "model.h5",
-        modelos_dir / "best_model.h5",
-        modelos_dir / "model_resnet.h5",
-    ]
 
-    for caminho_modelo in candidatos:
-        if caminho_modelo.exists():
-            return load_model(caminho_modelo)
+def _registrar_primeira_resposta(abertura: dict) -> None:
+    """Na primeira análise do processo (cache, modelo local ou servidor), mede o tempo desde a abertura.
 
-    st.error("Modelo não encontrado. Execute o pipeline de treinamento primeiro.")
-    return None
+    Inclui o tempo que o usuário levou para enviar as imagens e clicar no botão.
+    """
+
+    if "primeira_resposta_s" not in abertura:
+        abertura["primeira_resposta_s"] = round(time.perf_counter() - abertura["inicio"], 3)
+        print(f"[app] Primeira resposta ao usuário {abertura['primeira_resposta_s']}s após a abertura.")
 
 
 def processar_imagem(imagem: Image.Image) -> np.ndarray:
     """Prepara a imagem no formato aceito pela ResNet-50."""
 
-    imagem_redimensionada = imagem.convert("RGB").resize((224, 224))
-    array_imagem = np.array(imagem_redimensionada, dtype="float32")
-    array_imagem = np.expand_dims(array_imagem, axis=0)
-    array_imagem = preprocess_input(array_imagem)
-    return array_imagem
+    return inferencia.processar_imagem(imagem)
+
+
+def _analisar(
+    dados: Sequence[bytes],
+    url_servidor: Optional[str],
+    cache: Optional[cache_predicoes.CachePredicoes],
+    atual: Optional[Tuple[str, str]],
+) -> Tuple[List[Optional[float]], List[Optional[str]]]:
+    """Calcula as probabilidades de vários exames de uma vez.
+
+    Localmente, consulta o cache, decodifica só as faltas em paralelo e as envia
+    ao modelo em uma única chamada (dividida apenas pelo limite de memória).
+    Com servidor, dispara as requisições em paralelo para que ele as agrupe.
+    """
+
+    probabilidades: List[Optional[float]] = [None] * len(dados)
+    erros: List[Optional[str]] = [None] * len(dados)
+
+    if url_servidor:
+        with ThreadPoolExecutor(max_workers=min(len(dados), WORKERS_DECODIFICACAO)) as executor:
+            futuros = [executor.submit(inferencia.predizer_remoto, conteudo, url_servidor) for conteudo in dados]
+        for indice, futuro in enumerate(futuros):
+            try:
+                probabilidades[indice] = futuro.result()
+            except Exception as erro:  # noqa: BLE001 - o erro vira uma linha da tabela
+                erros[indice] = str(erro)
+        return probabilidades, erros
+
+    faltas = []
+    for indice, conteudo in enumerate(dados):
+        probabilidades[indice] = cache.obter(conteudo, atual[1])
+        if probabilidades[indice] is None:
+            faltas.append(indice)
+    if not faltas:
+        return probabilidades, erros
+
+    def _decodificar(indice: int) -> Optional[np.ndarray]:
+        try:
+            return inferencia.decodificar_bytes(dados[indice])
+        except (OSError, ValueError) as erro:
+            erros[indice] = f"Imagem inválida: {erro}"
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(len(faltas), WORKERS_DECODIFICACAO)) as executor:
+        arrays = list(executor.map(_decodificar, faltas))
+    validos = [(indice, array) for indice, array in zip(faltas, arrays) if array is not None]
+    if not validos:
+        return probabilidades, erros
+
+    modelo = carregar_modelo()
+    if modelo is None:
+        return probabilidades, erros
+    calculadas = inferencia.predizer_arrays(modelo, [array for _, array in validos])
+    for (indice, _), probabilidade in zip(validos, calculadas.tolist()):
+        probabilidades[indice] = probabilidade
+        cache.guardar(dados[indice], atual[1], probabilidade)
+    return probabilidades, erros
+
+
+def _exibir_resultado(probabilidade: float) -> None:
+    classe = inferencia.classificar(probabilidade)
+    st.subheader(classe)
+
+    st.metric(
+        label="Probabilidade de Cardiomegalia",
+        value=f"{probabilidade * 100:.2f}%",
+    )
+
+    st.progress(min(max(probabilidade, 0.0), 1.0))
+
+
+def _exibir_tabela(
+    nomes: Sequence[str],
+    probabilidades: Sequence[Optional[float]],
+    erros: Sequence[Optional[str]],
+) -> None:
+    tabela = pd.DataFrame(
+        {
+            "Arquivo": nomes,
+            "Probabilidade de Cardiomegalia (%)": [
+                None if probabilidade is None else round(probabilidade * 100, 2) for probabilidade in probabilidades
+            ],
+            "Resultado": [
+                erro or ("" if probabilidade is None else inferencia.classificar(probabilidade))
+                for probabilidade, erro in zip(probabilidades, erros)
+            ],
+        }
+    ).sort_values("Probabilidade de Cardiomegalia (%)", ascending=False, na_position="last")
+    # Clicar no cabeçalho de uma coluna reordena a tabela
+    st.dataframe(tabela, use_container_width=True, hide_index=True)
 
 
 def principal():
@@ -47,42 +197,59 @@ def principal():
     # Sidebar removida para interface mais limpa
 
     st.write(
-        "Carregue uma radiografia de tórax para que o CardioIA analise sinais de cardiomegalia."
+        "Carregue uma ou mais radiografias de tórax para que o CardioIA analise sinais de cardiomegalia."
     )
 
-    modelo = carregar_modelo()
-    if modelo is None:
-        return
-
-    arquivo = st.file_uploader(
-        "Envie uma radiografia de tórax (PNG/JPG)",
+    abertura = _abertura()
+    # Com CARDIOIA_INFERENCIA_URL definido, o modelo roda no servidor (src/servidor.py)
+    url_servidor = os.getenv(inferencia.URL_ENV)
+    atual = cache = None
+    if not url_servidor:
+        atual = _artefato_atual()
+        if atual is None:
+            st.error("Modelo não encontrado. Execute o pipeline de treinamento primeiro.")
+            return
+        # O modelo carrega e aquece enquanto o usuário escolhe as imagens
+        _carregamento(*atual)
+        cache = _cache_predicoes()
+
+    arquivos = st.file_uploader(
+        "Envie radiografias de tórax (PNG/JPG)",
         type=["png", "jpg", "jpeg"],
+        accept_multiple_files=True,
     )
 
-    if arquivo is None:
+    if not arquivos:
         return
 
-    imagem = Image.open(arquivo)
-    st.image(imagem, caption="Imagem carregada", use_column_width=True)
-
-    if st.button("Analisar Exame"):
-        entrada = processar_imagem(imagem)
-        probabilidade = float(modelo.predict(entrada)[0][0])
+    if len(arquivos) == 1:
+        try:
+            imagem = Image.open(arquivos[0])
+            st.image(imagem, caption="Imagem carregada", use_column_width=True)
+        except (OSError, ValueError):
+            st.error("Não foi possível abrir a imagem enviada.")
 
-        classe = "Possível Cardiomegalia" if probabilidade > 0.5 else "Normal"
-        st.subheader(classe)
+    rotulo_botao = "Analisar Exame" if len(arquivos) == 1 else f"Analisar {len(arquivos)} Exames"
+    if st.button(rotulo_botao):
+        probabilidades, erros = _analisar([arquivo.getvalue() for arquivo in arquivos], url_servidor, cache, atual)
+        _registrar_primeira_resposta(abertura)
 
-        st.metric(
-            label="Probabilidade de Cardiomegalia",
-            value=f"{probabilidade * 100:.2f}%",
-        )
-
-        st.progress(min(max(probabilidade, 0.0), 1.0))
+        if len(arquivos) == 1 and probabilidades[0] is not None:
+            _exibir_resultado(probabilidades[0])
+        else:
+            _exibir_tabela([arquivo.name for arquivo in arquivos], probabilidades, erros)
 
         st.warning(
             "Este é um protótipo acadêmico. Não substitui diagnóstico médico.",
         )
 
+        if cache is not None:
+            estatisticas = cache.estatisticas()
+            st.caption(
+                f"Cache de predições: {estatisticas['acertos']} acertos, {estatisticas['faltas']} faltas, "
+                f"{estatisticas['entradas']}/{estatisticas['capacidade']} entradas."
+            )
+
 
 if __name__ == "__main__":
     principal()
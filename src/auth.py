@@ -74,8 +74,8 @@ def _prompt_interativo(chave: str) -> Optional[str]:
     return input(f"Informe {label}: ").strip() or None
 
 
-def obter_credenciais() -> Dict[str, str]:
-    """Consolida credenciais de Kaggle e GitHub a partir das fontes disponíveis."""
+def obter_credencial(chave: str) -> Optional[str]:
+    """Busca uma credencial no Colab, no ambiente e no `.env`, sem perguntar ao usuário."""
 
     fontes = [
         _ler_colab_secret,
@@ -83,19 +83,24 @@ def obter_credenciais() -> Dict[str, str]:
         lambda chave: _carregar_env().get(chave),
     ]
 
+    for fonte in fontes:
+        try:
+            valor = fonte(chave)
+        except Exception:  # noqa: BLE001
+            valor = None
+        if valor:
+            return valor.strip()
+    return None
+
+
+def obter_credenciais() -> Dict[str, str]:
+    """Consolida credenciais de Kaggle e GitHub a partir das fontes disponíveis."""
+
     chaves = ("KAGGLE_USERNAME", "KAGGLE_KEY", "GITHUB_TOKEN")
     credenciais: Dict[str, str] = {}
 
     for chave in chaves:
-        valor: Optional[str] = None
-        for fonte in fontes:
-            try:
-                valor = fonte(chave)
-            except Exception:  # noqa: BLE001
-                valor = None
-            if valor:
-                break
-
+        valor = obter_credencial(chave)
         if not valor:
             valor = _prompt_interativo(chave)
 
@@ -146,4 +151,4 @@ def configurar_kaggle(credenciais: Optional[Dict[str, str]] = None) -> Path:
     return kaggle_json
 
 
-__all__ = ["obter_credenciais", "configurar_kaggle"]
+__all__ = ["obter_credencial", "obter_credenciais", "configurar_kaggle"]
@@ -0,0 +1,401 @@
+"""Benchmarks reprodutíveis de dados, treino e inferência do CardioIA.
+
+Tudo roda sobre radiografias sintéticas 224x224 geradas com semente fixa,
+sem rede nem GPU (a ResNet-50 usa pesos aleatórios). São medidos:
+
+- dados: imagens/s entregues pelos backends `keras` e `tfdata` do
+  `data_preprocessing` e pela decodificação + pré-processamento da inferência;
+- treino: passos/s de `--model cnn` e `--model resnet` sobre lotes em memória;
+- inferência: latência p50/p95/p99 de uma imagem (bytes -> probabilidade)
+  e de um lote.
+
+O resultado vai para um JSON. Com `--base`, as métricas são comparadas a um
+resultado anterior e o comando termina com código 1 se houver regressão
+acima da tolerância.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parent))
+    import data_preprocessing  # type: ignore
+    import inferencia  # type: ignore
+    import model_resnet  # type: ignore
+    import model_simple_cnn  # type: ignore
+    import perfil_cpu  # type: ignore
+else:  # pragma: no cover
+    from . import data_preprocessing, inferencia, model_resnet, model_simple_cnn, perfil_cpu
+
+SUITES = ("dados", "treino", "inferencia")
+MODELOS = ("cnn", "resnet")
+CLASSES = ("cardiomegaly", "normal")
+REPORTS_DIR = Path(__file__).resolve().parents[1] / "reports"
+
+
+def _metrica(
+    valor: Optional[float],
+    unidade: str,
+    maior_melhor: bool,
+    rodadas: Optional[Sequence[float]] = None,
+) -> Dict[str, object]:
+    metrica = {
+        "valor": None if valor is None else round(float(valor), 3),
+        "unidade": unidade,
+        "maior_melhor": maior_melhor,
+    }
+    if rodadas is not None:
+        metrica["rodadas"] = [round(float(valor), 3) for valor in rodadas]
+    return metrica
+
+
+def _mediana(rodadas: Sequence[float], unidade: str) -> Dict[str, object]:
+    """Vazão como mediana de várias rodadas, mais robusta a ruído da máquina."""
+
+    return _metrica(float(np.median(rodadas)), unidade, True, rodadas)
+
+
+def gerar_imagens_sinteticas(destino: Path, quantidade: int = 256, seed: int = 42) -> Path:
+    """Grava radiografias sintéticas (PNG em tons de cinza) em train/ e validation/.
+
+    As imagens têm um gradiente com ruído e uma elipse central de tamanho
+    variável, o suficiente para que a decodificação custe o mesmo que um PNG real.
+    """
+
+    gerador = np.random.default_rng(seed)
+    linhas, colunas = np.mgrid[0:224, 0:224]
+    for indice in range(quantidade):
+        split = "validation" if indice % 4 == 0 else "train"
+        classe = CLASSES[indice % 2]
+        pasta = destino / split / classe
+        pasta.mkdir(parents=True, exist_ok=True)
+
+        raio = 40 + 30 * (indice % 2) + gerador.integers(0, 15)
+        elipse = ((linhas - 130) / 1.3) ** 2 + (colunas - 112) ** 2 < raio**2
+        imagem = 60 + 0.4 * linhas + gerador.normal(0, 12, size=(224, 224)) + 90 * elipse
+        Image.fromarray(np.clip(imagem, 0, 255).astype("uint8"), mode="L").save(pasta / f"{indice:05d}.png")
+    return destino
+
+
+def medir_dados(data_dir: Path, batch_size: int, batches: int, rodadas: int) -> Dict[str, dict]:
+    """Imagens/s dos fluxos de treino e da preparação usada pela inferência."""
+
+    metricas: Dict[str, dict] = {}
+    for backend in ("keras", "tfdata"):
+        treino, _ = data_preprocessing.configurar_geradores(data_dir, batch_size=batch_size, backend=backend)
+        vazoes = [data_preprocessing.medir_vazao(treino, batches) for _ in range(rodadas)]
+        metricas[f"dados.{backend}.imagens_por_segundo"] = _mediana(vazoes, "imagens/s")
+        print(f"[benchmark] dados/{backend}: {np.median(vazoes):.1f} imagens/s")
+
+    arquivos = sorted((data_dir / "train").rglob("*.png"))
+    conteudos = [arquivo.read_bytes() for arquivo in arquivos]
+    vazoes = []
+    for _ in range(rodadas):
+        inicio = time.perf_counter()
+        for dados in conteudos:
+            with Image.open(io.BytesIO(dados)) as imagem:
+                inferencia.processar_imagem(imagem)
+        vazoes.append(len(conteudos) / (time.perf_counter() - inicio))
+    metricas["dados.inferencia.imagens_por_segundo"] = _mediana(vazoes, "imagens/s")
+    print(f"[benchmark] dados/inferencia (decodificação + pré-processamento): {np.median(vazoes):.1f} imagens/s")
+    return metricas
+
+
+def _construir(nome: str, jit_compile: bool):
+    if nome == "cnn":
+        return model_simple_cnn.construir_modelo(jit_compile=jit_compile)
+    return model_resnet.construir_modelo(jit_compile=jit_compile, weights=None)
+
+
+def medir_treino(
+    nome: str,
+    batch_size: int,
+    passos: int,
+    rodadas: int,
+    jit_compile: bool,
+    seed: int,
+) -> Dict[str, dict]:
+    """Passos/s de `fit` sobre um lote fixo em memória (isola o modelo da entrada)."""
+
+    tf.keras.backend.clear_session()
+    tf.keras.utils.set_random_seed(seed)
+    modelo = _construir(nome, jit_compile)
+
+    gerador = np.random.default_rng(seed)
+    imagens = gerador.normal(0, 60, size=(batch_size, 224, 224, 3)).astype("float32")
+    rotulos = (np.arange(batch_size) % 2).astype("float32")
+    lotes = tf.data.Dataset.from_tensors((imagens, rotulos)).repeat()
+
+    # A primeira chamada inclui tracing (e compilação XLA) e fica de fora.
+    modelo.fit(lotes, steps_per_epoch=2, epochs=1, verbose=0)
+    vazoes = []
+    for _ in range(rodadas):
+        inicio = time.perf_counter()
+        modelo.fit(lotes, steps_per_epoch=passos, epochs=1, verbose=0)
+        vazoes.append(passos / (time.perf_counter() - inicio))
+
+    print(f"[benchmark] treino/{nome}: {np.median(vazoes):.3f} passos/s ({batch_size} imagens por passo)")
+    return {
+        f"treino.{nome}.passos_por_segundo": _mediana(vazoes, "passos/s"),
+        f"treino.{nome}.imagens_por_segundo": _mediana([vazao * batch_size for vazao in vazoes], "imagens/s"),
+    }
+
+
+def medir_inferencia(
+    data_dir: Path,
+    nome: str,
+    repeticoes: int,
+    tamanho_lote: int,
+    jit_compile: bool,
+    seed: int,
+) -> Dict[str, dict]:
+    """Latência de uma imagem (bytes -> probabilidade) e de um lote já decodificado."""
+
+    tf.keras.backend.clear_session()
+    tf.keras.utils.set_random_seed(seed)
+    modelo = _construir(nome, jit_compile)
+
+    arquivos = sorted((data_dir / "validation").rglob("*.png"))
+    conteudos = [arquivo.read_bytes() for arquivo in arquivos]
+    inferencia.aquecer(modelo)
+
+    unitarias: List[float] = []
+    for indice in range(repeticoes):
+        inicio = time.perf_counter()
+        with Image.open(io.BytesIO(conteudos[indice % len(conteudos)])) as imagem:
+            modelo.predict_on_batch(inferencia.processar_imagem(imagem))
+        unitarias.append(time.perf_counter() - inicio)
+
+    arrays = [inferencia.decodificar_bytes(dados) for dados in conteudos]
+    lote = [arrays[indice % len(arrays)] for indice in range(tamanho_lote)]
+    inferencia.predizer_arrays(modelo, lote)  # aquece o formato do lote
+    em_lote: List[float] = []
+    for _ in range(max(3, repeticoes // 5)):
+        inicio = time.perf_counter()
+        inferencia.predizer_arrays(modelo, lote)
+        em_lote.append(time.perf_counter() - inicio)
+
+    metricas: Dict[str, dict] = {}
+    for rotulo, latencias in (("unitaria", unitarias), (f"lote_{tamanho_lote}", em_lote)):
+        for chave, valor in inferencia.percentis(latencias).items():
+            metricas[f"inferencia.{nome}.{rotulo}.{chave}"] = _metrica(valor, "ms", False)
+    por_imagem = float(np.median(em_lote)) * 1000 / tamanho_lote
+    metricas[f"inferencia.{nome}.lote_{tamanho_lote}.ms_por_imagem"] = _metrica(por_imagem, "ms", False)
+    print(
+        f"[benchmark] inferencia/{nome}: unitária p50="
+        f"{metricas[f'inferencia.{nome}.unitaria.p50_ms']['valor']} ms; "
+        f"lote de {tamanho_lote}: {por_imagem:.2f} ms/imagem"
+    )
+    return metricas
+
+
+def _ambiente(perfil: Dict[str, object]) -> Dict[str, object]:
+    return {
+        "python": platform.python_version(),
+        "tensorflow": tf.__version__,
+        "numpy": np.__version__,
+        "sistema": platform.platform(),
+        "processador": platform.machine(),
+        "cpus": perfil["cpus"],
+        "perfil": perfil["nome"],
+    }
+
+
+def executar(
+    suites: Sequence[str] = SUITES,
+    modelos: Sequence[str] = MODELOS,
+    imagens: int = 256,
+    batch_size: int = 32,
+    batches: int = 20,
+    passos: int = 10,
+    repeticoes: int = 30,
+    rodadas: int = 3,
+    perf_profile: str = "default",
+    seed: int = 42,
+    data_dir: Optional[Path] = None,
+) -> Dict[str, object]:
+    """Roda as suítes pedidas e devolve o resultado serializável.
+
+    Args:
+        suites: Subconjunto de `SUITES`.
+        modelos: Arquiteturas medidas em treino e inferência.
+        imagens: Quantidade de imagens sintéticas (75% treino, 25% validação).
+        batch_size: Lote dos fluxos de dados, do treino e da inferência em lote.
+        batches: Lotes medidos por backend de dados.
+        passos: Passos de treino cronometrados por modelo.
+        repeticoes: Predições unitárias cronometradas por modelo.
+        rodadas: Repetições de cada medida de vazão; vale a mediana.
+        perf_profile: Perfil de `perfil_cpu` aplicado antes de qualquer operação.
+        seed: Semente das imagens, dos pesos e dos lotes.
+        data_dir: Pasta das imagens sintéticas; sem valor, usa uma temporária.
+    """
+
+    perfil = perfil_cpu.aplicar_perfil(perf_profile)
+    config = {
+        "suites": list(suites),
+        "modelos": list(modelos),
+        "imagens": imagens,
+        "batch_size": batch_size,
+        "batches": batches,
+        "passos": passos,
+        "repeticoes": repeticoes,
+        "rodadas": rodadas,
+        "seed": seed,
+    }
+
+    metricas: Dict[str, dict] = {}
+    inicio = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="cardioia_bench_") as temporario:
+        pasta = Path(data_dir or temporario)
+        if not (pasta / "train").exists():
+            gerar_imagens_sinteticas(pasta, imagens, seed)
+
+        if "dados" in suites:
+            metricas.update(medir_dados(pasta, batch_size, batches, rodadas))
+        for nome in modelos:
+            if "treino" in suites:
+                metricas.update(medir_treino(nome, batch_size, passos, rodadas, perfil["jit_compile"], seed))
+            if "inferencia" in suites:
+                metricas.update(
+                    medir_inferencia(pasta, nome, repeticoes, batch_size, perfil["jit_compile"], seed)
+                )
+
+    return {
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "ambiente": _ambiente(perfil),
+        "config": config,
+        "duracao_s": round(time.perf_counter() - inicio, 1),
+        "metricas": metricas,
+    }
+
+
+def comparar(atual: Dict[str, object], base: Dict[str, object], tolerancia: float = 0.10) -> List[dict]:
+    """Compara métrica a métrica; piora acima de `tolerancia` (fração) é regressão."""
+
+    for chave in ("tensorflow", "cpus", "perfil"):
+        if atual["ambiente"].get(chave) != base["ambiente"].get(chave):
+            print(
+                f"[benchmark] Aviso: '{chave}' difere da base "
+                f"({base['ambiente'].get(chave)} -> {atual['ambiente'].get(chave)}); a comparação pode não ser justa."
+            )
+
+    linhas = []
+    for nome, referencia in base["metricas"].items():
+        medida = atual["metricas"].get(nome)
+        if medida is None or medida["valor"] is None or not referencia["valor"]:
+            linhas.append(
+                {"metrica": nome, "base": referencia["valor"], "atual": None, "variacao": None, "status": "ausente"}
+            )
+            continue
+        variacao = (medida["valor"] - referencia["valor"]) / referencia["valor"]
+        piora = -variacao if referencia["maior_melhor"] else variacao
+        status = "regressao" if piora > tolerancia else "melhora" if piora < -tolerancia else "ok"
+        linhas.append(
+            {
+                "metrica": nome,
+                "base": referencia["valor"],
+                "atual": medida["valor"],
+                "variacao": round(variacao, 4),
+                "status": status,
+            }
+        )
+    return linhas
+
+
+def _imprimir_comparacao(linhas: Sequence[dict]) -> None:
+    if not linhas:
+        print("[benchmark] Nenhuma métrica em comum com a base; nada a comparar.")
+        return
+    largura = max(len(linha["metrica"]) for linha in linhas)
+    for linha in linhas:
+        variacao = "-" if linha["variacao"] is None else f"{linha['variacao']:+.1%}"
+        print(
+            f"{linha['metrica']:<{largura}}  {linha['base']!s:>10} -> {linha['atual']!s:>10}  "
+            f"{variacao:>8}  {linha['status']}"
+        )
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmarks reprodutíveis do CardioIA (dados, treino e inferência)")
+    parser.add_argument("--saida", type=str, default=os.fspath(REPORTS_DIR / "benchmark.json"), help="JSON de resultados")
+    parser.add_argument("--suites", type=str, default=",".join(SUITES), help="Suítes separadas por vírgula")
+    parser.add_argument("--modelos", type=str, default=",".join(MODELOS), help="Modelos separados por vírgula")
+    parser.add_argument("--imagens", type=int, default=256, help="Imagens sintéticas geradas")
+    parser.add_argument("--batch-size", type=int, default=32, help="Tamanho do lote")
+    parser.add_argument("--batches", type=int, default=20, help="Lotes medidos por backend de dados")
+    parser.add_argument("--passos", type=int, default=10, help="Passos de treino cronometrados por modelo")
+    parser.add_argument("--repeticoes", type=int, default=30, help="Predições unitárias cronometradas por modelo")
+    parser.add_argument("--rodadas", type=int, default=3, help="Repetições de cada medida de vazão (mediana)")
+    parser.add_argument("--perf-profile", choices=perfil_cpu.PERFIS, default="default", help="Perfil de CPU")
+    parser.add_argument("--seed", type=int, default=42, help="Semente das imagens, pesos e lotes")
+    parser.add_argument("--dados", type=str, default=None, help="Reaproveita/grava as imagens sintéticas nesta pasta")
+    parser.add_argument("--base", type=str, default=None, help="Resultado de referência para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="Piora relativa tolerada (0.10 = 10%%)")
+    parser.add_argument(
+        "--comparar",
+        type=str,
+        default=None,
+        help="Só compara este resultado com --base, sem rodar os benchmarks",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+
+    if args.comparar:
+        if not args.base:
+            raise SystemExit("[benchmark] --comparar exige --base.")
+        resultado = json.loads(Path(args.comparar).read_text(encoding="utf-8"))
+    else:
+        suites = [suite for suite in args.suites.split(",") if suite]
+        modelos = [modelo for modelo in args.modelos.split(",") if modelo]
+        desconhecidos = (set(suites) - set(SUITES)) | (set(modelos) - set(MODELOS))
+        if desconhecidos:
+            raise SystemExit(f"[benchmark] Opções desconhecidas: {', '.join(sorted(desconhecidos))}")
+        resultado = executar(
+            suites=suites,
+            modelos=modelos,
+            imagens=args.imagens,
+            batch_size=args.batch_size,
+            batches=args.batches,
+            passos=args.passos,
+            repeticoes=args.repeticoes,
+            rodadas=args.rodadas,
+            perf_profile=args.perf_profile,
+            seed=args.seed,
+            data_dir=Path(args.dados) if args.dados else None,
+        )
+        saida = Path(args.saida)
+        saida.parent.mkdir(parents=True, exist_ok=True)
+        saida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"[benchmark] Resultados salvos em {saida} ({resultado['duracao_s']}s)")
+
+    if args.base:
+        base = json.loads(Path(args.base).read_text(encoding="utf-8"))
+        linhas = comparar(resultado, base, args.tolerancia)
+        _imprimir_comparacao(linhas)
+        regressoes = [linha["metrica"] for linha in linhas if linha["status"] == "regressao"]
+        if regressoes:
+            print(f"[benchmark] {len(regressoes)} regressão(ões) acima de {args.tolerancia:.0%}.")
+            raise SystemExit(1)
+        print("[benchmark] Nenhuma regressão acima da tolerância.")
+
+
+if __name__ == "__main__":
+    main()
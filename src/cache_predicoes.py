@@ -0,0 +1,174 @@
+"""Cache de predições do CardioIA indexado pelo conteúdo da imagem.
+
+O mesmo exame costuma ser reenviado várias vezes, e o Streamlit reexecuta o
+script a cada interação. Este módulo guarda a probabilidade calculada para cada
+imagem, indexada pelo SHA-256 dos bytes enviados e pela identidade do artefato
+do modelo. Há uma LRU em memória de tamanho fixo e, opcionalmente, uma camada
+em disco (SQLite) que sobrevive a reinícios. As duas camadas usam o par
+(identidade, SHA-256) como chave, e a identidade vem a cada consulta: sessões
+com artefatos diferentes dividem o mesmo cache sem enxergar as entradas umas
+das outras, e as de um artefato trocado saem pela LRU.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+CAPACIDADE_PADRAO = int(os.getenv("CARDIOIA_CACHE_PREDICOES", "512"))
+DISCO_ENV = "CARDIOIA_CACHE_PREDICOES_DIR"
+CAPACIDADE_DISCO_PADRAO = 100_000
+
+
+def identidade_artefato(caminho: str | Path) -> str:
+    """Resume caminho, tamanho e data de modificação do artefato em um hash curto.
+
+    Para SavedModels (pastas), considera todos os arquivos internos; assim,
+    regravar ou trocar o modelo produz outra identidade.
+    """
+
+    caminho = Path(caminho).resolve()
+    arquivos = [caminho] if caminho.is_file() else sorted(item for item in caminho.rglob("*") if item.is_file())
+    digest = hashlib.sha256(os.fspath(caminho).encode("utf-8"))
+    for arquivo in arquivos:
+        estado = arquivo.stat()
+        digest.update(f"{arquivo.name}:{estado.st_size}:{estado.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class CachePredicoes:
+    """LRU de probabilidades por (identidade do modelo, SHA-256 da imagem).
+
+    Args:
+        capacidade: Número máximo de entradas em memória.
+        diretorio: Pasta do arquivo SQLite da camada em disco (None desliga).
+        capacidade_disco: Número máximo de linhas mantidas em disco.
+    """
+
+    def __init__(
+        self,
+        capacidade: int = CAPACIDADE_PADRAO,
+        diretorio: str | Path | None = None,
+        capacidade_disco: int = CAPACIDADE_DISCO_PADRAO,
+    ) -> None:
+        self.capacidade = capacidade
+        self.capacidade_disco = capacidade_disco
+        self._memoria: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._trava = threading.Lock()
+        self.acertos = self.faltas = self.acertos_disco = self.despejos = 0
+
+        self.banco: Optional[Path] = None
+        if diretorio:
+            Path(diretorio).mkdir(parents=True, exist_ok=True)
+            self.banco = Path(diretorio) / "predicoes.sqlite"
+            with self._conectar() as conexao:
+                conexao.execute(
+                    "CREATE TABLE IF NOT EXISTS predicoes ("
+                    "identidade TEXT, chave TEXT, probabilidade REAL, acesso REAL, "
+                    "PRIMARY KEY (identidade, chave))"
+                )
+                conexao.execute("CREATE INDEX IF NOT EXISTS predicoes_acesso ON predicoes (acesso)")
+
+    @staticmethod
+    def chave(dados: bytes) -> str:
+        return hashlib.sha256(dados).hexdigest()
+
+    @contextmanager
+    def _conectar(self) -> Iterator[sqlite3.Connection]:
+        conexao = sqlite3.connect(self.banco, timeout=5)
+        try:
+            with conexao:  # commit ao final (ou rollback em caso de erro)
+                yield conexao
+        finally:
+            conexao.close()
+
+    def obter(self, dados: bytes, identidade: str) -> Optional[float]:
+        """Probabilidade guardada para a imagem com o artefato `identidade`, ou None."""
+
+        chave = (identidade, self.chave(dados))
+        with self._trava:
+            if chave in self._memoria:
+                self._memoria.move_to_end(chave)
+                self.acertos += 1
+                return self._memoria[chave]
+
+        probabilidade = self._ler_disco(*chave)
+        with self._trava:
+            if probabilidade is None:
+                self.faltas += 1
+                return None
+            self.acertos += 1
+            self.acertos_disco += 1
+            self._inserir(chave, probabilidade)
+        return probabilidade
+
+    def guardar(self, dados: bytes, identidade: str, probabilidade: float) -> None:
+        chave = (identidade, self.chave(dados))
+        with self._trava:
+            self._inserir(chave, probabilidade)
+        self._gravar_disco(*chave, probabilidade)
+
+    def estatisticas(self) -> dict:
+        with self._trava:
+            consultas = self.acertos + self.faltas
+            return {
+                "entradas": len(self._memoria),
+                "capacidade": self.capacidade,
+                "acertos": self.acertos,
+                "acertos_disco": self.acertos_disco,
+                "faltas": self.faltas,
+                "despejos": self.despejos,
+                "taxa_acerto": round(self.acertos / consultas, 4) if consultas else None,
+            }
+
+    def _inserir(self, chave: Tuple[str, str], probabilidade: float) -> None:
+        self._memoria[chave] = probabilidade
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.capacidade:
+            self._memoria.popitem(last=False)
+            self.despejos += 1
+
+    def _ler_disco(self, identidade: str, chave: str) -> Optional[float]:
+        if self.banco is None:
+            return None
+        with self._conectar() as conexao:
+            linha = conexao.execute(
+                "SELECT probabilidade FROM predicoes WHERE identidade = ? AND chave = ?",
+                (identidade, chave),
+            ).fetchone()
+            if linha is not None:
+                conexao.execute(
+                    "UPDATE predicoes SET acesso = ? WHERE identidade = ? AND chave = ?",
+                    (time.time(), identidade, chave),
+                )
+        return None if linha is None else float(linha[0])
+
+    def _gravar_disco(self, identidade: str, chave: str, probabilidade: float) -> None:
+        if self.banco is None:
+            return
+        with self._conectar() as conexao:
+            conexao.execute(
+                "INSERT OR REPLACE INTO predicoes VALUES (?, ?, ?, ?)",
+                (identidade, chave, probabilidade, time.time()),
+            )
+            conexao.execute(
+                "DELETE FROM predicoes WHERE rowid IN ("
+                "SELECT rowid FROM predicoes ORDER BY acesso DESC LIMIT -1 OFFSET ?)",
+                (self.capacidade_disco,),
+            )
+
+
+def criar_cache() -> CachePredicoes:
+    """Cria o cache com a capacidade e a pasta em disco definidas pelo ambiente."""
+
+    return CachePredicoes(CAPACIDADE_PADRAO, os.getenv(DISCO_ENV) or None)
+
+
+__all__ = ["CachePredicoes", "criar_cache", "identidade_artefato"]
@@ -0,0 +1,229 @@
+"""Checkpoints do estado completo do treino e retomada com `--resume`.
+
+`CheckpointTreino` grava, a cada `a_cada_epocas` épocas, um
+`tf.train.Checkpoint` com:
+
+- pesos do modelo, incluindo o estado dos geradores de semente do dropout;
+- variáveis do otimizador (momentos, contador de iterações e a taxa de
+  aprendizado já reduzida pelo `ReduceLROnPlateau`);
+- o gerador aleatório global do TensorFlow;
+- um JSON com a época, os contadores do `EarlyStopping`, do
+  `ReduceLROnPlateau` e do `ModelCheckpoint`, o histórico até ali e o estado
+  dos geradores do `random` e do NumPy.
+
+A gravação é assíncrona. No fim da época, as variáveis são copiadas para
+espelhos `tf.Variable` (cópia em memória, rápida), e uma thread grava os
+espelhos enquanto os passos seguem. O `experimental_enable_async_checkpoint`
+do TensorFlow não serve aqui: ele falha a partir da segunda gravação com
+variáveis do Keras 3. O `CheckpointManager` mantém só os `mantidos` mais
+recentes.
+
+No treino distribuído, todos os processos restauram o mesmo checkpoint, mas
+só o chefe grava (`gravar=False` nos demais).
+
+O `fit` do Keras não expõe o iterador de dados. Por isso o ponto de retomada é
+o fim de uma época: a próxima época recomeça o iterador, como faria sem a
+interrupção.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import shutil
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.callbacks import Callback, EarlyStopping, ModelCheckpoint, ReduceLROnPlateau
+
+# Atributos de cada callback padrão que o Keras zera em `on_train_begin`.
+ESTADO_CALLBACKS = {
+    EarlyStopping: ("wait", "stopped_epoch", "best", "best_epoch"),
+    ReduceLROnPlateau: ("wait", "best", "cooldown_counter"),
+    ModelCheckpoint: ("best",),
+}
+
+
+def _serializavel(valor):
+    if isinstance(valor, (np.generic, np.ndarray)):
+        return valor.tolist()
+    return valor
+
+
+def ler_estado(diretorio: Path) -> Optional[Dict[str, object]]:
+    """Estado (época, contadores, histórico) do checkpoint mais recente, sem restaurar variáveis."""
+
+    caminho = tf.train.latest_checkpoint(str(diretorio))
+    if not caminho:
+        return None
+    return json.loads(tf.train.load_variable(caminho, "estado/.ATTRIBUTES/VARIABLE_VALUE").decode("utf-8"))
+
+
+class CheckpointTreino(Callback):
+    """Checkpoint periódico e assíncrono do estado completo do treino.
+
+    Deve vir depois dos callbacks cujo estado salva (veja `acompanhar`): o
+    Keras os zera em `on_train_begin`, e a retomada restaura os contadores
+    logo em seguida. Sem `retomar`, checkpoints antigos em `diretorio` são
+    apagados.
+
+    Args:
+        diretorio: Pasta dos checkpoints (`ckpt-<época>.*`).
+        retomar: Restaura o checkpoint mais recente no início do treino.
+        a_cada_epocas: Intervalo entre checkpoints, em épocas.
+        mantidos: Quantidade de checkpoints mantidos em disco.
+        assincrono: Grava em segundo plano sem parar os passos.
+        gravar: Com False, só restaura; usado pelos processos que não são o
+            chefe no treino distribuído.
+    """
+
+    def __init__(
+        self,
+        diretorio: Path,
+        retomar: bool = False,
+        a_cada_epocas: int = 1,
+        mantidos: int = 3,
+        assincrono: bool = True,
+        gravar: bool = True,
+    ) -> None:
+        super().__init__()
+        self.diretorio = Path(diretorio)
+        self.retomar = retomar
+        self.a_cada_epocas = max(1, a_cada_epocas)
+        self.mantidos = mantidos
+        self.assincrono = assincrono
+        self.gravar = gravar
+        self.callbacks: List[Callback] = []
+        self.melhor_modelo: Optional[Path] = None
+        self.historico_anterior: Dict[str, List[float]] = {}
+        self._historico: Dict[str, List[float]] = {}
+
+        estado = ler_estado(self.diretorio) if retomar else None
+        if retomar and estado is None:
+            print(f"[checkpoints] Nenhum checkpoint em {self.diretorio}; começando do zero.")
+        if gravar and not retomar and tf.train.latest_checkpoint(str(self.diretorio)):
+            print(f"[checkpoints] Descartando checkpoints anteriores em {self.diretorio}.")
+            shutil.rmtree(self.diretorio)
+        # Época a passar como `initial_epoch` e se o EarlyStopping já havia encerrado o treino.
+        self.epoca_inicial = int(estado["epoca"]) if estado else 0
+        self.encerrado = bool(estado and estado["encerrado"])
+        self._gerenciador: Optional[tf.train.CheckpointManager] = None
+        self._gravador: Optional[ThreadPoolExecutor] = None
+        self._gravacao: Optional[Future] = None
+
+    def acompanhar(self, callbacks: List[Callback], melhor_modelo: Optional[Path] = None) -> None:
+        """Define os callbacks cujo estado vai no checkpoint (`ESTADO_CALLBACKS`).
+
+        Args:
+            callbacks: Callbacks do `fit`; os demais tipos são ignorados.
+            melhor_modelo: Arquivo do `ModelCheckpoint`. Na retomada, os pesos
+                dele viram os `best_weights` do `EarlyStopping`.
+        """
+
+        self.callbacks = [callback for callback in callbacks if type(callback) in ESTADO_CALLBACKS]
+        self.melhor_modelo = melhor_modelo
+
+    def _preparar(self) -> None:
+        # As variáveis do otimizador só existem depois do primeiro passo; cria agora para espelhá-las.
+        if not self.model.optimizer.built:
+            self.model.optimizer.build(self.model.trainable_variables)
+        self._originais = {
+            "modelo": list(self.model.variables),
+            "otimizador": list(self.model.optimizer.variables),
+            "gerador": [tf.random.get_global_generator().state],
+        }
+        self._espelhos = {
+            grupo: [tf.Variable(tf.zeros(variavel.shape, variavel.dtype), trainable=False) for variavel in variaveis]
+            for grupo, variaveis in self._originais.items()
+        }
+        self._estado = tf.Variable("", dtype=tf.string, trainable=False)
+        checkpoint = tf.train.Checkpoint(estado=self._estado, **self._espelhos)
+        self._gerenciador = tf.train.CheckpointManager(checkpoint, str(self.diretorio), max_to_keep=self.mantidos)
+        self._gravador = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint")
+
+    def on_train_begin(self, logs=None):
+        self._preparar()
+        self._historico = {}
+        if not self.retomar or not self._gerenciador.latest_checkpoint:
+            return
+        self._gerenciador.checkpoint.restore(self._gerenciador.latest_checkpoint).assert_existing_objects_matched()
+        for grupo, variaveis in self._originais.items():
+            for variavel, espelho in zip(variaveis, self._espelhos[grupo]):
+                variavel.assign(espelho)
+        self._aplicar_estado(json.loads(self._estado.numpy().decode("utf-8")))
+        print(
+            f"[checkpoints] Retomando de {self._gerenciador.latest_checkpoint} "
+            f"(época {self.epoca_inicial}, LR={float(self.model.optimizer.learning_rate.numpy()):.2e})."
+        )
+
+    def _aplicar_estado(self, estado: Dict[str, object]) -> None:
+        for callback, atributos in zip(self.callbacks, estado["callbacks"]):
+            for nome, valor in atributos.items():
+                setattr(callback, nome, valor)
+            if (
+                isinstance(callback, EarlyStopping)
+                and callback.restore_best_weights
+                and self.melhor_modelo is not None
+                and self.melhor_modelo.exists()
+            ):
+                melhor = tf.keras.models.load_model(self.melhor_modelo, compile=False)
+                callback.best_weights = melhor.get_weights()
+        self.historico_anterior = estado["historico"]
+        self._historico = {chave: list(valores) for chave, valores in self.historico_anterior.items()}
+        estado_numpy = estado["numpy"]
+        np.random.set_state((estado_numpy[0], np.asarray(estado_numpy[1], dtype="uint32"), *estado_numpy[2:]))
+        versao, interno, gauss = estado["random"]
+        random.setstate((versao, tuple(interno), gauss))
+
+    def on_epoch_end(self, epoch, logs=None):
+        for chave, valor in (logs or {}).items():
+            self._historico.setdefault(chave, []).append(float(valor))
+        if not self.gravar or (epoch + 1) % self.a_cada_epocas:
+            return
+        estado = {
+            "epoca": epoch + 1,
+            "encerrado": bool(self.model.stop_training),
+            "callbacks": [
+                {nome: _serializavel(getattr(callback, nome)) for nome in ESTADO_CALLBACKS[type(callback)]}
+                for callback in self.callbacks
+            ],
+            "historico": self._historico,
+            "numpy": [_serializavel(parte) for parte in np.random.get_state()],
+            "random": random.getstate(),
+        }
+        # Os espelhos só podem ser reescritos quando a gravação anterior terminar.
+        self._esperar_gravacao()
+        for grupo, variaveis in self._originais.items():
+            for variavel, espelho in zip(variaveis, self._espelhos[grupo]):
+                espelho.assign(variavel)
+        self._estado.assign(json.dumps(estado))
+        if self.assincrono:
+            self._gravacao = self._gravador.submit(self._gerenciador.save, checkpoint_number=epoch + 1)
+        else:
+            self._gerenciador.save(checkpoint_number=epoch + 1)
+
+    def _esperar_gravacao(self) -> None:
+        if self._gravacao is not None:
+            self._gravacao.result()  # propaga erros de disco da thread
+            self._gravacao = None
+
+    def on_train_end(self, logs=None):
+        self._esperar_gravacao()
+        if self._gravador is not None:
+            self._gravador.shutdown()
+
+    def historico_completo(self, history: Dict[str, List[float]]) -> Dict[str, List[float]]:
+        """Junta o histórico das épocas anteriores à retomada ao do `fit` atual."""
+
+        if not self.historico_anterior:
+            return history
+        return {
+            chave: [*self.historico_anterior.get(chave, []), *history.get(chave, [])]
+            for chave in dict.fromkeys([*self.historico_anterior, *history])
+        }
+
+
+__all__ = ["CheckpointTreino", "ler_estado"]
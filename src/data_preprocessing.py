@@ -1,17 +1,299 @@
 """Ferramentas de pré-processamento de dados para o projeto CardioIA."""
 
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import time
 from pathlib import Path
-from typing import Tuple
+from typing import Tuple, Union
 
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from sklearn.model_selection import StratifiedKFold
+from tensorflow.keras import Sequential
 from tensorflow.keras.applications.resnet50 import preprocess_input
-from tensorflow.keras.preprocessing.image import DirectoryIterator, ImageDataGenerator
+from tensorflow.keras.layers import RandomFlip, RandomRotation, RandomZoom
+from tensorflow.keras.preprocessing.image import ImageDataGenerator, Iterator
+from tensorflow.keras.utils import Sequence as KerasSequence
+
+BACKENDS = ("keras", "tfdata", "memmap")
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg"}
+
+
+class FluxoMemmap(KerasSequence):
+    """Entrega batches direto do store uint8 (N, H, W) gerado pelo ETL com `--memmap`.
+
+    O array é aberto em modo somente leitura via memory-map, então vários processos
+    de treino compartilham a mesma cópia no page cache. A expansão para 3 canais
+    float32 acontece apenas no batch corrente.
+    """
+
+    def __init__(
+        self,
+        store_dir: Path,
+        split: str,
+        batch_size: int,
+        target_size: tuple[int, int],
+        treino: bool,
+    ) -> None:
+        super().__init__()
+        self.imagens = np.load(store_dir / f"{split}.npy", mmap_mode="r")
+        self.rotulos = pd.read_csv(store_dir / f"{split}.csv")["rotulo"].to_numpy(dtype="float32")
+        self.samples = len(self.rotulos)
+
+        if self.imagens.shape[1:] != tuple(target_size):
+            raise ValueError(
+                f"Store {store_dir / split} tem imagens {self.imagens.shape[1:]}, esperado {target_size}."
+            )
+
+        self.batch_size = batch_size
+        self.treino = treino
+        self._augmentacao = criar_augmentacao() if treino else None
+        self._ordem = np.arange(self.samples)
+        self.on_epoch_end()
+
+    def __len__(self) -> int:
+        return math.ceil(self.samples / self.batch_size)
+
+    def __getitem__(self, indice: int) -> Tuple[np.ndarray, np.ndarray]:
+        # Índices ordenados tornam a leitura do memmap mais sequencial.
+        selecao = np.sort(self._ordem[indice * self.batch_size : (indice + 1) * self.batch_size])
+        lote = np.repeat(self.imagens[selecao][..., np.newaxis], 3, axis=-1).astype("float32")
+
+        if self._augmentacao is not None:
+            lote = np.array(self._augmentacao(lote, training=True))
+
+        return preprocess_input(lote), self.rotulos[selecao]
+
+    def on_epoch_end(self) -> None:
+        if self.treino:
+            np.random.shuffle(self._ordem)
+
+
+# Iterator cobre tanto o DirectoryIterator quanto o iterador de `flow_from_dataframe`.
+FluxoDados = Union[Iterator, tf.data.Dataset, FluxoMemmap]
+
+
+def listar_imagens(diretorio: Path) -> Tuple[list[str], list[int], list[str]]:
+    """Lista caminhos e rótulos seguindo a mesma convenção do `flow_from_directory`.
+
+    As classes são as subpastas em ordem alfabética e o rótulo é o índice da classe.
+    """
+
+    classes = sorted(item.name for item in diretorio.iterdir() if item.is_dir())
+    caminhos: list[str] = []
+    rotulos: list[int] = []
+
+    for indice, classe in enumerate(classes):
+        for arquivo in sorted((diretorio / classe).iterdir()):
+            if arquivo.is_file() and arquivo.suffix.lower() in IMAGE_EXTENSIONS:
+                caminhos.append(os.fspath(arquivo))
+                rotulos.append(indice)
+
+    return caminhos, rotulos, classes
+
+
+def carregar_manifesto(
+    caminho: str | Path,
+    fold: int | None = None,
+    n_folds: int = 5,
+    seed: int = 42,
+) -> pd.DataFrame:
+    """Lê o manifesto gerado pelo ETL (`--formato manifesto`).
+
+    Com `fold`, a coluna `split` é refeita em memória por k-fold estratificado:
+    o fold escolhido vira "validation" e os demais "train", sem tocar em arquivos.
+    """
+
+    manifesto = pd.read_csv(caminho)
+
+    if fold is not None:
+        if not 0 <= fold < n_folds:
+            raise ValueError(f"Fold {fold} fora do intervalo [0, {n_folds}).")
+        divisor = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+        _, indices_validacao = list(divisor.split(manifesto, manifesto["classe"]))[fold]
+        manifesto["split"] = "train"
+        manifesto.loc[manifesto.index[indices_validacao], "split"] = "validation"
+
+    return manifesto
+
+
+def listar_split(
+    diretorio_base: str | Path,
+    split: str,
+    manifesto: pd.DataFrame | None = None,
+) -> Tuple[list[str], list[int], list[str]]:
+    """Lista caminhos e rótulos de um split, a partir do manifesto ou das pastas."""
+
+    if manifesto is None:
+        return listar_imagens(Path(diretorio_base) / split)
+
+    classes = sorted(manifesto["classe"].unique())
+    frame = manifesto[manifesto["split"] == split]
+    rotulos = [classes.index(classe) for classe in frame["classe"]]
+    return frame["caminho"].tolist(), rotulos, classes
+
+
+def criar_augmentacao(seed: int | None = None) -> Sequential:
+    """Camadas de augmentation equivalentes às do `ImageDataGenerator` de treino.
+
+    Rotação de até 20 graus, zoom de 20% em cada eixo e espelhamento horizontal,
+    preenchendo as bordas com o pixel mais próximo. As camadas ficam em float32
+    mesmo quando o treino usa precisão mista.
+    """
+
+    return Sequential(
+        [
+            RandomRotation(20 / 360, fill_mode="nearest", seed=seed, dtype="float32"),
+            RandomZoom((-0.2, 0.2), (-0.2, 0.2), fill_mode="nearest", seed=seed, dtype="float32"),
+            RandomFlip("horizontal", seed=seed, dtype="float32"),
+        ],
+        name="augmentacao",
+    )
+
+
+def decodificar_imagem(caminho: tf.Tensor, target_size: tuple[int, int] = (224, 224)) -> tf.Tensor:
+    """Lê e decodifica uma imagem em RGB uint8 no tamanho informado."""
+
+    imagem = tf.io.decode_image(tf.io.read_file(caminho), channels=3, expand_animations=False)
+    # "nearest" preserva uint8, o que deixa caches de imagens 4x menores.
+    return tf.image.resize(imagem, target_size, method="nearest")
+
+
+def _configurar_tfdata(
+    treino: Tuple[list[str], list[int]],
+    validacao: Tuple[list[str], list[int]],
+    batch_size: int,
+    target_size: tuple[int, int],
+    fragmento: Tuple[int, int] | None = None,
+) -> Tuple[tf.data.Dataset, tf.data.Dataset]:
+    """Monta o pipeline `tf.data` com decodificação paralela e augmentation no grafo.
+
+    Com `fragmento=(total, indice)`, cada processo lê só a sua fatia das
+    imagens, antes da decodificação. O treino repete a fatia até completar o
+    mesmo número de passos em todos os processos, porque cada passo sincroniza
+    os gradientes e um processo não pode terminar a época antes dos outros.
+    """
+
+    autotune = tf.data.AUTOTUNE
+    passos = None
+    if fragmento is not None:
+        total, indice = fragmento
+        passos = math.ceil(math.ceil(len(treino[0]) / total) / batch_size)
+        treino = (treino[0][indice::total], treino[1][indice::total])
+        validacao = (validacao[0][indice::total], validacao[1][indice::total])
+    augmentacao = criar_augmentacao()
+
+    def _carregar(caminho, rotulo):
+        return decodificar_imagem(caminho, target_size), tf.cast(rotulo, tf.float32)
+
+    def _preprocessar(imagens, rotulos):
+        return preprocess_input(tf.cast(imagens, tf.float32)), rotulos
+
+    def _aumentar(imagens, rotulos):
+        imagens = augmentacao(tf.cast(imagens, tf.float32), training=True)
+        return preprocess_input(imagens), rotulos
+
+    fluxo_treino = (
+        tf.data.Dataset.from_tensor_slices(treino)
+        .shuffle(len(treino[0]), reshuffle_each_iteration=True)
+        .map(_carregar, num_parallel_calls=autotune)
+        .batch(batch_size)
+        .map(_aumentar, num_parallel_calls=autotune)
+    )
+    if passos is not None:
+        fluxo_treino = fluxo_treino.repeat().take(passos)
+    fluxo_treino = fluxo_treino.prefetch(autotune)
+
+    fluxo_validacao = (
+        tf.data.Dataset.from_tensor_slices(validacao)
+        .map(_carregar, num_parallel_calls=autotune)
+        .cache()
+        .batch(batch_size)
+        .map(_preprocessar, num_parallel_calls=autotune)
+        .prefetch(autotune)
+    )
+
+    return fluxo_treino, fluxo_validacao
+
+
+def _criar_image_data_generators() -> Tuple[ImageDataGenerator, ImageDataGenerator]:
+    """Geradores Keras de treino (com augmentation) e de validação."""
+
+    # Augmentation moderado para refletir variações comuns nas radiografias de tórax.
+    gerador_treino = ImageDataGenerator(
+        preprocessing_function=preprocess_input,
+        rotation_range=20,
+        zoom_range=0.2,
+        horizontal_flip=True,
+    )
+
+    gerador_validacao = ImageDataGenerator(
+        preprocessing_function=preprocess_input,
+    )
+
+    return gerador_treino, gerador_validacao
+
+
+def _configurar_manifesto(
+    manifesto: pd.DataFrame,
+    batch_size: int,
+    target_size: tuple[int, int],
+    backend: str,
+    fragmento: Tuple[int, int] | None = None,
+) -> Tuple[FluxoDados, FluxoDados]:
+    """Monta os fluxos a partir do manifesto, sem depender da árvore de pastas."""
+
+    if backend == "memmap":
+        raise ValueError("O backend 'memmap' lê o store do ETL e não usa manifesto.")
+
+    treino_df = manifesto[manifesto["split"] == "train"]
+    validacao_df = manifesto[manifesto["split"] == "validation"]
+
+    if treino_df.empty or validacao_df.empty:
+        raise ValueError("O manifesto precisa de linhas com split 'train' e 'validation'.")
+
+    if backend == "tfdata":
+        caminhos_treino, rotulos_treino, _ = listar_split(None, "train", manifesto)
+        caminhos_validacao, rotulos_validacao, _ = listar_split(None, "validation", manifesto)
+        return _configurar_tfdata(
+            (caminhos_treino, rotulos_treino),
+            (caminhos_validacao, rotulos_validacao),
+            batch_size,
+            target_size,
+            fragmento,
+        )
+
+    classes = sorted(manifesto["classe"].unique())
+    gerador_treino, gerador_validacao = _criar_image_data_generators()
+
+    opcoes = {
+        "x_col": "caminho",
+        "y_col": "classe",
+        "classes": classes,
+        "target_size": target_size,
+        "batch_size": batch_size,
+        "class_mode": "binary",
+        "validate_filenames": False,
+    }
+
+    fluxo_treino = gerador_treino.flow_from_dataframe(treino_df, **opcoes)
+    fluxo_validacao = gerador_validacao.flow_from_dataframe(validacao_df, shuffle=False, **opcoes)
+
+    return fluxo_treino, fluxo_validacao
 
 
 def configurar_geradores(
     diretorio_base: str | Path,
     batch_size: int = 32,
     target_size: tuple[int, int] = (224, 224),
-) -> Tuple[DirectoryIterator, DirectoryIterator]:
+    backend: str = "keras",
+    manifesto: pd.DataFrame | None = None,
+    fragmento: Tuple[int, int] | None = None,
+) -> Tuple[FluxoDados, FluxoDados]:
     """Cria geradores de treino e validação prontos para a ResNet-50.
 
     Garante que os dados de treino recebam augmentation compatível com o cenário clínico
@@ -21,15 +303,43 @@ def configurar_geradores(
         diretorio_base: Caminho para o diretório contendo as pastas "train" e "validation".
         batch_size: Quantidade de amostras por batch.
         target_size: Dimensão final das imagens (altura, largura).
+        backend: "keras" para os `DirectoryIterator` originais, "tfdata" para o
+            pipeline `tf.data` com decodificação paralela, cache e prefetch, ou
+            "memmap" para ler o store uint8 gerado pelo ETL em `<diretorio_base>/store`.
+        manifesto: DataFrame de `carregar_manifesto`. Quando informado, as imagens são
+            lidas dos caminhos do manifesto em vez das pastas de `diretorio_base`.
+        fragmento: (total, índice) do processo no treino distribuído; só o
+            backend "tfdata" divide as imagens entre os processos.
 
     Returns:
         Tupla com os geradores (treino, validacao).
 
     Raises:
         FileNotFoundError: Caso os diretórios esperados não existam.
+        ValueError: Caso o backend informado não seja suportado.
     """
 
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de dados desconhecido: {backend}. Opções: {', '.join(BACKENDS)}")
+    if fragmento is not None and backend != "tfdata":
+        raise ValueError("O treino distribuído exige o backend 'tfdata'.")
+
     base_path = Path(diretorio_base)
+
+    if manifesto is not None:
+        return _configurar_manifesto(manifesto, batch_size, target_size, backend, fragmento)
+
+    if backend == "memmap":
+        store_dir = base_path / "store"
+        if not (store_dir / "train.npy").exists():
+            raise FileNotFoundError(
+                f"Store memmap não encontrado em {store_dir}. Execute o ETL com --memmap."
+            )
+        return (
+            FluxoMemmap(store_dir, "train", batch_size, target_size, treino=True),
+            FluxoMemmap(store_dir, "validation", batch_size, target_size, treino=False),
+        )
+
     treino_dir = base_path / "train"
     validacao_dir = base_path / "validation"
 
@@ -39,17 +349,18 @@ def configurar_geradores(
     if not validacao_dir.exists():
         raise FileNotFoundError(f"Diretório de validação não encontrado: {validacao_dir}")
 
-    # Augmentation moderado para refletir variações comuns nas radiografias de tórax.
-    gerador_treino = ImageDataGenerator(
-        preprocessing_function=preprocess_input,
-        rotation_range=20,
-        zoom_range=0.2,
-        horizontal_flip=True,
-    )
+    if backend == "tfdata":
+        caminhos_treino, rotulos_treino, _ = listar_imagens(treino_dir)
+        caminhos_validacao, rotulos_validacao, _ = listar_imagens(validacao_dir)
+        return _configurar_tfdata(
+            (caminhos_treino, rotulos_treino),
+            (caminhos_validacao, rotulos_validacao),
+            batch_size,
+            target_size,
+            fragmento,
+        )
 
-    gerador_validacao = ImageDataGenerator(
-        preprocessing_function=preprocess_input,
-    )
+    gerador_treino, gerador_validacao = _criar_image_data_generators()
 
     fluxo_treino = gerador_treino.flow_from_directory(
         directory=str(treino_dir),
@@ -67,3 +378,45 @@ def configurar_geradores(
     )
 
     return fluxo_treino, fluxo_validacao
+
+
+def medir_vazao(fluxo: FluxoDados, batches: int = 20) -> float:
+    """Mede imagens/segundo entregues pelo fluxo, descartando o primeiro batch."""
+
+    if isinstance(fluxo, tf.data.Dataset):
+        fluxo = fluxo.repeat()
+
+    if isinstance(fluxo, FluxoMemmap):
+        lotes = (fluxo[indice % len(fluxo)] for indice in range(batches + 1))
+    else:
+        lotes = iter(fluxo)
+    next(lotes)
+
+    imagens = 0
+    inicio = time.perf_counter()
+    for _ in range(batches):
+        lote, _ = next(lotes)
+        imagens += int(lote.shape[0])
+    return imagens / (time.perf_counter() - inicio)
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compara a vazão dos backends de dados do CardioIA")
+    parser.add_argument(
+        "--data-dir",
+        type=str,
+        default=os.fspath(Path(__file__).resolve().parents[1] / "data"),
+        help="Diretório contendo as pastas train/ e validation/",
+    )
+    parser.add_argument("--batch-size", type=int, default=32, help="Tamanho do batch")
+    parser.add_argument("--batches", type=int, default=20, help="Batches medidos por backend")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    for nome in BACKENDS:
+        if nome == "memmap" and not (Path(args.data_dir) / "store").exists():
+            continue
+        treino, _ = configurar_geradores(args.data_dir, batch_size=args.batch_size, backend=nome)
+        print(f"[data] {nome}: {medir_vazao(treino, args.batches):.1f} imagens/s (treino)")
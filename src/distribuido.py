@@ -0,0 +1,458 @@
+"""Treino data-parallel do CardioIA em vários processos locais.
+
+`python src/train.py --workers 4 ...` inicia quatro cópias do treino na mesma
+máquina. Cada cópia recebe um `TF_CONFIG` com o endereço das demais, e a
+`tf.distribute.MultiWorkerMirroredStrategy` soma os gradientes entre elas a
+cada passo (all-reduce em anel). Cada processo:
+
+- fica preso a um bloco próprio de CPUs (Linux), e o TensorFlow dimensiona as
+  threads por esse bloco;
+- lê só a sua fatia das imagens (`data_preprocessing`, backend `tfdata`);
+- treina com lotes de `--batch-size`; o lote global de cada passo é
+  `batch_size x workers`.
+
+Só o processo 0 (o chefe) grava modelos, checkpoints, histórico e o
+experimento. Os demais gravam o que os callbacks pedirem em uma pasta
+temporária, apagada no fim.
+
+O `fit` do Keras 3 não roda sob `MultiWorkerMirroredStrategy`: a construção
+simbólica e a redução dos logs chamam `strategy.reduce` com estruturas que a
+estratégia coletiva não aceita. `ajustar` refaz o laço do `fit` com os mesmos
+`train_step`, `test_step` e callbacks.
+
+Relatório de escalabilidade (passos/s e imagens/s por quantidade de processos):
+    python src/distribuido.py escalonamento --workers 1 2 4 --model cnn --epochs 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import tensorflow as tf
+from tensorflow.keras import Model
+from tensorflow.keras.callbacks import Callback, CallbackList, History
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+LOGS_DIR = REPO_ROOT / "reports" / "distribuido"
+
+
+def em_cluster() -> bool:
+    """Se este processo é um dos workers de um treino distribuído (`TF_CONFIG` definido)."""
+
+    return bool(os.environ.get("TF_CONFIG"))
+
+
+def posicao() -> Tuple[int, int]:
+    """(total de workers, índice deste processo); (1, 0) fora do treino distribuído."""
+
+    if not em_cluster():
+        return 1, 0
+    configuracao = json.loads(os.environ["TF_CONFIG"])
+    return len(configuracao["cluster"]["worker"]), int(configuracao["task"]["index"])
+
+
+def eh_chefe() -> bool:
+    """O worker 0 é o chefe: só ele grava artefatos e registra o experimento."""
+
+    return posicao()[1] == 0
+
+
+def criar_estrategia() -> tf.distribute.MultiWorkerMirroredStrategy:
+    """Estratégia multi-worker com all-reduce em anel (o NCCL só existe em GPU).
+
+    Deve ser criada antes de qualquer operação do TensorFlow no processo.
+    """
+
+    opcoes = tf.distribute.experimental.CommunicationOptions(
+        implementation=tf.distribute.experimental.CommunicationImplementation.RING
+    )
+    return tf.distribute.MultiWorkerMirroredStrategy(communication_options=opcoes)
+
+
+def _portas_livres(quantidade: int) -> List[int]:
+    soquetes = []
+    for _ in range(quantidade):
+        soquete = socket.socket()
+        soquete.bind(("localhost", 0))
+        soquetes.append(soquete)
+    portas = [soquete.getsockname()[1] for soquete in soquetes]
+    for soquete in soquetes:
+        soquete.close()
+    return portas
+
+
+def _blocos_cpu(workers: int) -> List[Optional[List[int]]]:
+    """Divide as CPUs do processo em blocos contíguos, um por worker.
+
+    Sem `sched_setaffinity` ou com menos CPUs que workers, os processos
+    dividem todas as CPUs.
+    """
+
+    if not hasattr(os, "sched_getaffinity"):
+        return [None] * workers
+    cpus = sorted(os.sched_getaffinity(0))
+    if len(cpus) < workers:
+        return [None] * workers
+    tamanho = len(cpus) // workers
+    return [cpus[indice * tamanho : (indice + 1) * tamanho] for indice in range(workers)]
+
+
+def lancar(comando: Sequence[str], workers: int, logs_dir: Path = LOGS_DIR) -> int:
+    """Executa `comando` em `workers` processos locais formando um cluster.
+
+    O chefe escreve no terminal; os demais em `logs_dir/worker_<i>.log`. Se um
+    processo falhar, os outros são encerrados (ficariam presos esperando o
+    all-reduce).
+
+    Returns:
+        Código de saída: 0 se todos terminaram bem, senão o do primeiro que falhou.
+    """
+
+    portas = _portas_livres(workers)
+    cluster = {"worker": [f"localhost:{porta}" for porta in portas]}
+    blocos = _blocos_cpu(workers)
+    logs_dir.mkdir(parents=True, exist_ok=True)
+    print(f"[distribuido] Iniciando {workers} workers ({', '.join(cluster['worker'])}).")
+
+    processos = []
+    arquivos = []
+    for indice, bloco in enumerate(blocos):
+        ambiente = {
+            **os.environ,
+            "TF_CONFIG": json.dumps({"cluster": cluster, "task": {"type": "worker", "index": indice}}),
+        }
+        saida = None
+        if indice > 0:
+            saida = open(logs_dir / f"worker_{indice}.log", "w", encoding="utf-8")  # noqa: SIM115
+            arquivos.append(saida)
+        processos.append(
+            subprocess.Popen(
+                list(comando),
+                env=ambiente,
+                stdout=saida,
+                stderr=subprocess.STDOUT if saida else None,
+                preexec_fn=(lambda cpus=bloco: os.sched_setaffinity(0, cpus)) if bloco else None,
+            )
+        )
+
+    codigo = 0
+    try:
+        while any(processo.poll() is None for processo in processos):
+            falhas = [processo.returncode for processo in processos if processo.returncode not in (None, 0)]
+            if falhas:
+                codigo = falhas[0]
+                print(f"[distribuido] Um worker terminou com código {codigo}; encerrando os demais.")
+                break
+            time.sleep(0.5)
+    finally:
+        # Após uma falha ou interrupção. O TensorFlow trata o SIGTERM como aviso
+        # de preempção e segue rodando; quem não sair logo recebe SIGKILL.
+        for processo in processos:
+            if processo.poll() is None:
+                processo.terminate()
+        for processo in processos:
+            try:
+                processo.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                processo.kill()
+                processo.wait()
+        for arquivo in arquivos:
+            arquivo.close()
+    return codigo or next((processo.returncode for processo in processos if processo.returncode), 0)
+
+
+def _construir(modelo: Model, estrategia: tf.distribute.Strategy, especificacao) -> None:
+    """Cria pesos, métricas e variáveis do otimizador antes do primeiro passo.
+
+    O `fit` faria isto na construção simbólica; aqui basta uma passada com um
+    lote de zeros dentro do escopo, para que as variáveis nasçam espelhadas.
+    """
+
+    with estrategia.scope():
+        x, y = (tf.zeros((1, *spec.shape[1:]), spec.dtype) for spec in especificacao[:2])
+        y_pred = modelo(x, training=False)
+        modelo.compute_loss(x=x, y=y, y_pred=y_pred)
+        modelo.compute_metrics(x, y, y_pred, sample_weight=None)
+        modelo.optimizer.build(modelo.trainable_variables)
+    modelo.reset_metrics()
+
+
+def ajustar(
+    modelo: Model,
+    estrategia: tf.distribute.Strategy,
+    treino: tf.data.Dataset,
+    validacao: Optional[tf.data.Dataset],
+    epochs: int,
+    initial_epoch: int = 0,
+    callbacks: Sequence[Callback] = (),
+    verbose: int | str = "auto",
+) -> History:
+    """Laço equivalente ao `Model.fit` sob `MultiWorkerMirroredStrategy`.
+
+    Cada passo roda o `train_step` do modelo em todos os processos; o
+    otimizador soma os gradientes entre eles. Os logs de época vêm das
+    métricas compiladas, lidas fora do passo, o que as agrega entre os
+    processos: todos veem o mesmo `val_loss` e tomam as mesmas decisões de
+    EarlyStopping e ReduceLROnPlateau.
+
+    Args:
+        modelo: Modelo compilado dentro de `estrategia.scope()`.
+        treino: Fatia deste processo, com o mesmo número de lotes em todos.
+        validacao: Fatia de validação deste processo (pode ter tamanho diferente).
+        epochs, initial_epoch, callbacks, verbose: Como no `fit`.
+
+    Returns:
+        O `History` do treino, como o devolvido pelo `fit`.
+    """
+
+    _construir(modelo, estrategia, treino.element_spec)
+
+    verbose = 1 if verbose == "auto" else verbose
+    passos = int(treino.cardinality())
+    lista = CallbackList(
+        list(callbacks),
+        add_history=True,
+        add_progbar=verbose != 0,
+        verbose=verbose,
+        epochs=epochs,
+        steps=passos,
+        model=modelo,
+    )
+    historico = next(callback for callback in lista.callbacks if isinstance(callback, History))
+
+    # Definidos depois do CallbackList: o MedidorPassos troca o `train_step` em `set_model`.
+    @tf.function
+    def passo_treino(iterador):
+        return estrategia.run(modelo.train_step, args=(next(iterador),))
+
+    @tf.function
+    def passo_validacao(lote):
+        return estrategia.run(modelo.test_step, args=(lote,))
+
+    def _locais(saida) -> Dict[str, object]:
+        return estrategia.experimental_local_results(saida)[0]
+
+    def _metricas() -> Dict[str, float]:
+        return {nome: float(valor) for nome, valor in modelo.get_metrics_result().items()}
+
+    treino_distribuido = estrategia.distribute_datasets_from_function(lambda _: treino)
+    validacao_distribuida = (
+        estrategia.distribute_datasets_from_function(lambda _: validacao) if validacao is not None else None
+    )
+
+    modelo.stop_training = False
+    lista.on_train_begin()
+    logs_epoca: Dict[str, float] = {}
+    for epoca in range(initial_epoch, epochs):
+        modelo.reset_metrics()
+        lista.on_epoch_begin(epoca)
+        iterador = iter(treino_distribuido)
+        for passo in range(passos):
+            lista.on_train_batch_begin(passo)
+            lista.on_train_batch_end(passo, _locais(passo_treino(iterador)))
+        logs_epoca = _metricas()
+
+        if validacao_distribuida is not None:
+            modelo.reset_metrics()
+            lista.on_test_begin()
+            for passo, lote in enumerate(validacao_distribuida):
+                lista.on_test_batch_begin(passo)
+                lista.on_test_batch_end(passo, _locais(passo_validacao(lote)))
+            logs_validacao = _metricas()
+            lista.on_test_end(logs_validacao)
+            logs_epoca.update({f"val_{nome}": valor for nome, valor in logs_validacao.items()})
+
+        lista.on_epoch_end(epoca, logs_epoca)
+        if modelo.stop_training:
+            break
+
+    modelo.optimizer.finalize_variable_values(modelo.trainable_weights)
+    lista.on_train_end(logs_epoca)
+    return historico
+
+
+def _trabalhador(configuracao: Dict[str, object]) -> None:
+    """Um worker do relatório de escalabilidade: `train.treinar` com a configuração recebida."""
+
+    if __package__ in (None, ""):
+        sys.path.append(str(Path(__file__).resolve().parent))
+        import train  # type: ignore
+    else:  # pragma: no cover
+        from . import train
+
+    argumentos = dict(configuracao)
+    for chave in ("data_dir", "models_dir", "reports_dir", "destino_experimento"):
+        argumentos[chave] = Path(argumentos[chave])
+    train.treinar(credenciais={}, **argumentos)
+
+
+def escalonamento(
+    workers: Sequence[int],
+    model_name: str = "cnn",
+    epochs: int = 2,
+    batch_size: int = 32,
+    learning_rate: float = 1e-4,
+    perf_profile: str = "default",
+    data_dir: Optional[Path] = None,
+    imagens: int = 256,
+) -> Dict[str, object]:
+    """Treina com cada quantidade de workers e compara passos/s e imagens/s.
+
+    O lote por worker fica fixo; com N workers, cada passo processa N lotes.
+    A vazão é a mediana das épocas depois da primeira, que inclui o tracing.
+
+    Args:
+        workers: Quantidades de processos a medir, ex.: (1, 2, 4).
+        data_dir: Pasta com train/ e validation/; sem valor, usa imagens
+            sintéticas do `benchmark`.
+        imagens: Quantidade de imagens sintéticas.
+
+    Returns:
+        Relatório com uma linha por quantidade de workers.
+    """
+
+    temporaria = Path(tempfile.mkdtemp(prefix="cardioia_escalonamento_"))
+    if data_dir is None:
+        if __package__ in (None, ""):
+            sys.path.append(str(Path(__file__).resolve().parent))
+            import benchmark  # type: ignore
+        else:  # pragma: no cover
+            from . import benchmark
+        data_dir = benchmark.gerar_imagens_sinteticas(temporaria / "dados", imagens)
+
+    linhas = []
+    try:
+        for quantidade in workers:
+            pasta = temporaria / f"workers_{quantidade}"
+            configuracao = {
+                "data_dir": os.fspath(data_dir),
+                "epochs": epochs,
+                "batch_size": batch_size,
+                "learning_rate": learning_rate,
+                "model_name": model_name,
+                "data_backend": "tfdata",
+                "perf_profile": perf_profile,
+                "intervalo_recursos": 0,
+                "checkpoint_a_cada": 0,
+                "models_dir": os.fspath(pasta / "models"),
+                "reports_dir": os.fspath(pasta / "reports"),
+                "destino_experimento": os.fspath(pasta / "experimento"),
+                "verbose": 2,
+            }
+            comando = [sys.executable, os.fspath(Path(__file__).resolve()), "trabalhador", json.dumps(configuracao)]
+            inicio = time.perf_counter()
+            codigo = lancar(comando, quantidade, logs_dir=pasta / "logs")
+            duracao = time.perf_counter() - inicio
+            if codigo:
+                print(f"[distribuido] {quantidade} workers: falhou (código {codigo}).")
+                linhas.append({"workers": quantidade, "erro": codigo})
+                continue
+            metricas = json.loads((pasta / "experimento" / "metrics.json").read_text(encoding="utf-8"))
+            passos_por_segundo = metricas["performance"]["passos_por_segundo"]
+            linhas.append(
+                {
+                    "workers": quantidade,
+                    "lote_global": batch_size * quantidade,
+                    "passos_por_segundo": passos_por_segundo,
+                    "imagens_por_segundo": round(passos_por_segundo * batch_size * quantidade, 2),
+                    "val_loss": metricas["best_metrics"].get("val_loss"),
+                    "duracao_s": round(duracao, 1),
+                }
+            )
+            print(f"[distribuido] {quantidade} workers: {passos_por_segundo} passos/s.")
+    finally:
+        shutil.rmtree(temporaria, ignore_errors=True)
+
+    base = next((linha for linha in linhas if "erro" not in linha), None)
+    for linha in linhas:
+        if base is None or "erro" in linha:
+            continue
+        aceleracao = linha["imagens_por_segundo"] / base["imagens_por_segundo"]
+        linha["aceleracao"] = round(aceleracao, 3)
+        linha["eficiencia"] = round(aceleracao * base["workers"] / linha["workers"], 3)
+
+    return {
+        "modelo": model_name,
+        "batch_size_por_worker": batch_size,
+        "epocas": epochs,
+        "perfil": perf_profile,
+        "cpus": len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count(),
+        "linhas": linhas,
+    }
+
+
+def _imprimir(relatorio: Dict[str, object]) -> None:
+    print(f"{'workers':>7}  {'lote':>5}  {'passos/s':>9}  {'imagens/s':>10}  {'aceleração':>10}  {'eficiência':>10}")
+    for linha in relatorio["linhas"]:
+        if "erro" in linha:
+            print(f"{linha['workers']:>7}  falhou (código {linha['erro']})")
+            continue
+        print(
+            f"{linha['workers']:>7}  {linha['lote_global']:>5}  {linha['passos_por_segundo']!s:>9}  "
+            f"{linha['imagens_por_segundo']:>10}  {linha.get('aceleracao', '-')!s:>10}  {linha.get('eficiencia', '-')!s:>10}"
+        )
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Treino distribuído em processos locais e relatório de escalabilidade")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    escala = subparsers.add_parser("escalonamento", help="Mede passos/s e imagens/s por quantidade de workers")
+    escala.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Quantidades de workers")
+    escala.add_argument("--model", choices=["cnn", "resnet"], default="cnn", help="Modelo treinado")
+    escala.add_argument("--epochs", type=int, default=2, help="Épocas por medida (a primeira é descartada)")
+    escala.add_argument("--batch-size", type=int, default=32, help="Lote por worker")
+    escala.add_argument("--learning-rate", type=float, default=1e-4, help="Taxa de aprendizado")
+    escala.add_argument("--perf-profile", type=str, default="default", help="Perfil de CPU (perfil_cpu.PERFIS)")
+    escala.add_argument("--data-dir", type=str, default=None, help="Dados reais; sem valor, imagens sintéticas")
+    escala.add_argument("--imagens", type=int, default=256, help="Imagens sintéticas geradas")
+    escala.add_argument(
+        "--saida",
+        type=str,
+        default=None,
+        help="JSON do relatório (padrão: reports/escalonamento_<modelo>.json)",
+    )
+
+    trabalhador = subparsers.add_parser("trabalhador", help="Uso interno: um worker do escalonamento")
+    trabalhador.add_argument("configuracao", help="Argumentos de train.treinar em JSON")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    if args.comando == "trabalhador":
+        _trabalhador(json.loads(args.configuracao))
+        return
+
+    relatorio = escalonamento(
+        args.workers,
+        model_name=args.model,
+        epochs=args.epochs,
+        batch_size=args.batch_size,
+        learning_rate=args.learning_rate,
+        perf_profile=args.perf_profile,
+        data_dir=Path(args.data_dir) if args.data_dir else None,
+        imagens=args.imagens,
+    )
+    saida = Path(args.saida) if args.saida else REPO_ROOT / "reports" / f"escalonamento_{args.model}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False), encoding="utf-8")
+    _imprimir(relatorio)
+    print(f"[distribuido] Relatório salvo em {saida}")
+
+
+__all__ = ["ajustar", "criar_estrategia", "eh_chefe", "em_cluster", "escalonamento", "lancar", "posicao"]
+
+
+if __name__ == "__main__":
+    main()
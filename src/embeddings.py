@@ -0,0 +1,192 @@
+"""Cache em disco dos embeddings da ResNet50 congelada do CardioIA.
+
+Com o backbone congelado, o GlobalAveragePooling2D de cada imagem é sempre o
+mesmo. Este módulo calcula esses vetores uma única vez (mais K vistas com
+augmentation fixa) e os guarda por hash do arquivo e hash dos pesos, de modo que
+a cabeça densa possa ser treinada em segundos sobre os vetores em cache.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Mapping, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from tensorflow.keras.applications.resnet50 import preprocess_input
+from tensorflow.keras.models import Model
+
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parent))
+    import data_preprocessing  # type: ignore
+else:  # pragma: no cover
+    from . import data_preprocessing
+
+CACHE_DIR_PADRAO = Path(__file__).resolve().parents[1] / "cache" / "embeddings"
+
+Conjunto = Tuple[np.ndarray, np.ndarray]
+
+
+def hash_arquivo(caminho: str | Path) -> str:
+    """Calcula o SHA-256 do conteúdo do arquivo."""
+
+    digest = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(1 << 20), b""):
+            digest.update(bloco)
+    return digest.hexdigest()
+
+
+def impressao_pesos(modelo: Model) -> str:
+    """Resume formato e valores de todos os pesos do modelo em um hash curto."""
+
+    digest = hashlib.sha256()
+    for peso in modelo.weights:
+        valor = np.ascontiguousarray(peso.numpy())
+        digest.update(str(valor.shape).encode("utf-8"))
+        digest.update(valor.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _ler_cache(arquivo: Path) -> Dict[str, np.ndarray]:
+    if not arquivo.exists():
+        return {}
+    with np.load(arquivo) as dados:
+        return dict(zip(dados["hashes"].tolist(), dados["embeddings"]))
+
+
+def _gravar_cache(arquivo: Path, cache: Mapping[str, np.ndarray]) -> None:
+    temporario = arquivo.with_name(f"{arquivo.stem}.tmp.npz")
+    np.savez(
+        temporario,
+        hashes=np.array(list(cache.keys())),
+        embeddings=np.stack(list(cache.values())),
+    )
+    os.replace(temporario, arquivo)
+
+
+def _calcular_vista(
+    backbone: Model,
+    caminhos: Sequence[str],
+    vista: int,
+    batch_size: int,
+    target_size: tuple[int, int],
+) -> np.ndarray:
+    """Passa as imagens pelo backbone; a vista 0 é a imagem original."""
+
+    augmentacao = data_preprocessing.criar_augmentacao(seed=vista) if vista else None
+
+    def _preparar(lote):
+        lote = tf.cast(lote, tf.float32)
+        if augmentacao is not None:
+            lote = augmentacao(lote, training=True)
+        return preprocess_input(lote)
+
+    fluxo = (
+        tf.data.Dataset.from_tensor_slices(list(caminhos))
+        .map(
+            lambda caminho: data_preprocessing.decodificar_imagem(caminho, target_size),
+            num_parallel_calls=tf.data.AUTOTUNE,
+        )
+        .batch(batch_size)
+        .map(_preparar)
+        .prefetch(tf.data.AUTOTUNE)
+    )
+
+    return backbone.predict(fluxo, verbose=0)
+
+
+def obter_embeddings(
+    backbone: Model,
+    caminhos: Sequence[str],
+    vista: int = 0,
+    batch_size: int = 32,
+    target_size: tuple[int, int] = (224, 224),
+    cache_dir: str | Path = CACHE_DIR_PADRAO,
+) -> np.ndarray:
+    """Retorna os embeddings de uma vista, calculando apenas o que falta no cache.
+
+    O arquivo de cache é identificado pelo hash dos pesos do backbone e pela vista;
+    dentro dele, cada vetor é indexado pelo SHA-256 da imagem. Assim, trocar os pesos
+    ou alterar uma imagem invalida automaticamente as entradas afetadas.
+
+    Args:
+        backbone: Modelo que produz o vetor do GlobalAveragePooling2D.
+        caminhos: Arquivos de imagem a processar.
+        vista: 0 para a imagem original, >= 1 para uma augmentation fixa (semente = vista).
+        batch_size: Tamanho dos lotes enviados ao backbone.
+        target_size: Dimensão das imagens (altura, largura).
+        cache_dir: Pasta onde os arquivos `.npz` de cache são mantidos.
+
+    Returns:
+        Matriz (N, D) na mesma ordem de `caminhos`.
+    """
+
+    pasta = Path(cache_dir)
+    pasta.mkdir(parents=True, exist_ok=True)
+    arquivo = pasta / f"{impressao_pesos(backbone)}_vista{vista}.npz"
+
+    cache = _ler_cache(arquivo)
+    hashes = [hash_arquivo(caminho) for caminho in caminhos]
+    faltantes = [indice for indice, digest in enumerate(hashes) if digest not in cache]
+
+    print(
+        f"[embeddings] {arquivo.name}: {len(hashes) - len(faltantes)} em cache, "
+        f"{len(faltantes)} a calcular."
+    )
+
+    if faltantes:
+        novos = _calcular_vista(
+            backbone,
+            [caminhos[indice] for indice in faltantes],
+            vista,
+            batch_size,
+            target_size,
+        )
+        for indice, embedding in zip(faltantes, novos):
+            cache[hashes[indice]] = embedding
+        _gravar_cache(arquivo, cache)
+
+    return np.stack([cache[digest] for digest in hashes])
+
+
+def preparar_conjuntos(
+    diretorio_base: str | Path,
+    backbone: Model,
+    vistas: int = 0,
+    batch_size: int = 32,
+    cache_dir: str | Path = CACHE_DIR_PADRAO,
+    manifesto: pd.DataFrame | None = None,
+) -> Tuple[Conjunto, Conjunto]:
+    """Monta (x, y) de treino e validação a partir dos embeddings em cache.
+
+    O treino recebe a vista original mais `vistas` vistas aumentadas de cada imagem;
+    a validação usa somente a vista original. Com `manifesto`, os splits vêm dele.
+    """
+
+    caminhos_treino, rotulos_treino, _ = data_preprocessing.listar_split(
+        diretorio_base, "train", manifesto
+    )
+    caminhos_validacao, rotulos_validacao, _ = data_preprocessing.listar_split(
+        diretorio_base, "validation", manifesto
+    )
+
+    x_treino = np.concatenate(
+        [
+            obter_embeddings(backbone, caminhos_treino, vista, batch_size, cache_dir=cache_dir)
+            for vista in range(vistas + 1)
+        ]
+    )
+    y_treino = np.tile(np.asarray(rotulos_treino, dtype="float32"), vistas + 1)
+
+    x_validacao = obter_embeddings(backbone, caminhos_validacao, 0, batch_size, cache_dir=cache_dir)
+    y_validacao = np.asarray(rotulos_validacao, dtype="float32")
+
+    return (x_treino, y_treino), (x_validacao, y_validacao)
+
+
+__all__ = ["hash_arquivo", "impressao_pesos", "obter_embeddings", "preparar_conjuntos"]
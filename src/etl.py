@@ -2,18 +2,33 @@
 
 from __future__ import annotations
 
+import argparse
+import hashlib
+import json
 import os
 import shutil
 import sys
-import tempfile
+import threading
+import time
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from io import BytesIO
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, FrozenSet, Iterable, Iterator, Sequence, Tuple
 from zipfile import ZipFile
 
+import numpy as np
 import pandas as pd
+from PIL import Image
 from sklearn.model_selection import train_test_split
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+
 if __package__ in (None, ""):
     sys.path.append(str(Path(__file__).resolve().parent))
     import auth  # type: ignore
@@ -22,6 +37,30 @@ else:  # pragma: no cover
 
 DATASET_DEFAULT = "khanfashee/nih-chest-x-ray-14-224x224-resized"
 IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg"}
+IMAGE_SIZE = (224, 224)
+CLASSES = ("cardiomegaly", "normal")
+ROTULOS_CLASSES = {"Cardiomegaly": "cardiomegaly", "No Finding": "normal"}
+AMOSTRAS_POR_CLASSE = 1000
+CSV_NOME = "Data_Entry_2017.csv"
+# Só as colunas usadas, com rótulos como category: ~10x menos memória no CSV completo.
+CSV_OPCOES = {
+    "usecols": ["Image Index", "Finding Labels"],
+    "dtype": {"Image Index": "string", "Finding Labels": "category"},
+}
+FICLONE = 0x40049409  # ioctl de reflink (btrfs, XFS, overlayfs com suporte)
+EXTRACAO_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+VALIDACAO_WORKERS = os.cpu_count() or 1
+CACHE_DIR_ENV = "CARDIOIA_CACHE_DIR"
+CACHE_DIR_PADRAO = Path.home() / ".cache" / "cardioia"
+CACHE_MANIFESTO = "cache.json"
+MANIFESTO_NOME = "manifest.csv"
+METADADOS_NOME = "metadados.csv"
+QUARENTENA_NOME = "quarentena.csv"
+VALIDACAO_CACHE = "validacao.csv"
+EXTRAIDO_NOME = "extraido"
+FORMATOS = ("diretorio", "manifesto")
+
+MembroZip = Tuple[Path, str]
 
 
 def _extrair_arquivos(raiz: Path) -> None:
@@ -37,13 +76,243 @@ def _extrair_arquivos(raiz: Path) -> None:
 def _encontrar_csv(base: Path) -> Path:
     """Localiza o arquivo Data_Entry_2017.csv dentro dos downloads."""
 
-    for caminho in base.rglob("Data_Entry_2017.csv"):
+    for caminho in base.rglob(CSV_NOME):
         return caminho
     raise FileNotFoundError(
-        "Arquivo 'Data_Entry_2017.csv' não encontrado no dataset baixado."
+        f"Arquivo '{CSV_NOME}' não encontrado no dataset baixado."
     )
 
 
+def _ler_csv_zip(arquivos_zip: Sequence[Path]) -> pd.DataFrame:
+    """Lê o Data_Entry_2017.csv direto de dentro dos ZIPs, sem extraí-los."""
+
+    for arquivo in arquivos_zip:
+        with ZipFile(arquivo) as zip_ref:
+            for nome in zip_ref.namelist():
+                if Path(nome).name == CSV_NOME:
+                    with zip_ref.open(nome) as conteudo:
+                        return pd.read_csv(conteudo, **CSV_OPCOES)
+    raise FileNotFoundError(
+        f"Arquivo '{CSV_NOME}' não encontrado nos ZIPs baixados."
+    )
+
+
+def _indexar_zip(arquivos_zip: Sequence[Path]) -> Dict[str, MembroZip]:
+    """Cria o índice nome do arquivo -> (zip, membro) a partir do diretório central."""
+
+    indice: Dict[str, MembroZip] = {}
+    for arquivo in arquivos_zip:
+        with ZipFile(arquivo) as zip_ref:
+            for info in zip_ref.infolist():
+                nome = Path(info.filename)
+                if not info.is_dir() and nome.suffix.lower() in IMAGE_EXTENSIONS:
+                    indice.setdefault(nome.name, (arquivo, info.filename))
+
+    if not indice:
+        raise FileNotFoundError("Nenhuma imagem foi encontrada nos ZIPs baixados.")
+
+    return indice
+
+
+def _extrair_membros(tarefas: Iterable[Tuple[MembroZip, Path]]) -> None:
+    """Extrai apenas os membros selecionados, em paralelo.
+
+    Cada thread mantém seus próprios handles de ZipFile para não disputar o
+    ponteiro de leitura do arquivo.
+    """
+
+    local = threading.local()
+    abertos: list[ZipFile] = []
+    trava = threading.Lock()
+
+    def _extrair(tarefa: Tuple[MembroZip, Path]) -> None:
+        (arquivo, membro), destino = tarefa
+        handles: Dict[Path, ZipFile] | None = getattr(local, "handles", None)
+        if handles is None:
+            handles = local.handles = {}
+        if arquivo not in handles:
+            handles[arquivo] = ZipFile(arquivo)
+            with trava:
+                abertos.append(handles[arquivo])
+        # Grava ao lado e renomeia: uma extração interrompida não deixa PNG truncado no destino.
+        temporario = destino.with_suffix(destino.suffix + ".tmp")
+        with handles[arquivo].open(membro) as origem, open(temporario, "wb") as saida:
+            shutil.copyfileobj(origem, saida, 1 << 20)
+        os.replace(temporario, destino)
+
+    try:
+        with ThreadPoolExecutor(max_workers=EXTRACAO_WORKERS) as executor:
+            list(executor.map(_extrair, tarefas))
+    finally:
+        for zip_ref in abertos:
+            zip_ref.close()
+
+
+def _pendentes_extracao(origens: pd.Series, destinos: pd.Series) -> pd.Series:
+    """Marca as imagens ainda não extraídas: ausentes ou com tamanho diferente do membro no ZIP."""
+
+    abertos: Dict[Path, ZipFile] = {}
+    pendentes = []
+    try:
+        for (arquivo, membro), destino in zip(origens, destinos):
+            if arquivo not in abertos:
+                abertos[arquivo] = ZipFile(arquivo)
+            try:
+                pendentes.append(destino.stat().st_size != abertos[arquivo].getinfo(membro).file_size)
+            except FileNotFoundError:
+                pendentes.append(True)
+    finally:
+        for zip_ref in abertos.values():
+            zip_ref.close()
+    return pd.Series(pendentes, index=destinos.index, dtype=bool)
+
+
+@contextmanager
+def _cronometrar(etapa: str, tempos: Dict[str, float]) -> Iterator[None]:
+    """Acumula em `tempos` a duração da etapa."""
+
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        tempos[etapa] = tempos.get(etapa, 0.0) + time.perf_counter() - inicio
+
+
+def _reflink(origem: Path, destino: Path) -> bool:
+    """Tenta clonar o arquivo via FICLONE (copy-on-write); retorna se conseguiu."""
+
+    if fcntl is None:
+        return False
+    try:
+        with open(origem, "rb") as fonte, open(destino, "wb") as alvo:
+            fcntl.ioctl(alvo.fileno(), FICLONE, fonte.fileno())
+        return True
+    except OSError:
+        destino.unlink(missing_ok=True)
+        return False
+
+
+def _vincular_ou_copiar(tarefa: Tuple[Path, Path]) -> str:
+    """Materializa o arquivo por hardlink, reflink ou cópia, nessa ordem."""
+
+    origem, destino = tarefa
+    try:
+        os.link(origem, destino)
+        return "hardlink"
+    except OSError:
+        pass
+    if _reflink(origem, destino):
+        return "reflink"
+    shutil.copy2(origem, destino)
+    return "copia"
+
+
+def _materializar_arquivos(tarefas: Sequence[Tuple[Path, Path]]) -> Counter[str]:
+    """Materializa os arquivos em um pool de threads e conta os métodos usados."""
+
+    with ThreadPoolExecutor(max_workers=EXTRACAO_WORKERS) as executor:
+        return Counter(executor.map(_vincular_ou_copiar, tarefas))
+
+
+# Estado dos processos de validação: hashes já conhecidos e handles de ZIP abertos.
+_HASHES_CONHECIDOS: FrozenSet[str] = frozenset()
+_ZIPS_ABERTOS: Dict[Path, ZipFile] = {}
+
+
+def _iniciar_validador(conhecidos: FrozenSet[str]) -> None:
+    global _HASHES_CONHECIDOS
+    _HASHES_CONHECIDOS = conhecidos
+
+
+def _ler_bytes(origem: Path | MembroZip) -> bytes:
+    if isinstance(origem, tuple):
+        arquivo, membro = origem
+        if arquivo not in _ZIPS_ABERTOS:
+            _ZIPS_ABERTOS[arquivo] = ZipFile(arquivo)
+        return _ZIPS_ABERTOS[arquivo].read(membro)
+    return Path(origem).read_bytes()
+
+
+def _validar_imagem(origem: Path | MembroZip) -> Dict[str, object]:
+    """Decodifica a imagem por completo e coleta dimensões, modo e SHA-256.
+
+    Imagens cujo hash já está no cache não são decodificadas novamente.
+    """
+
+    try:
+        dados = _ler_bytes(origem)
+    except Exception as exc:  # noqa: BLE001
+        return {"sha256": "", "valida": False, "erro": f"leitura: {exc}"}
+
+    digest = hashlib.sha256(dados).hexdigest()
+    if digest in _HASHES_CONHECIDOS:
+        return {"sha256": digest, "em_cache": True}
+
+    try:
+        with Image.open(BytesIO(dados)) as imagem:
+            imagem.load()
+            return {
+                "sha256": digest,
+                "largura": imagem.width,
+                "altura": imagem.height,
+                "modo": imagem.mode,
+                "valida": True,
+                "erro": "",
+            }
+    except Exception as exc:  # noqa: BLE001
+        return {"sha256": digest, "valida": False, "erro": str(exc)}
+
+
+def _validar_imagens(plano: pd.DataFrame, cache_path: Path) -> pd.DataFrame:
+    """Valida as imagens do plano em um pool de processos, usando o cache por hash.
+
+    O cache (`validacao.csv`) guarda sha256, largura, altura, modo, valida e erro;
+    entradas novas são acrescentadas a cada execução. Retorna o plano com essas
+    colunas anexadas.
+    """
+
+    colunas = ["sha256", "largura", "altura", "modo", "valida", "erro"]
+    if cache_path.exists():
+        cache = pd.read_csv(cache_path, dtype={"sha256": str, "modo": str, "erro": str})
+    else:
+        cache = pd.DataFrame(columns=colunas)
+
+    with ProcessPoolExecutor(
+        max_workers=VALIDACAO_WORKERS,
+        initializer=_iniciar_validador,
+        initargs=(frozenset(cache["sha256"]),),
+    ) as executor:
+        resultados = list(executor.map(_validar_imagem, plano["origem"], chunksize=64))
+
+    conhecidos = cache.set_index("sha256").to_dict("index")
+    linhas = [
+        {"sha256": resultado["sha256"], **conhecidos[resultado["sha256"]]}
+        if resultado.get("em_cache")
+        else resultado
+        for resultado in resultados
+    ]
+
+    novos = pd.DataFrame(
+        [linha for linha, resultado in zip(linhas, resultados) if linha["sha256"] and not resultado.get("em_cache")],
+        columns=colunas,
+    )
+    if not novos.empty:
+        cache = pd.concat([cache, novos], ignore_index=True).drop_duplicates("sha256", keep="last")
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache.to_csv(cache_path, index=False)
+
+    em_cache = sum(1 for resultado in resultados if resultado.get("em_cache"))
+    print(f"[etl] Validação: {len(resultados) - em_cache} imagens decodificadas, {em_cache} já conhecidas.")
+
+    validados = pd.concat(
+        [plano.reset_index(drop=True), pd.DataFrame(linhas, columns=colunas)],
+        axis=1,
+    )
+    validados["valida"] = validados["valida"].astype(bool)
+    validados[["largura", "altura"]] = validados[["largura", "altura"]].astype("Int64")
+    return validados
+
+
 def _amostrar_registros(df: pd.DataFrame, rotulo: str, n_amostras: int) -> pd.DataFrame:
     """Seleciona uma quantidade fixa de amostras para o rótulo informado."""
 
@@ -75,57 +344,219 @@ def _indexar_imagens(base: Path) -> Dict[str, Path]:
     return indice
 
 
-def _preparar_splits(downloads_dir: Path, data_dir: Path) -> Tuple[Path, Path]:
-    """Filtra, amostra, divide e copia as imagens para treino/validação."""
+def _gerar_memmap(store_dir: Path, plano: pd.DataFrame) -> None:
+    """Grava cada split como um único array uint8 (N, 224, 224) em tons de cinza.
+
+    O arquivo `<split>.npy` pode ser aberto com `np.load(..., mmap_mode="r")` e
+    compartilhado por vários processos via page cache; o `<split>.csv` ao lado
+    informa a imagem, a classe e o rótulo de cada linha.
+    """
+
+    store_dir.mkdir(parents=True, exist_ok=True)
 
-    csv_path = _encontrar_csv(downloads_dir)
-    df = pd.read_csv(csv_path)
+    for split_nome, itens in plano.groupby("split", sort=False):
+        imagens = np.lib.format.open_memmap(
+            store_dir / f"{split_nome}.npy",
+            mode="w+",
+            dtype=np.uint8,
+            shape=(len(itens), *IMAGE_SIZE),
+        )
+
+        for posicao, origem in enumerate(itens["caminho"]):
+            with Image.open(origem) as imagem:
+                imagem = imagem.convert("L")
+                if imagem.size != IMAGE_SIZE[::-1]:
+                    imagem = imagem.resize(IMAGE_SIZE[::-1], Image.NEAREST)
+                imagens[posicao] = np.asarray(imagem)
 
-    df_cardiomegaly = df[df["Finding Labels"] == "Cardiomegaly"]
-    df_normal = df[df["Finding Labels"] == "No Finding"]
+        imagens.flush()
+        del imagens
+
+        itens[["imagem", "classe", "rotulo"]].reset_index(drop=True).to_csv(
+            store_dir / f"{split_nome}.csv", index_label="indice"
+        )
 
-    cardio_amostra = _amostrar_registros(df_cardiomegaly, "cardiomegaly", 1000)
-    normal_amostra = _amostrar_registros(df_normal, "normal", 1000)
+        print(f"[etl] Store memmap '{split_nome}': {len(itens)} imagens em {store_dir}")
 
-    dataset_balanceado = pd.concat([cardio_amostra, normal_amostra], ignore_index=True)
+
+def _gravar_manifesto(manifesto_path: Path, plano: pd.DataFrame, com_hash: bool) -> None:
+    """Grava o manifesto (caminho, classe, rotulo, split[, sha256]) consumido pelo treino."""
+
+    manifesto = plano[["caminho", "imagem", "classe", "rotulo", "split"]].copy()
+    if com_hash and "sha256" in plano:
+        manifesto["sha256"] = plano["sha256"]
+    elif com_hash:
+        with ThreadPoolExecutor(max_workers=EXTRACAO_WORKERS) as executor:
+            manifesto["sha256"] = list(executor.map(_sha256, map(Path, manifesto["caminho"])))
+
+    manifesto_path.parent.mkdir(parents=True, exist_ok=True)
+    manifesto.to_csv(manifesto_path, index=False)
+    print(f"[etl] Manifesto com {len(manifesto)} imagens salvo em {manifesto_path}")
+
+
+def _planejar_amostra(df: pd.DataFrame, amostras_por_classe: int) -> pd.DataFrame:
+    """Filtra e amostra os registros de cada classe; retorna imagem e classe."""
+
+    classes = df["Finding Labels"].map(ROTULOS_CLASSES)
+    df = df.assign(label=classes.astype("object")).dropna(subset=["label"])
+
+    amostra = pd.concat(
+        [
+            _amostrar_registros(df[df["label"] == classe], classe, amostras_por_classe)
+            for classe in CLASSES
+        ],
+        ignore_index=True,
+    )
+    return amostra.rename(columns={"Image Index": "imagem", "label": "classe"})[["imagem", "classe"]]
+
+
+def _dividir_amostra(amostra: pd.DataFrame) -> pd.DataFrame:
+    """Divide a amostra em treino/validação estratificados, preenchendo `split`."""
 
     treino_df, validacao_df = train_test_split(
-        dataset_balanceado,
+        amostra,
         test_size=0.2,
         random_state=42,
-        stratify=dataset_balanceado["label"],
+        stratify=amostra["classe"],
+    )
+    return pd.concat(
+        [treino_df.assign(split="train"), validacao_df.assign(split="validation")],
+        ignore_index=True,
     )
 
-    if data_dir.exists():
-        shutil.rmtree(data_dir)
-
-    train_dir = data_dir / "train"
-    validation_dir = data_dir / "validation"
-
-    for base_dir in (train_dir, validation_dir):
-        for classe in ("cardiomegaly", "normal"):
-            (base_dir / classe).mkdir(parents=True, exist_ok=True)
 
-    indice_imagens = _indexar_imagens(downloads_dir)
-    faltantes = 0
+def _preparar_splits(
+    downloads_dir: Path,
+    data_dir: Path,
+    memmap: bool = False,
+    streaming: bool = False,
+    formato: str = "diretorio",
+    com_hash: bool = False,
+    amostras_por_classe: int = AMOSTRAS_POR_CLASSE,
+    validar: bool = True,
+) -> Tuple[Path, Path]:
+    """Filtra, amostra, divide e materializa as imagens para treino/validação.
+
+    O plano (amostra x índice de imagens) é montado como operações de DataFrame;
+    a materialização roda em um pool de threads e usa hardlink ou reflink antes
+    de recorrer à cópia. Ao final, o tempo de cada etapa é exibido.
+
+    Com `validar=True`, cada imagem amostrada é decodificada em um pool de
+    processos antes da divisão; as corrompidas ficam de fora e são listadas em
+    `data_dir/quarentena.csv`. Dimensões, modo e hash de cada imagem vão para
+    `data_dir/metadados.csv` e para o cache de validação, que evita decodificar
+    de novo imagens já conhecidas.
+
+    Com `streaming=True`, os ZIPs de `downloads_dir` não são extraídos: o CSV e o
+    índice de imagens vêm do diretório central e só as amostras são lidas.
+    Com `formato="manifesto"` (exige `streaming`), as amostras são extraídas uma
+    única vez para `downloads_dir/imagens` e o treino passa a ler
+    `data_dir/manifest.csv`, sem copiar imagens para `data_dir` nem apagá-lo.
+    Com `memmap=True`, também grava o store uint8 em `data_dir/store`.
+    """
+
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconhecido: {formato}. Opções: {', '.join(FORMATOS)}")
+    if formato == "manifesto" and not streaming:
+        raise ValueError("O formato 'manifesto' exige a leitura direta dos ZIPs (streaming).")
+
+    tempos: Dict[str, float] = {}
+
+    with _cronometrar("metadados", tempos):
+        if streaming:
+            arquivos_zip = sorted(downloads_dir.rglob("*.zip"))
+            df = _ler_csv_zip(arquivos_zip)
+        else:
+            df = pd.read_csv(_encontrar_csv(downloads_dir), **CSV_OPCOES)
+
+    with _cronometrar("indice", tempos):
+        indice = _indexar_zip(arquivos_zip) if streaming else _indexar_imagens(downloads_dir)
+        indice_df = pd.DataFrame(
+            {
+                "imagem": pd.Series(list(indice.keys()), dtype="string"),
+                "origem": pd.Series(list(indice.values()), dtype="object"),
+            }
+        )
 
-    for split_nome, frame in (("train", treino_df), ("validation", validacao_df)):
-        for _, linha in frame.iterrows():
-            imagem = linha["Image Index"]
-            classe = linha["label"]
-            origem = indice_imagens.get(imagem)
-            if origem is None:
-                faltantes += 1
-                print(f"[etl] Aviso: imagem não encontrada '{imagem}'.")
-                continue
+    with _cronometrar("planejamento", tempos):
+        plano = _planejar_amostra(df, amostras_por_classe).merge(indice_df, on="imagem", how="left")
+
+        ausentes = plano["origem"].isna()
+        for imagem in plano.loc[ausentes, "imagem"]:
+            print(f"[etl] Aviso: imagem não encontrada '{imagem}'.")
+        if ausentes.any():
+            print(
+                f"[etl] Aviso: {int(ausentes.sum())} imagens não foram copiadas por ausência no pacote baixado."
+            )
+        plano = plano[~ausentes].reset_index(drop=True)
+
+    quarentena = pd.DataFrame()
+    if validar:
+        with _cronometrar("validacao", tempos):
+            plano = _validar_imagens(plano, _raiz_cache() / VALIDACAO_CACHE)
+            quarentena = plano[~plano["valida"]]
+            for imagem, erro in zip(quarentena["imagem"], quarentena["erro"]):
+                print(f"[etl] Aviso: imagem corrompida em quarentena '{imagem}': {erro}")
+            plano = plano[plano["valida"]].reset_index(drop=True)
+
+    with _cronometrar("planejamento", tempos):
+        plano = _dividir_amostra(plano)
+        plano["rotulo"] = plano["classe"].map({classe: indice for indice, classe in enumerate(CLASSES)})
+        if formato == "manifesto":
+            # Extraída uma vez e reaproveitada por re-splits e amostras maiores.
+            base = os.fspath(downloads_dir / "imagens") + os.sep
+            plano["caminho"] = base + plano["imagem"]
+        else:
+            base = os.fspath(data_dir) + os.sep
+            plano["caminho"] = base + plano["split"] + os.sep + plano["classe"] + os.sep + plano["imagem"]
 
-            destino = data_dir / split_nome / classe / imagem
-            shutil.copy2(origem, destino)
+    train_dir = data_dir / "train"
+    validation_dir = data_dir / "validation"
 
-    if faltantes:
-        print(
-            f"[etl] Aviso: {faltantes} imagens não foram copiadas por ausência no pacote baixado."
-        )
+    with _cronometrar("materializacao", tempos):
+        if formato == "manifesto":
+            (downloads_dir / "imagens").mkdir(parents=True, exist_ok=True)
+        else:
+            if data_dir.exists():
+                shutil.rmtree(data_dir)
+
+            for base_dir in (train_dir, validation_dir):
+                for classe in CLASSES:
+                    (base_dir / classe).mkdir(parents=True, exist_ok=True)
+
+        destinos = plano["caminho"].map(Path)
+        if formato == "manifesto":
+            pendentes = _pendentes_extracao(plano["origem"], destinos)
+        else:
+            pendentes = pd.Series(True, index=plano.index)
+        tarefas = list(zip(plano.loc[pendentes, "origem"], destinos[pendentes]))
+
+        if streaming:
+            _extrair_membros(tarefas)
+            print(f"[etl] {len(tarefas)} imagens extraídas do ZIP.")
+        else:
+            metodos = _materializar_arquivos(tarefas)
+            resumo = ", ".join(f"{metodo}: {total}" for metodo, total in sorted(metodos.items()))
+            print(f"[etl] {len(tarefas)} imagens materializadas ({resumo or 'nenhuma'}).")
+
+    data_dir.mkdir(parents=True, exist_ok=True)
+    colunas_metadados = ["imagem", "classe", "split"] + [
+        coluna for coluna in ("sha256", "largura", "altura", "modo") if coluna in plano
+    ]
+    plano[colunas_metadados].to_csv(data_dir / METADADOS_NOME, index=False)
+    if not quarentena.empty:
+        quarentena[["imagem", "classe", "sha256", "erro"]].to_csv(data_dir / QUARENTENA_NOME, index=False)
+        print(f"[etl] {len(quarentena)} imagens em quarentena listadas em {data_dir / QUARENTENA_NOME}")
+
+    if formato == "manifesto":
+        with _cronometrar("manifesto", tempos):
+            _gravar_manifesto(data_dir / MANIFESTO_NOME, plano, com_hash)
+
+    if memmap:
+        with _cronometrar("memmap", tempos):
+            _gerar_memmap(data_dir / "store", plano)
+
+    print("[etl] Tempo por etapa: " + " | ".join(f"{etapa} {duracao:.2f}s" for etapa, duracao in tempos.items()))
 
     return train_dir, validation_dir
 
@@ -145,7 +576,25 @@ def _contar_imagens(diretorio: Path) -> Counter[str]:
 
 
 def _imprimir_estatisticas(data_dir: Path) -> None:
-    """Exibe a distribuição de classes para treino e validação."""
+    """Exibe a distribuição de classes para treino e validação.
+
+    Usa o `metadados.csv` gravado pelo ETL quando disponível (inclusive no formato
+    manifesto); caso contrário, percorre as pastas de cada split.
+    """
+
+    metadados_path = data_dir / METADADOS_NOME
+    if metadados_path.exists():
+        metadados = pd.read_csv(metadados_path)
+        for split, frame in metadados.groupby("split", sort=False):
+            contagem = frame["classe"].value_counts().sort_index()
+            print(f"[etl] {split} -> {len(frame)} imagens")
+            for classe, quantidade in contagem.items():
+                print(f"    - {classe}: {quantidade} ({quantidade / len(frame) * 100:.2f}%)")
+        if "modo" in metadados:
+            dimensoes = metadados["largura"].astype(str) + "x" + metadados["altura"].astype(str)
+            print(f"[etl] Dimensões: {dimensoes.value_counts().to_dict()}")
+            print(f"[etl] Modos: {metadados['modo'].value_counts().to_dict()}")
+        return
 
     for split in ("train", "validation"):
         split_dir = data_dir / split
@@ -161,8 +610,111 @@ def _imprimir_estatisticas(data_dir: Path) -> None:
             print(f"    - {classe}: {quantidade} ({percentual:.2f}%)")
 
 
-def executar_etl() -> None:
-    """Pipeline completo: autentica, baixa, organiza e reporta estatísticas."""
+def _raiz_cache() -> Path:
+    """Pasta raiz do cache persistente do ETL."""
+
+    return Path(os.environ.get(CACHE_DIR_ENV) or CACHE_DIR_PADRAO)
+
+
+def _diretorio_cache(dataset: str) -> Tuple[Path, str]:
+    """Resolve a pasta de cache persistente e o identificador versionado do dataset.
+
+    A versão vem do próprio slug (`dono/nome/versao`) ou de
+    `CARDIOIA_KAGGLE_DATASET_VERSION`; sem nenhuma das duas, usa "latest".
+
+    Raises:
+        ValueError: Slug fora do formato `dono/nome[/versao]`.
+    """
+
+    partes = dataset.split("/")
+    if len(partes) not in (2, 3) or not all(partes):
+        raise ValueError(f"Dataset inválido: {dataset!r}. Use 'dono/nome' ou 'dono/nome/versao'.")
+    if len(partes) == 3:
+        versao = partes[2]
+    else:
+        versao = os.environ.get("CARDIOIA_KAGGLE_DATASET_VERSION", "latest")
+
+    dataset_versionado = dataset if len(partes) == 3 or versao == "latest" else f"{dataset}/{versao}"
+    return _raiz_cache() / "datasets" / f"{partes[0]}__{partes[1]}" / versao, dataset_versionado
+
+
+def _sha256(caminho: Path) -> str:
+    """Calcula o SHA-256 do arquivo em blocos de 8MB."""
+
+    digest = hashlib.sha256()
+    with caminho.open("rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(8 << 20), b""):
+            digest.update(bloco)
+    return digest.hexdigest()
+
+
+def _cache_valido(cache_dir: Path, verificar: bool = False) -> bool:
+    """Confere se os arquivos registrados no cache existem e não mudaram desde o download.
+
+    Tamanho e `st_mtime_ns` iguais aos do manifesto bastam; o SHA-256 do ZIP
+    inteiro só é recalculado com `verificar=True`. Um arquivo alterado invalida
+    o cache, e o download seguinte (que retoma ou pula o que já está completo)
+    recalcula os checksums.
+    """
+
+    manifesto = cache_dir / CACHE_MANIFESTO
+    if not manifesto.exists():
+        return False
+
+    arquivos: Dict[str, Dict[str, object]] = json.loads(manifesto.read_text(encoding="utf-8")).get("arquivos", {})
+    if not arquivos:
+        return False
+
+    for nome, registro in arquivos.items():
+        caminho = cache_dir / nome
+        if not caminho.exists() or not isinstance(registro, dict):
+            return False
+        estado = caminho.stat()
+        if (registro.get("tamanho"), registro.get("mtime_ns")) != (estado.st_size, estado.st_mtime_ns):
+            print(f"[etl] Aviso: '{nome}' mudou desde o download; conferindo com o Kaggle.")
+            return False
+        if verificar and _sha256(caminho) != registro["sha256"]:
+            print(f"[etl] Aviso: checksum inválido para '{nome}' no cache; será baixado novamente.")
+            caminho.unlink(missing_ok=True)
+            manifesto.unlink(missing_ok=True)
+            return False
+
+    return True
+
+
+def _extrair_cache(cache_dir: Path) -> Path:
+    """Extrai os ZIPs do cache para `cache_dir/extraido`, uma vez por versão dos ZIPs.
+
+    A pasta guarda em `extraido.json` os registros (SHA-256, tamanho, mtime)
+    dos ZIPs de que veio; enquanto eles baterem com o `cache.json`, a extração
+    é reaproveitada. A extração vai para uma pasta temporária ao lado e só é
+    renomeada no fim, então uma interrupção não deixa uma árvore pela metade.
+    """
+
+    destino = cache_dir / EXTRAIDO_NOME
+    marcador = destino / "extraido.json"
+    arquivos = json.loads((cache_dir / CACHE_MANIFESTO).read_text(encoding="utf-8"))["arquivos"]
+    if marcador.exists() and json.loads(marcador.read_text(encoding="utf-8")) == arquivos:
+        print(f"[etl] Usando extração em cache: {destino}")
+        return destino
+
+    temporario = cache_dir / f"{EXTRAIDO_NOME}.tmp"
+    shutil.rmtree(temporario, ignore_errors=True)
+    temporario.mkdir(parents=True)
+    for zip_path in sorted(cache_dir.glob("*.zip")):
+        with ZipFile(zip_path) as zip_ref:
+            zip_ref.extractall(temporario)
+    _extrair_arquivos(temporario)
+    (temporario / "extraido.json").write_text(json.dumps(arquivos, indent=2), encoding="utf-8")
+
+    shutil.rmtree(destino, ignore_errors=True)
+    os.replace(temporario, destino)
+    print(f"[etl] ZIPs extraídos em {destino}")
+    return destino
+
+
+def _criar_api():
+    """Autentica no Kaggle e retorna uma instância de `KaggleApi`."""
 
     credenciais = auth.obter_credenciais()
     auth.configurar_kaggle(credenciais)
@@ -175,34 +727,172 @@ def executar_etl() -> None:
             "Instale-o com 'pip install kaggle'."
         ) from exc
 
-    dataset_alvo = os.environ.get("CARDIOIA_KAGGLE_DATASET", DATASET_DEFAULT)
-    print(f"[etl] Baixando dataset: {dataset_alvo}")
-
     api = KaggleApi()
     api.authenticate()
+    return api
+
+
+def _baixar_para_cache(dataset: str, cache_dir: Path) -> None:
+    """Baixa (ou retoma) o ZIP do dataset no cache e registra checksum, tamanho e mtime.
+
+    O download vai direto para a pasta persistente sem descompactar; com
+    `force=False`, o cliente do Kaggle retoma arquivos parciais de execuções
+    interrompidas e pula o download se a cópia local já estiver atualizada.
+    """
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    api = _criar_api()
+    api.dataset_download_files(dataset, path=str(cache_dir), force=False, unzip=False, quiet=False)
+
+    arquivos = {
+        zip_path.name: {
+            "sha256": _sha256(zip_path),
+            "tamanho": zip_path.stat().st_size,
+            "mtime_ns": zip_path.stat().st_mtime_ns,
+        }
+        for zip_path in sorted(cache_dir.glob("*.zip"))
+    }
+    if not arquivos:
+        raise FileNotFoundError(f"Nenhum ZIP encontrado em {cache_dir} após o download.")
+
+    (cache_dir / CACHE_MANIFESTO).write_text(
+        json.dumps(
+            {
+                "dataset": dataset,
+                "baixado_em": datetime.utcnow().isoformat(timespec="seconds"),
+                "arquivos": arquivos,
+            },
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
 
-    temp_dir = Path(tempfile.mkdtemp(prefix="cardioia_"))
-    downloads_dir = temp_dir / "downloads"
-    downloads_dir.mkdir(parents=True, exist_ok=True)
-
-    try:
-        api.dataset_download_files(dataset_alvo, path=str(downloads_dir), unzip=True, quiet=False)
-        _extrair_arquivos(downloads_dir)
-
-        repo_root = Path(__file__).resolve().parents[1]
-        data_dir = repo_root / "data"
 
-        _preparar_splits(downloads_dir, data_dir)
+def executar_etl(
+    memmap: bool = False,
+    streaming: bool = False,
+    atualizar_cache: bool = False,
+    formato: str = "diretorio",
+    com_hash: bool = False,
+    amostras_por_classe: int = AMOSTRAS_POR_CLASSE,
+    validar: bool = True,
+    verificar_cache: bool = False,
+) -> None:
+    """Pipeline completo: autentica, baixa, organiza e reporta estatísticas.
+
+    O download fica em um cache persistente (`CARDIOIA_CACHE_DIR`, padrão
+    `~/.cache/cardioia`). Com o cache válido, o ETL roda sem acessar a rede.
+
+    Args:
+        memmap: Se verdadeiro, também gera o store uint8 memory-mapped em `data/store`.
+        streaming: Se verdadeiro, lê o ZIP do cache e extrai apenas as imagens amostradas.
+        atualizar_cache: Consulta o Kaggle mesmo com cache válido, baixando se houver versão nova.
+        formato: "diretorio" copia as imagens para `data/<split>/<classe>`; "manifesto"
+            extrai as amostras uma vez para o cache e grava apenas `data/manifest.csv`.
+        com_hash: Inclui o SHA-256 de cada imagem no manifesto.
+        amostras_por_classe: Máximo de imagens amostradas por classe.
+        validar: Decodifica as imagens amostradas e coloca as corrompidas em quarentena.
+        verificar_cache: Recalcula o SHA-256 dos ZIPs em cache em vez de confiar em tamanho e mtime.
+    """
 
+    dataset_alvo = os.environ.get("CARDIOIA_KAGGLE_DATASET", DATASET_DEFAULT)
+    cache_dir, dataset_versionado = _diretorio_cache(dataset_alvo)
+
+    if atualizar_cache or not _cache_valido(cache_dir, verificar=verificar_cache):
+        print(f"[etl] Baixando dataset: {dataset_versionado} -> {cache_dir}")
+        _baixar_para_cache(dataset_versionado, cache_dir)
+    else:
+        print(f"[etl] Usando dataset em cache: {cache_dir}")
+
+    repo_root = Path(__file__).resolve().parents[1]
+    data_dir = repo_root / "data"
+
+    if streaming or formato == "manifesto":
+        _preparar_splits(
+            cache_dir,
+            data_dir,
+            memmap=memmap,
+            streaming=True,
+            formato=formato,
+            com_hash=com_hash,
+            amostras_por_classe=amostras_por_classe,
+            validar=validar,
+        )
         _imprimir_estatisticas(data_dir)
         print("[etl] ETL concluído com sucesso.")
-    finally:
-        shutil.rmtree(temp_dir, ignore_errors=True)
+        return
+
+    _preparar_splits(
+        _extrair_cache(cache_dir),
+        data_dir,
+        memmap=memmap,
+        amostras_por_classe=amostras_por_classe,
+        validar=validar,
+    )
+    _imprimir_estatisticas(data_dir)
+    print("[etl] ETL concluído com sucesso.")
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="ETL do dataset NIH Chest X-ray para o CardioIA")
+    parser.add_argument(
+        "--memmap",
+        action="store_true",
+        help="Gera também o store uint8 memory-mapped (data/store/<split>.npy + .csv)",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Lê CSV e imagens amostradas direto do ZIP, sem extrair o dataset inteiro",
+    )
+    parser.add_argument(
+        "--atualizar-cache",
+        action="store_true",
+        help="Consulta o Kaggle mesmo com o cache local válido",
+    )
+    parser.add_argument(
+        "--verificar-cache",
+        action="store_true",
+        help="Recalcula o SHA-256 dos ZIPs em cache (por padrão, bastam tamanho e mtime)",
+    )
+    parser.add_argument(
+        "--formato",
+        choices=FORMATOS,
+        default="diretorio",
+        help="'diretorio' copia imagens para data/<split>/<classe>; 'manifesto' grava só data/manifest.csv",
+    )
+    parser.add_argument(
+        "--hash",
+        action="store_true",
+        help="Inclui o SHA-256 de cada imagem no manifesto",
+    )
+    parser.add_argument(
+        "--amostras-por-classe",
+        type=int,
+        default=AMOSTRAS_POR_CLASSE,
+        help="Máximo de imagens amostradas por classe",
+    )
+    parser.add_argument(
+        "--sem-validacao",
+        action="store_true",
+        help="Pula a decodificação de integridade das imagens amostradas",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
+    args = _parse_args()
     try:
-        executar_etl()
+        executar_etl(
+            memmap=args.memmap,
+            streaming=args.streaming,
+            atualizar_cache=args.atualizar_cache,
+            formato=args.formato,
+            com_hash=args.hash,
+            amostras_por_classe=args.amostras_por_classe,
+            validar=not args.sem_validacao,
+            verificar_cache=args.verificar_cache,
+        )
     except Exception as exc:  # noqa: BLE001
         print(f"[etl] Falha no ETL: {exc}")
         raise
@@ -0,0 +1,337 @@
+"""Exporta o modelo treinado do CardioIA para TFLite quantizado e compara as variantes.
+
+Gera três artefatos em `models/` com quantização pós-treino:
+
+* `model_dynamic.tflite`: pesos int8, ativações em float (dynamic range);
+* `model_float16.tflite`: pesos em float16;
+* `model_int8.tflite`: pesos e ativações int8, calibrado com uma amostra do split
+  de validação.
+
+Também grava `model_savedmodel/`, um SavedModel com a assinatura fixa
+1x224x224x3 já rastreada, que o app carrega sem desserializar o `.h5`.
+
+Em seguida avalia o modelo Keras original e cada artefato sobre a validação,
+registrando acurácia, concordância com o modelo float, latência por imagem,
+tamanho e partida a frio (processo novo até a primeira predição) em
+`reports/quantizacao.json`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Sequence
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parent))
+    import data_preprocessing  # type: ignore
+    import inferencia  # type: ignore
+else:  # pragma: no cover
+    from . import data_preprocessing, inferencia
+
+VARIANTES = ("dynamic", "float16", "int8")
+REPORTS_DIR = Path(__file__).resolve().parents[1] / "reports"
+
+
+def _carregar_amostra(caminhos: Sequence[str]) -> np.ndarray:
+    """Decodifica as imagens em um lote uint8 (N, 224, 224, 3)."""
+
+    lote = np.empty((len(caminhos), *inferencia.IMAGE_SIZE, 3), dtype="uint8")
+    for indice, caminho in enumerate(caminhos):
+        with Image.open(caminho) as imagem:
+            lote[indice] = inferencia.redimensionar(imagem)
+    return lote
+
+
+def converter_tflite(modelo, variante: str, calibracao: np.ndarray | None = None) -> bytes:
+    """Converte o modelo Keras em um artefato TFLite quantizado.
+
+    Args:
+        modelo: Modelo Keras carregado.
+        variante: "dynamic", "float16" ou "int8".
+        calibracao: Lote já pré-processado usado como dataset representativo
+            (obrigatório para "int8").
+
+    Returns:
+        Conteúdo do arquivo `.tflite`.
+    """
+
+    conversor = tf.lite.TFLiteConverter.from_keras_model(modelo)
+    conversor.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if variante == "float16":
+        conversor.target_spec.supported_types = [tf.float16]
+    elif variante == "int8":
+        if calibracao is None or not len(calibracao):
+            raise ValueError("A variante int8 exige imagens de calibração.")
+
+        def _representativo() -> Iterable[list]:
+            for imagem in calibracao:
+                yield [imagem[np.newaxis].astype("float32")]
+
+        conversor.representative_dataset = _representativo
+        conversor.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        conversor.inference_input_type = tf.int8
+        conversor.inference_output_type = tf.int8
+    elif variante != "dynamic":
+        raise ValueError(f"Variante desconhecida: {variante}. Opções: {', '.join(VARIANTES)}")
+
+    return conversor.convert()
+
+
+def exportar_savedmodel(modelo, destino: str | Path) -> Path:
+    """Grava o modelo como SavedModel com assinaturas de entrada fixas.
+
+    `serving_default` recebe exatamente 1x224x224x3 (uma radiografia, como no
+    app) e `lote` aceita qualquer tamanho de lote. A gravação vai para uma pasta
+    temporária e só substitui `destino` ao final.
+    """
+
+    destino = Path(destino)
+    modulo = tf.Module()
+    modulo.modelo = modelo
+
+    @tf.function(input_signature=[tf.TensorSpec([1, *inferencia.IMAGE_SIZE, 3], tf.float32, name="imagem")])
+    def unitaria(imagem):
+        return {"probabilidade": modelo(imagem, training=False)}
+
+    @tf.function(input_signature=[tf.TensorSpec([None, *inferencia.IMAGE_SIZE, 3], tf.float32, name="imagem")])
+    def lote(imagem):
+        return {"probabilidade": modelo(imagem, training=False)}
+
+    temporario = destino.with_name(f"{destino.name}.tmp")
+    shutil.rmtree(temporario, ignore_errors=True)
+    tf.saved_model.save(
+        modulo,
+        os.fspath(temporario),
+        signatures={inferencia.ASSINATURA_UNITARIA: unitaria, inferencia.ASSINATURA_LOTE: lote},
+    )
+    shutil.rmtree(destino, ignore_errors=True)
+    temporario.rename(destino)
+    return destino
+
+
+def medir_partida(artefato: str | Path) -> Dict:
+    """Mede, em um processo Python novo, o tempo até a primeira predição do artefato."""
+
+    inicio = time.perf_counter()
+    processo = subprocess.run(
+        [sys.executable, os.fspath(Path(inferencia.__file__)), "--modelo", os.fspath(artefato)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    tempos = json.loads(processo.stdout.strip().splitlines()[-1])
+    tempos.pop("artefato", None)
+    tempos["partida_a_frio_s"] = round(time.perf_counter() - inicio, 3)
+    return tempos
+
+
+def _tamanho_mb(caminho: Path) -> float:
+    arquivos = [caminho] if caminho.is_file() else [item for item in caminho.rglob("*") if item.is_file()]
+    return round(sum(item.stat().st_size for item in arquivos) / 2**20, 2)
+
+
+def _comparar(artefato: Path, resultado: Dict, referencia: Dict) -> Dict:
+    diferenca = np.abs(resultado["probabilidades"] - referencia["probabilidades"])
+    concordancia = (resultado["probabilidades"] > inferencia.LIMIAR) == (
+        referencia["probabilidades"] > inferencia.LIMIAR
+    )
+    return {
+        "arquivo": artefato.name,
+        "tamanho_mb": _tamanho_mb(artefato),
+        "acuracia": resultado["acuracia"],
+        "concordancia_keras": round(float(np.mean(concordancia)), 4),
+        "diferenca_media_probabilidade": round(float(np.mean(diferenca)), 5),
+        "diferenca_maxima_probabilidade": round(float(np.max(diferenca)), 5),
+        "latencia": resultado["latencia"],
+        "partida": medir_partida(artefato),
+    }
+
+
+def avaliar_variante(modelo, entrada: np.ndarray, rotulos: np.ndarray, repeticoes: int = 50) -> Dict:
+    """Mede acurácia sobre `entrada` e a latência de uma imagem por chamada."""
+
+    probabilidades = np.concatenate(
+        [
+            np.asarray(modelo.predict_on_batch(entrada[inicio : inicio + 32])).reshape(-1)
+            for inicio in range(0, len(entrada), 32)
+        ]
+    )
+
+    unitario = entrada[:1]
+    modelo.predict_on_batch(unitario)  # aquecimento (tracing / alocação de tensores)
+    latencias = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        modelo.predict_on_batch(unitario)
+        latencias.append(time.perf_counter() - inicio)
+
+    return {
+        "probabilidades": probabilidades,
+        "acuracia": round(float(np.mean((probabilidades > inferencia.LIMIAR) == rotulos)), 4),
+        "latencia": inferencia.percentis(latencias),
+    }
+
+
+def exportar(
+    modelo_path: str | Path | None = None,
+    data_dir: str | Path = Path(__file__).resolve().parents[1] / "data",
+    saida_dir: str | Path = inferencia.MODELOS_DIR,
+    variantes: Sequence[str] = VARIANTES,
+    amostras_calibracao: int = 200,
+    amostras_avaliacao: int = 400,
+    seed: int = 42,
+    savedmodel: bool = True,
+) -> Dict:
+    """Gera os artefatos TFLite e o relatório de acurácia versus latência.
+
+    Args:
+        modelo_path: Modelo `.h5` de origem (padrão: `inferencia.localizar_modelo`).
+        data_dir: Diretório com o split `validation/` usado na calibração e avaliação.
+        saida_dir: Pasta onde os arquivos `model_<variante>.tflite` são gravados.
+        variantes: Subconjunto de `VARIANTES` a exportar.
+        amostras_calibracao: Imagens de validação usadas para calibrar o int8,
+            distintas das de avaliação.
+        amostras_avaliacao: Imagens de validação usadas no relatório.
+        seed: Semente do sorteio das amostras.
+        savedmodel: Também grava e avalia `model_savedmodel/`.
+
+    Returns:
+        Relatório com uma entrada por variante (incluindo "keras", a referência).
+    """
+
+    modelo_path = Path(modelo_path) if modelo_path else inferencia.localizar_modelo()
+    if modelo_path is None or not modelo_path.exists():
+        raise FileNotFoundError("Modelo não encontrado. Execute o pipeline de treinamento primeiro.")
+    modelo = tf.keras.models.load_model(modelo_path)
+
+    caminhos, rotulos, _ = data_preprocessing.listar_split(data_dir, "validation")
+    if not caminhos:
+        raise FileNotFoundError(f"Nenhuma imagem de validação em {Path(data_dir) / 'validation'}.")
+    gerador = np.random.default_rng(seed)
+    ordem = gerador.permutation(len(caminhos))
+    caminhos = np.asarray(caminhos)
+    rotulos = np.asarray(rotulos)
+
+    # Calibração e avaliação sem sobreposição: o int8 não é medido nas imagens que o calibraram.
+    if len(caminhos) < 2:
+        raise ValueError("O split de validação precisa de ao menos 2 imagens (calibração e avaliação).")
+    if len(caminhos) < amostras_avaliacao + amostras_calibracao:
+        amostras_avaliacao = max(len(caminhos) - amostras_calibracao, len(caminhos) // 2)
+        print(
+            f"[exportar] Aviso: só {len(caminhos)} imagens de validação; avaliação com {amostras_avaliacao} "
+            f"e calibração com as {len(caminhos) - amostras_avaliacao} restantes."
+        )
+    avaliacao = ordem[:amostras_avaliacao]
+    entrada = inferencia.preprocessar_lote(_carregar_amostra(caminhos[avaliacao]))
+    rotulos_avaliacao = rotulos[avaliacao]
+    calibracao = inferencia.preprocessar_lote(
+        _carregar_amostra(caminhos[ordem[amostras_avaliacao : amostras_avaliacao + amostras_calibracao]])
+    )
+    print(
+        f"[exportar] {modelo_path.name}: calibração com {len(calibracao)} imagens, "
+        f"avaliação com {len(entrada)} imagens de validação."
+    )
+
+    referencia = avaliar_variante(modelo, entrada, rotulos_avaliacao)
+    relatorio: Dict = {
+        "modelo": modelo_path.name,
+        "amostras_avaliacao": int(len(entrada)),
+        "amostras_calibracao": int(len(calibracao)),
+        "variantes": {
+            "keras": {
+                "arquivo": modelo_path.name,
+                "tamanho_mb": _tamanho_mb(modelo_path),
+                "acuracia": referencia["acuracia"],
+                "latencia": referencia["latencia"],
+                "partida": medir_partida(modelo_path),
+            }
+        },
+    }
+
+    saida_dir = Path(saida_dir)
+    saida_dir.mkdir(parents=True, exist_ok=True)
+    for variante in variantes:
+        destino = inferencia.caminho_tflite(variante, saida_dir)
+        destino.write_bytes(converter_tflite(modelo, variante, calibracao))
+
+        resultado = avaliar_variante(inferencia.ModeloTFLite(destino), entrada, rotulos_avaliacao)
+        relatorio["variantes"][variante] = _comparar(destino, resultado, referencia)
+
+    if savedmodel:
+        destino = exportar_savedmodel(modelo, saida_dir / inferencia.SAVEDMODEL_NOME)
+        resultado = avaliar_variante(inferencia.ModeloSavedModel(destino), entrada, rotulos_avaliacao)
+        relatorio["variantes"]["savedmodel"] = _comparar(destino, resultado, referencia)
+
+    return relatorio
+
+
+def _imprimir_relatorio(relatorio: Dict) -> None:
+    print(
+        f"[exportar] {'variante':<10} {'MB':>8} {'acurácia':>9} {'concord.':>9} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'partida s':>10}"
+    )
+    for nome, dados in relatorio["variantes"].items():
+        print(
+            f"[exportar] {nome:<10} {dados['tamanho_mb']:>8.2f} {dados['acuracia']:>9.4f} "
+            f"{dados.get('concordancia_keras', 1.0):>9.4f} "
+            f"{dados['latencia']['p50_ms']:>8.2f} {dados['latencia']['p95_ms']:>8.2f} "
+            f"{dados['partida']['partida_a_frio_s']:>10.2f}"
+        )
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Exporta o CardioIA para TFLite quantizado")
+    parser.add_argument("--modelo", type=str, default=None, help="Modelo .h5 de origem (padrão: busca em models/)")
+    parser.add_argument(
+        "--data-dir",
+        type=str,
+        default=os.fspath(Path(__file__).resolve().parents[1] / "data"),
+        help="Diretório com a pasta validation/ usada na calibração e avaliação",
+    )
+    parser.add_argument("--saida", type=str, default=os.fspath(inferencia.MODELOS_DIR), help="Pasta dos artefatos")
+    parser.add_argument(
+        "--variantes",
+        nargs="+",
+        choices=VARIANTES,
+        default=list(VARIANTES),
+        help="Quantizações a gerar",
+    )
+    parser.add_argument("--amostras-calibracao", type=int, default=200, help="Imagens para calibrar o int8")
+    parser.add_argument("--amostras-avaliacao", type=int, default=400, help="Imagens usadas no relatório")
+    parser.add_argument("--sem-savedmodel", action="store_true", help="Não grava o SavedModel de assinatura fixa")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    relatorio = exportar(
+        modelo_path=args.modelo,
+        data_dir=args.data_dir,
+        saida_dir=args.saida,
+        variantes=args.variantes,
+        amostras_calibracao=args.amostras_calibracao,
+        amostras_avaliacao=args.amostras_avaliacao,
+        savedmodel=not args.sem_savedmodel,
+    )
+    _imprimir_relatorio(relatorio)
+
+    REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+    destino = REPORTS_DIR / "quantizacao.json"
+    destino.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"[exportar] Relatório salvo em {destino}")
+
+
+if __name__ == "__main__":
+    main()
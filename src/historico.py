@@ -0,0 +1,216 @@
+"""Histórico colunar dos treinos do CardioIA e figuras sob demanda.
+
+O histórico de cada treino fica em um `.npz` com uma coluna por série:
+
+- `epoca` e uma coluna por métrica do Keras (`loss`, `val_loss`, `accuracy`...);
+- `perf_<campo>`: tempos e vazão de cada época medidos pelo `MedidorPassos`;
+- `passo_<campo>`: espera por dados e computação de cada passo;
+- `lote_<métrica>`: com `--historico-por-lote`, os logs de cada lote de treino
+  (média acumulada na época, como na barra de progresso do Keras).
+
+O `metrics.json` guarda só o resumo. As figuras não são mais desenhadas no fim
+do treino; este módulo as gera quando alguém pede:
+
+    python src/historico.py experiments/exp_20251201_232701
+    python src/historico.py reports/historico_cnn.npz reports/historico_resnet.npz
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.figure import Figure
+
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parent))
+    import monitor_recursos  # type: ignore
+else:  # pragma: no cover
+    from . import monitor_recursos
+
+ARQUIVO = "historico.npz"
+FIGURAS_DIR = Path(__file__).resolve().parents[1] / "reports" / "figuras"
+
+
+def salvar(
+    destino: str | Path,
+    history: Mapping[str, Sequence[float]],
+    extras: Optional[Mapping[str, Sequence[float]]] = None,
+    por_lote: Optional[Mapping[str, Sequence[float]]] = None,
+) -> Path:
+    """Grava o histórico em `.npz` comprimido.
+
+    Args:
+        destino: Arquivo de saída.
+        history: `history.history` do Keras (uma lista por métrica).
+        extras: Outras colunas, já com prefixo (`perf_*`, `passo_*`).
+        por_lote: Colunas do `instrumentacao.RegistradorLotes`, gravadas com
+            prefixo `lote_`.
+    """
+
+    destino = Path(destino)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    epocas = len(next(iter(history.values()), []))
+    colunas = {"epoca": np.arange(1, epocas + 1, dtype="int32")}
+    colunas.update({chave: np.asarray(valores, dtype="float32") for chave, valores in history.items()})
+    colunas.update({chave: np.asarray(valores, dtype="float32") for chave, valores in (extras or {}).items()})
+    colunas.update({f"lote_{chave}": np.asarray(valores, dtype="float32") for chave, valores in (por_lote or {}).items()})
+    np.savez_compressed(destino, **colunas)
+    return destino
+
+
+def carregar(origem: str | Path) -> Dict[str, np.ndarray]:
+    """Colunas do histórico de um `.npz` ou de uma pasta de experimento.
+
+    Experimentos anteriores ao formato colunar têm o histórico dentro do
+    metrics.json; nesse caso ele é lido de lá.
+    """
+
+    origem = Path(origem)
+    arquivo = origem / ARQUIVO if origem.is_dir() else origem
+    if arquivo.exists():
+        with np.load(arquivo) as dados:
+            return {nome: dados[nome] for nome in dados.files}
+
+    metrics_path = origem / "metrics.json"
+    if origem.is_dir() and metrics_path.exists():
+        history = json.loads(metrics_path.read_text(encoding="utf-8")).get("history", {})
+        epocas = len(next(iter(history.values()), []))
+        colunas = {"epoca": np.arange(1, epocas + 1, dtype="int32")}
+        colunas.update({chave: np.asarray(valores, dtype="float32") for chave, valores in history.items()})
+        return colunas
+    raise FileNotFoundError(f"Histórico não encontrado em {origem}")
+
+
+def resumir(history: Mapping[str, Sequence[float]]) -> Dict[str, object]:
+    """Melhor época (menor val_loss) e as métricas nela, para o metrics.json."""
+
+    val_loss = list(history.get("val_loss") or [])
+    epocas = len(next(iter(history.values()), []))
+    if val_loss:
+        melhor_idx = int(np.nanargmin(val_loss))
+    else:
+        melhor_idx = epocas - 1
+    return {
+        "epocas_treinadas": epocas,
+        "best_epoch": melhor_idx + 1,
+        "best_metrics": (
+            {chave: float(valores[melhor_idx]) for chave, valores in history.items() if len(valores) > melhor_idx}
+            if epocas
+            else {}
+        ),
+    }
+
+
+def desenhar_curvas(colunas: Mapping[str, np.ndarray]) -> Figure:
+    """Curvas de loss e acurácia; com histórico por lote, os lotes aparecem ao fundo."""
+
+    fig, axes = plt.subplots(1, 2, figsize=(12, 5))
+    epocas = colunas["epoca"]
+    lote_epoca = colunas.get("lote_epoca")
+    if lote_epoca is not None and len(lote_epoca):
+        # Posição fracionária do lote dentro da sua época (época 1 = lotes em (0, 1]).
+        _, contagem = np.unique(lote_epoca, return_counts=True)
+        fracao = np.concatenate([(np.arange(n) + 1) / n for n in contagem])
+        x_lote = lote_epoca - 1 + fracao
+    else:
+        x_lote = None
+
+    def _plot(ax, chaves, rotulo):
+        for chave in chaves:
+            serie = colunas.get(chave)
+            if serie is not None and len(serie):
+                ax.plot(epocas, serie, label=rotulo, marker="o" if x_lote is not None else None)
+                return
+
+    def _plot_lote(ax, chaves):
+        for chave in chaves:
+            serie = colunas.get(f"lote_{chave}")
+            if x_lote is not None and serie is not None:
+                ax.plot(x_lote, serie, color="gray", alpha=0.4, linewidth=0.8, label="Treino (lotes)")
+                return
+
+    for ax, (titulo, treino, validacao) in zip(
+        axes,
+        (
+            ("Loss", ("loss",), ("val_loss",)),
+            ("Acurácia", ("accuracy", "acc"), ("val_accuracy", "val_acc")),
+        ),
+    ):
+        _plot_lote(ax, treino)
+        _plot(ax, treino, "Treino")
+        _plot(ax, validacao, "Validação")
+        ax.set_title(titulo)
+        ax.set_xlabel("Épocas")
+        ax.set_ylabel(titulo)
+        if ax.lines:
+            ax.legend()
+
+    fig.tight_layout()
+    return fig
+
+
+def renderizar(origem: str | Path, saida: Optional[str | Path] = None, dpi: int = 150) -> List[Path]:
+    """Gera os PNGs de um experimento ou de um `historico_<sufixo>.npz`.
+
+    Args:
+        origem: Pasta de experimento ou arquivo `.npz` de histórico.
+        saida: Pasta dos PNGs. Padrão: `reports/figuras/<experimento>/` para
+            pastas e a própria pasta do arquivo para `.npz` avulsos.
+        dpi: Resolução dos PNGs.
+
+    Returns:
+        Os arquivos gerados.
+    """
+
+    origem = Path(origem)
+    if origem.is_dir():
+        destino = Path(saida) / origem.name if saida else FIGURAS_DIR / origem.name
+        alvos = {"training_curves": destino / "training_curves.png"}
+        recursos = origem / "recursos.npz"
+        if recursos.exists():
+            alvos["utilizacao_recursos"] = destino / "utilizacao_recursos.png"
+    else:
+        destino = Path(saida) if saida else origem.parent
+        sufixo = origem.stem.removeprefix("historico").lstrip("_")
+        alvos = {"training_curves": destino / f"training_curves{'_' + sufixo if sufixo else ''}.png"}
+        recursos = None
+
+    destino.mkdir(parents=True, exist_ok=True)
+    gerados = []
+    for nome, alvo in alvos.items():
+        figura = desenhar_curvas(carregar(origem)) if nome == "training_curves" else monitor_recursos.desenhar(recursos)
+        figura.savefig(alvo, dpi=dpi, bbox_inches="tight")
+        plt.close(figura)
+        gerados.append(alvo)
+        print(f"[historico] Figura salva em {alvo}")
+    return gerados
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Gera as figuras de treino a partir do histórico colunar")
+    parser.add_argument("origens", nargs="+", help="Pastas de experimento ou arquivos historico_*.npz")
+    parser.add_argument("--saida", type=str, default=None, help="Pasta dos PNGs")
+    parser.add_argument("--dpi", type=int, default=150, help="Resolução dos PNGs")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    for origem in args.origens:
+        try:
+            renderizar(origem, args.saida, args.dpi)
+        except FileNotFoundError as erro:
+            print(f"[historico] {erro}")
+
+
+__all__ = ["carregar", "desenhar_curvas", "renderizar", "resumir", "salvar"]
+
+
+if __name__ == "__main__":
+    main()
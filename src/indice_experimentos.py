@@ -0,0 +1,360 @@
+"""Índice SQLite dos experimentos do CardioIA.
+
+Cada `experiments/**/metrics.json` vira uma linha com os parâmetros, a melhor
+época, as métricas de validação nessa época, as métricas finais e os números
+de desempenho do treino. O índice é atualizado a cada registro
+(`utils_git.salvar_artefatos`) e pode ser refeito a partir das pastas. Antes de
+cada consulta, a CLI sincroniza de forma incremental: só relê os arquivos cuja
+data de modificação mudou e remove as linhas de pastas que sumiram. Assim,
+experimentos trazidos por `git pull` também entram.
+
+Uso:
+    python src/indice_experimentos.py leaderboard --metrica val_accuracy --filtro model=cnn
+    python src/indice_experimentos.py filtrar --filtro "learning_rate<0.001" --filtro "epochs>=10"
+    python src/indice_experimentos.py diff exp_20251127_000641 exp_20251127_002129
+    python src/indice_experimentos.py reconstruir
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+EXPERIMENTS_DIR = Path(__file__).resolve().parents[1] / "experiments"
+BANCO_PADRAO = EXPERIMENTS_DIR / "indice.sqlite"
+
+# Colunas consultáveis diretamente; demais chaves são buscadas em params/final_metrics.
+COLUNAS = {
+    "id": "TEXT PRIMARY KEY",
+    "timestamp": "TEXT",
+    "model": "TEXT",
+    "epochs": "INTEGER",
+    "batch_size": "INTEGER",
+    "learning_rate": "REAL",
+    "epocas_treinadas": "INTEGER",
+    "best_epoch": "INTEGER",
+    "val_loss": "REAL",
+    "val_accuracy": "REAL",
+    "val_precision": "REAL",
+    "val_recall": "REAL",
+    "passos_por_segundo": "REAL",
+    "imagens_por_segundo": "REAL",
+    "fracao_espera": "REAL",
+    "rss_pico_mb": "REAL",
+    "sweep": "TEXT",
+    "status": "TEXT",
+    "params": "TEXT",
+    "final_metrics": "TEXT",
+    "mtime": "REAL",
+}
+# Métricas em que menor é melhor; as demais são ordenadas de forma decrescente.
+MENOR_MELHOR = {"val_loss", "loss", "fracao_espera", "rss_pico_mb"}
+OPERADORES = ("<=", ">=", "!=", "=", "<", ">")
+_CHAVE = re.compile(r"^[A-Za-z_][\w.]*$")
+_FILTRO = re.compile(r"^\s*([A-Za-z_][\w.]*)\s*(<=|>=|!=|=|<|>)\s*(.+?)\s*$")
+COLUNAS_LEADERBOARD = (
+    "id",
+    "model",
+    "epochs",
+    "batch_size",
+    "learning_rate",
+    "best_epoch",
+    "val_loss",
+    "val_accuracy",
+    "passos_por_segundo",
+)
+
+
+@contextmanager
+def _conectar(banco: Path) -> Iterator[sqlite3.Connection]:
+    banco.parent.mkdir(parents=True, exist_ok=True)
+    # Trials de um sweep registram em paralelo; o timeout espera o lock.
+    conexao = sqlite3.connect(banco, timeout=30)
+    try:
+        with conexao:
+            conexao.execute(
+                "CREATE TABLE IF NOT EXISTS experimentos ("
+                + ", ".join(f"{nome} {tipo}" for nome, tipo in COLUNAS.items())
+                + ")"
+            )
+            yield conexao
+    finally:
+        conexao.close()
+
+
+def _primeiro(valores: Dict[str, float], chaves: Sequence[str]) -> Optional[float]:
+    for chave in chaves:
+        if valores.get(chave) is not None:
+            return float(valores[chave])
+    return None
+
+
+def extrair_registro(metrics_path: Path, raiz: Path = EXPERIMENTS_DIR) -> Dict[str, object]:
+    """Resume um metrics.json na linha do índice."""
+
+    metricas = json.loads(metrics_path.read_text(encoding="utf-8"))
+    params = metricas.get("params", {})
+    historico = metricas.get("history", {})  # formato anterior ao historico.npz
+    finais = metricas.get("final_metrics", {})
+    best_epoch = metricas.get("best_epoch")
+    melhores = metricas.get("best_metrics")
+    if melhores is None:
+        indice = best_epoch - 1 if best_epoch else None
+        melhores = {
+            chave: serie[indice] for chave, serie in historico.items() if indice is not None and indice < len(serie)
+        }
+    desempenho = metricas.get("performance") or {}
+    perfil = metricas.get("perfil") or {}
+    recursos = metricas.get("recursos") or {}
+    sweep = metricas.get("sweep") or {}
+
+    return {
+        "id": metrics_path.parent.relative_to(raiz).as_posix(),
+        "timestamp": metricas.get("timestamp"),
+        "model": params.get("model"),
+        "epochs": params.get("epochs"),
+        "batch_size": params.get("batch_size"),
+        "learning_rate": params.get("learning_rate"),
+        "epocas_treinadas": metricas.get("epocas_treinadas", len(historico.get("loss", []))),
+        "best_epoch": best_epoch,
+        "val_loss": _primeiro(melhores, ("val_loss",)),
+        "val_accuracy": _primeiro(melhores, ("val_accuracy", "val_acc")),
+        "val_precision": _primeiro(melhores, ("val_Precision", "val_precision")),
+        "val_recall": _primeiro(melhores, ("val_Recall", "val_recall")),
+        "passos_por_segundo": desempenho.get("passos_por_segundo", perfil.get("steps_por_segundo")),
+        "imagens_por_segundo": desempenho.get("imagens_por_segundo"),
+        "fracao_espera": desempenho.get("fracao_espera"),
+        "rss_pico_mb": recursos.get("rss_pico_mb", desempenho.get("rss_pico_mb")),
+        "sweep": sweep.get("id"),
+        "status": sweep.get("status"),
+        "params": json.dumps(params, sort_keys=True),
+        "final_metrics": json.dumps(finais, sort_keys=True),
+        "mtime": metrics_path.stat().st_mtime,
+    }
+
+
+def _gravar(conexao: sqlite3.Connection, registro: Dict[str, object]) -> None:
+    nomes = list(COLUNAS)
+    conexao.execute(
+        f"INSERT OR REPLACE INTO experimentos ({', '.join(nomes)}) VALUES ({', '.join('?' * len(nomes))})",
+        [registro[nome] for nome in nomes],
+    )
+
+
+def indexar(pasta: Path, banco: Path = BANCO_PADRAO, raiz: Path = EXPERIMENTS_DIR) -> None:
+    """Insere ou atualiza no índice o experimento gravado em `pasta`."""
+
+    metrics_path = Path(pasta).resolve() / "metrics.json"
+    if not metrics_path.exists() or not metrics_path.is_relative_to(Path(raiz).resolve()):
+        return
+    try:
+        with _conectar(banco) as conexao:
+            _gravar(conexao, extrair_registro(metrics_path, Path(raiz).resolve()))
+    except sqlite3.Error as erro:
+        # O índice é derivado; uma falha aqui não pode perder o registro do experimento.
+        print(f"[indice] Não foi possível indexar {pasta}: {erro}. Rode `reconstruir` depois.")
+
+
+def sincronizar(
+    raiz: Path = EXPERIMENTS_DIR,
+    banco: Path = BANCO_PADRAO,
+    completo: bool = False,
+) -> Tuple[int, int]:
+    """Atualiza o índice a partir das pastas.
+
+    Args:
+        raiz: Pasta `experiments/`.
+        banco: Arquivo SQLite do índice.
+        completo: Relê todos os metrics.json, mesmo os não modificados.
+
+    Returns:
+        (linhas atualizadas, linhas removidas).
+    """
+
+    arquivos = {path.parent.relative_to(raiz).as_posix(): path for path in raiz.rglob("metrics.json")}
+    with _conectar(banco) as conexao:
+        conhecidos = dict(conexao.execute("SELECT id, mtime FROM experimentos"))
+        removidos = [identificador for identificador in conhecidos if identificador not in arquivos]
+        conexao.executemany("DELETE FROM experimentos WHERE id = ?", [(identificador,) for identificador in removidos])
+
+        atualizados = 0
+        for identificador, path in arquivos.items():
+            if not completo and conhecidos.get(identificador) == path.stat().st_mtime:
+                continue
+            try:
+                _gravar(conexao, extrair_registro(path, raiz))
+                atualizados += 1
+            except (json.JSONDecodeError, OSError, AttributeError) as erro:
+                print(f"[indice] Ignorando {path}: {erro}")
+    return atualizados, len(removidos)
+
+
+def _expressao(chave: str) -> str:
+    """Coluna do índice ou, para outras chaves, o valor em params/final_metrics.
+
+    Raises:
+        ValueError: Chave fora do formato de identificador (evita injeção no SQL).
+    """
+
+    if not _CHAVE.match(chave):
+        raise ValueError(f"Chave inválida: {chave!r}. Use letras, dígitos, '_' e '.'.")
+    if chave in COLUNAS:
+        return chave
+    return f"COALESCE(json_extract(params, '$.{chave}'), json_extract(final_metrics, '$.{chave}'))"
+
+
+def _converter(valor: str) -> object:
+    try:
+        return float(valor)
+    except ValueError:
+        return valor.strip("'\"")
+
+
+def montar_filtros(filtros: Sequence[str]) -> Tuple[str, List[object]]:
+    """Converte ["model=cnn", "learning_rate<1e-3"] em cláusula WHERE parametrizada.
+
+    Raises:
+        ValueError: Filtro fora do formato `chave<op>valor`.
+    """
+
+    clausulas, valores = [], []
+    for filtro in filtros:
+        casamento = _FILTRO.match(filtro)
+        if not casamento:
+            raise ValueError(f"Filtro inválido: {filtro!r}. Use chave<op>valor com op em {', '.join(OPERADORES)}.")
+        chave, operador, valor = casamento.groups()
+        clausulas.append(f"{_expressao(chave)} {operador} ?")
+        valores.append(_converter(valor))
+    return (" WHERE " + " AND ".join(clausulas)) if clausulas else "", valores
+
+
+def consultar(
+    filtros: Sequence[str] = (),
+    metrica: str = "val_loss",
+    limite: Optional[int] = None,
+    colunas: Sequence[str] = COLUNAS_LEADERBOARD,
+    banco: Path = BANCO_PADRAO,
+) -> pd.DataFrame:
+    """Experimentos que atendem aos filtros, do melhor para o pior em `metrica`."""
+
+    where, valores = montar_filtros(filtros)
+    ordem = "ASC" if metrica in MENOR_MELHOR else "DESC"
+    selecao = [coluna if coluna in COLUNAS else f"{_expressao(coluna)} AS \"{coluna}\"" for coluna in colunas]
+    if metrica not in colunas:
+        selecao.append(f"{_expressao(metrica)} AS \"{metrica}\"")
+    sql = (
+        f"SELECT {', '.join(selecao)} FROM experimentos{where} "
+        f"ORDER BY {_expressao(metrica)} IS NULL, {_expressao(metrica)} {ordem}"
+    )
+    if limite:
+        sql += f" LIMIT {int(limite)}"
+    with _conectar(banco) as conexao:
+        return pd.read_sql_query(sql, conexao, params=valores)
+
+
+def _carregar(identificador: str, conexao: sqlite3.Connection) -> Dict[str, object]:
+    """Busca pelo id exato ou por um prefixo que identifique um único experimento."""
+
+    linhas = conexao.execute(
+        "SELECT * FROM experimentos WHERE id = ? OR id LIKE ? ORDER BY id = ? DESC",
+        (identificador, f"{identificador}%", identificador),
+    ).fetchall()
+    if not linhas:
+        raise KeyError(f"Experimento não encontrado no índice: {identificador}")
+    nomes = [descricao[0] for descricao in conexao.execute("SELECT * FROM experimentos LIMIT 0").description]
+    if len(linhas) > 1 and linhas[0][0] != identificador:
+        raise KeyError(f"Prefixo ambíguo: {identificador} ({len(linhas)} experimentos)")
+    return dict(zip(nomes, linhas[0]))
+
+
+def comparar(a: str, b: str, banco: Path = BANCO_PADRAO) -> pd.DataFrame:
+    """Tabela lado a lado dos parâmetros e métricas de dois experimentos."""
+
+    with _conectar(banco) as conexao:
+        registros = [_carregar(a, conexao), _carregar(b, conexao)]
+
+    def _achatar(registro: Dict[str, object]) -> Dict[str, object]:
+        plano = {f"params.{chave}": valor for chave, valor in json.loads(registro["params"]).items()}
+        plano.update({f"final.{chave}": valor for chave, valor in json.loads(registro["final_metrics"]).items()})
+        plano.update(
+            {chave: valor for chave, valor in registro.items() if chave not in ("params", "final_metrics", "mtime")}
+        )
+        return plano
+
+    planos = [_achatar(registro) for registro in registros]
+    chaves = sorted(set(planos[0]) | set(planos[1]))
+    tabela = pd.DataFrame(
+        {registros[0]["id"]: [planos[0].get(chave) for chave in chaves], registros[1]["id"]: [planos[1].get(chave) for chave in chaves]},
+        index=chaves,
+    )
+    tabela["difere"] = ["*" if planos[0].get(chave) != planos[1].get(chave) else "" for chave in chaves]
+    return tabela
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Consultas ao índice de experimentos do CardioIA")
+    parser.add_argument("--banco", type=str, default=os.fspath(BANCO_PADRAO), help="Arquivo SQLite do índice")
+    parser.add_argument("--raiz", type=str, default=os.fspath(EXPERIMENTS_DIR), help="Pasta dos experimentos")
+    parser.add_argument("--sem-sincronizar", action="store_true", help="Consulta sem reler pastas modificadas")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    ranking = comandos.add_parser("leaderboard", help="Melhores experimentos por uma métrica")
+    ranking.add_argument("--metrica", type=str, default="val_loss", help="Coluna ou chave de params/final_metrics")
+    ranking.add_argument("--limite", type=int, default=10, help="Quantidade de linhas")
+    ranking.add_argument("--filtro", action="append", default=[], help="chave<op>valor (repetível)")
+
+    filtro = comandos.add_parser("filtrar", help="Experimentos que atendem aos filtros")
+    filtro.add_argument("--filtro", action="append", default=[], help="chave<op>valor (repetível)")
+    filtro.add_argument("--ordenar", type=str, default="timestamp", help="Métrica de ordenação")
+    filtro.add_argument("--colunas", type=str, default=None, help="Colunas exibidas, separadas por vírgula")
+
+    diff = comandos.add_parser("diff", help="Compara dois experimentos")
+    diff.add_argument("a", type=str, help="Id (ou prefixo) do primeiro experimento")
+    diff.add_argument("b", type=str, help="Id (ou prefixo) do segundo experimento")
+    diff.add_argument("--so-diferencas", action="store_true", help="Mostra só as linhas que diferem")
+
+    reconstruir = comandos.add_parser("reconstruir", help="Refaz o índice a partir das pastas")
+    reconstruir.add_argument("--completo", action="store_true", help="Relê todos os metrics.json")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    banco, raiz = Path(args.banco), Path(args.raiz)
+
+    if args.comando == "reconstruir":
+        atualizados, removidos = sincronizar(raiz, banco, completo=args.completo)
+        print(f"[indice] {atualizados} experimento(s) indexado(s), {removidos} removido(s) em {banco}")
+        return
+    if not args.sem_sincronizar:
+        sincronizar(raiz, banco)
+
+    try:
+        if args.comando == "leaderboard":
+            saida = consultar(args.filtro, args.metrica, args.limite, banco=banco).to_string(index=False)
+        elif args.comando == "filtrar":
+            colunas = [coluna.strip() for coluna in args.colunas.split(",")] if args.colunas else COLUNAS_LEADERBOARD
+            saida = consultar(args.filtro, args.ordenar, colunas=colunas, banco=banco).to_string(index=False)
+        else:
+            tabela = comparar(args.a, args.b, banco=banco)
+            if args.so_diferencas:
+                tabela = tabela[tabela["difere"] == "*"]
+            saida = tabela.to_string()
+    except (KeyError, ValueError) as erro:
+        raise SystemExit(f"[indice] {erro.args[0]}") from None
+    print(saida)
+
+
+__all__ = ["comparar", "consultar", "extrair_registro", "indexar", "montar_filtros", "sincronizar"]
+
+
+if __name__ == "__main__":
+    main()
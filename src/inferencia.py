@@ -0,0 +1,357 @@
+"""Funções de inferência compartilhadas pelo app, pelo lote e por outros consumidores.
+
+Concentra a busca do modelo treinado em `models/` e o pré-processamento da
+ResNet-50, para que o Streamlit e os scripts de linha de comando produzam
+exatamente as mesmas entradas para o modelo.
+
+O TensorFlow só é importado quando um modelo é de fato carregado: o
+pré-processamento é feito em NumPy, e o app pode desenhar a interface enquanto
+`iniciar_carregamento` carrega e aquece o modelo em segundo plano.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import time
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+MODELOS_DIR = Path(__file__).resolve().parents[1] / "models"
+CANDIDATOS_MODELO = ("model.h5", "best_model.h5", "model_resnet.h5")
+IMAGE_SIZE = (224, 224)
+LIMIAR = 0.5
+URL_ENV = "CARDIOIA_INFERENCIA_URL"
+RUNTIME_ENV = "CARDIOIA_RUNTIME"
+RUNTIMES = ("auto", "keras", "savedmodel", "tflite-dynamic", "tflite-float16", "tflite-int8")
+SAVEDMODEL_NOME = "model_savedmodel"
+ASSINATURA_UNITARIA = "serving_default"
+ASSINATURA_LOTE = "lote"
+# Média BGR do ImageNet usada pelo `preprocess_input` ("caffe") da ResNet-50
+MEDIA_BGR = np.array([103.939, 116.779, 123.68], dtype="float32")
+TIMEOUT_REMOTO = float(os.getenv("CARDIOIA_INFERENCIA_TIMEOUT", "30"))
+# Memória máxima da entrada float32 de cada chamada ao modelo (~435 imagens com 256 MB)
+LIMITE_LOTE_MB = float(os.getenv("CARDIOIA_LOTE_MB", "256"))
+
+
+def localizar_modelo(modelos_dir: str | Path = MODELOS_DIR) -> Optional[Path]:
+    """Retorna o primeiro modelo treinado disponível, na ordem de `CANDIDATOS_MODELO`."""
+
+    for nome in CANDIDATOS_MODELO:
+        caminho_modelo = Path(modelos_dir) / nome
+        if caminho_modelo.exists():
+            return caminho_modelo
+    return None
+
+
+def caminho_tflite(variante: str, modelos_dir: str | Path = MODELOS_DIR) -> Path:
+    """Caminho do artefato TFLite de uma variante ("dynamic", "float16" ou "int8")."""
+
+    return Path(modelos_dir) / f"model_{variante}.tflite"
+
+
+class ModeloSavedModel:
+    """Executa o SavedModel exportado por `exportar.py` com a interface de predição do Keras.
+
+    A assinatura `serving_default` tem forma fixa 1x224x224x3 (caso do app, já
+    rastreada na exportação); lotes maiores usam a assinatura `lote`.
+    """
+
+    def __init__(self, caminho: str | Path) -> None:
+        import tensorflow as tf
+
+        self._tf = tf
+        self.caminho = Path(caminho)
+        self._carregado = tf.saved_model.load(str(self.caminho))
+        self._unitaria = self._carregado.signatures[ASSINATURA_UNITARIA]
+        self._lote = self._carregado.signatures[ASSINATURA_LOTE]
+
+    def predict_on_batch(self, lote: np.ndarray) -> np.ndarray:
+        entrada = self._tf.constant(np.asarray(lote, dtype="float32"))
+        funcao = self._unitaria if entrada.shape[0] == 1 else self._lote
+        return funcao(imagem=entrada)["probabilidade"].numpy()
+
+    def predict(self, lote: np.ndarray, verbose: int = 0) -> np.ndarray:
+        return self.predict_on_batch(lote)
+
+
+class ModeloTFLite:
+    """Executa um artefato `.tflite` com a mesma interface de predição do Keras.
+
+    Usa o interpretador mais leve disponível (`ai_edge_litert`, `tflite_runtime`
+    ou, por último, `tf.lite`) e cuida da (de)quantização quando a entrada ou
+    a saída do modelo são inteiras, como na variante int8.
+    """
+
+    def __init__(self, caminho: str | Path, num_threads: int | None = None) -> None:
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tflite_runtime.interpreter import Interpreter
+            except ImportError:
+                import tensorflow as tf
+
+                Interpreter = tf.lite.Interpreter
+
+        self.caminho = Path(caminho)
+        self.interpretador = Interpreter(model_path=str(self.caminho), num_threads=num_threads or os.cpu_count())
+        self.interpretador.allocate_tensors()
+        self._entrada = self.interpretador.get_input_details()[0]
+        self._saida = self.interpretador.get_output_details()[0]
+        self._lote = int(self._entrada["shape"][0])
+
+    def predict_on_batch(self, lote: np.ndarray) -> np.ndarray:
+        lote = np.asarray(lote, dtype="float32")
+        if lote.shape[0] != self._lote:
+            self.interpretador.resize_tensor_input(self._entrada["index"], list(lote.shape))
+            self.interpretador.allocate_tensors()
+            self._entrada = self.interpretador.get_input_details()[0]
+            self._saida = self.interpretador.get_output_details()[0]
+            self._lote = lote.shape[0]
+
+        escala, zero = self._entrada["quantization"]
+        if np.issubdtype(self._entrada["dtype"], np.integer) and escala:
+            limites = np.iinfo(self._entrada["dtype"])
+            lote = np.clip(np.round(lote / escala + zero), limites.min, limites.max)
+        self.interpretador.set_tensor(self._entrada["index"], lote.astype(self._entrada["dtype"]))
+        self.interpretador.invoke()
+
+        saida = self.interpretador.get_tensor(self._saida["index"])
+        escala, zero = self._saida["quantization"]
+        if np.issubdtype(self._saida["dtype"], np.integer) and escala:
+            saida = (saida.astype("float32") - zero) * escala
+        return saida.astype("float32")
+
+    def predict(self, lote: np.ndarray, verbose: int = 0) -> np.ndarray:
+        return self.predict_on_batch(lote)
+
+
+def resolver_artefato(caminho_modelo: str | Path | None = None, runtime: str | None = None) -> Optional[Path]:
+    """Decide qual arquivo de modelo usar.
+
+    Um `caminho_modelo` explícito sempre vence. Sem ele, `runtime` (ou a variável
+    `CARDIOIA_RUNTIME`) escolhe entre o `.h5` de `localizar_modelo` ("keras"), o
+    SavedModel de `models/model_savedmodel` ("savedmodel") e um artefato
+    quantizado ("tflite-dynamic", "tflite-float16", "tflite-int8"). O padrão
+    "auto" usa o SavedModel quando ele não é mais antigo que o `.h5`.
+    """
+
+    if caminho_modelo:
+        caminho = Path(caminho_modelo)
+        return caminho if caminho.exists() else None
+
+    runtime = runtime or os.getenv(RUNTIME_ENV, "auto")
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Runtime desconhecido: {runtime}. Opções: {', '.join(RUNTIMES)}")
+
+    savedmodel = MODELOS_DIR / SAVEDMODEL_NOME
+    if runtime == "savedmodel":
+        return savedmodel if savedmodel.exists() else None
+    if runtime in ("auto", "keras"):
+        h5 = localizar_modelo()
+        if runtime == "auto" and savedmodel.exists():
+            if h5 is None or savedmodel.stat().st_mtime >= h5.stat().st_mtime:
+                return savedmodel
+        return h5
+
+    caminho = caminho_tflite(runtime.split("-", 1)[1])
+    return caminho if caminho.exists() else None
+
+
+def carregar_modelo(caminho_modelo: str | Path | None = None, runtime: str | None = None):
+    """Carrega o modelo escolhido por `resolver_artefato` (Keras, SavedModel ou TFLite)."""
+
+    artefato = resolver_artefato(caminho_modelo, runtime)
+    if artefato is None:
+        return None
+    if artefato.suffix == ".tflite":
+        return ModeloTFLite(artefato)
+    if artefato.is_dir():
+        return ModeloSavedModel(artefato)
+
+    from tensorflow.keras.models import load_model
+
+    return load_model(artefato)
+
+
+def aquecer(modelo) -> None:
+    """Roda uma predição descartável para pagar o rastreamento do grafo antes do usuário."""
+
+    modelo.predict_on_batch(np.zeros((1, *IMAGE_SIZE, 3), dtype="float32"))
+
+
+def carregar_e_aquecer(
+    caminho_modelo: str | Path | None = None, runtime: str | None = None
+) -> Tuple[object, Dict[str, float]]:
+    """Carrega e aquece o modelo, retornando também o tempo de cada etapa (s).
+
+    Depois do aquecimento, uma predição sobre uma imagem fixa percorre o mesmo
+    caminho de um exame real (pré-processamento + modelo). `ate_primeira_predicao_s`
+    soma carga, aquecimento e essa predição: é a partida a frio do modelo, sem a
+    espera pelo usuário.
+    """
+
+    inicio = time.perf_counter()
+    modelo = carregar_modelo(caminho_modelo, runtime)
+    tempos = {"carga_s": round(time.perf_counter() - inicio, 3)}
+    if modelo is not None:
+        marca = time.perf_counter()
+        aquecer(modelo)
+        tempos["aquecimento_s"] = round(time.perf_counter() - marca, 3)
+        marca = time.perf_counter()
+        modelo.predict_on_batch(processar_imagem(Image.new("RGB", IMAGE_SIZE)))
+        tempos["primeira_predicao_s"] = round(time.perf_counter() - marca, 4)
+        tempos["ate_primeira_predicao_s"] = round(time.perf_counter() - inicio, 3)
+    return modelo, tempos
+
+
+def iniciar_carregamento(caminho_modelo: str | Path | None = None, runtime: str | None = None) -> Future:
+    """Dispara `carregar_e_aquecer` em uma thread e retorna o futuro (modelo, tempos)."""
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cardioia-carga")
+    futuro = executor.submit(carregar_e_aquecer, caminho_modelo, runtime)
+    executor.shutdown(wait=False)
+    return futuro
+
+
+def redimensionar(imagem: Image.Image) -> np.ndarray:
+    """Converte a imagem para RGB 224x224 em uint8 (etapa que pode rodar em paralelo)."""
+
+    return np.asarray(imagem.convert("RGB").resize(IMAGE_SIZE), dtype="uint8")
+
+
+def decodificar_bytes(dados: bytes) -> np.ndarray:
+    """Decodifica os bytes de um arquivo de imagem direto para o array uint8 224x224x3."""
+
+    with Image.open(io.BytesIO(dados)) as imagem:
+        return redimensionar(imagem)
+
+
+def predizer_arrays(modelo, arrays: Sequence[np.ndarray], limite_mb: float = LIMITE_LOTE_MB) -> np.ndarray:
+    """Empilha imagens já redimensionadas e chama o modelo o mínimo de vezes possível.
+
+    As imagens são divididas em pedaços cuja entrada float32 cabe em `limite_mb`;
+    até esse limite, N imagens custam uma única chamada a `predict_on_batch`.
+    """
+
+    if not len(arrays):
+        return np.empty(0, dtype="float32")
+    por_chamada = max(1, int(limite_mb * 2**20 // (IMAGE_SIZE[0] * IMAGE_SIZE[1] * 3 * 4)))
+    probabilidades = []
+    for inicio in range(0, len(arrays), por_chamada):
+        entrada = preprocessar_lote(np.stack(arrays[inicio : inicio + por_chamada]))
+        probabilidades.append(np.asarray(modelo.predict_on_batch(entrada)).reshape(-1))
+    return np.concatenate(probabilidades)
+
+
+def preprocessar_lote(lote: np.ndarray) -> np.ndarray:
+    """Equivalente NumPy do `preprocess_input` da ResNet-50 (RGB -> BGR, menos a média)."""
+
+    return np.asarray(lote, dtype="float32")[..., ::-1] - MEDIA_BGR
+
+
+def processar_imagem(imagem: Image.Image) -> np.ndarray:
+    """Prepara uma única imagem no formato aceito pela ResNet-50 (lote de 1)."""
+
+    return preprocessar_lote(np.expand_dims(redimensionar(imagem), axis=0))
+
+
+def classificar(probabilidade: float) -> str:
+    """Traduz a probabilidade de cardiomegalia no rótulo exibido ao usuário."""
+
+    return "Possível Cardiomegalia" if probabilidade > LIMIAR else "Normal"
+
+
+def predizer_remoto(dados: bytes, url: str | None = None) -> float:
+    """Envia os bytes de uma imagem ao `servidor.py` e retorna a probabilidade.
+
+    Sem `url`, usa a variável de ambiente `CARDIOIA_INFERENCIA_URL`
+    (ex.: http://127.0.0.1:8500).
+    """
+
+    base = (url or os.environ[URL_ENV]).rstrip("/")
+    requisicao = urllib.request.Request(
+        f"{base}/predict",
+        data=dados,
+        headers={"Content-Type": "application/octet-stream"},
+        method="POST",
+    )
+    with urllib.request.urlopen(requisicao, timeout=TIMEOUT_REMOTO) as resposta:
+        return float(json.loads(resposta.read())["probabilidade"])
+
+
+def percentis(latencias: Sequence[float], quantis: Sequence[int] = (50, 95, 99)) -> dict:
+    """Resume uma lista de latências (em segundos) nos percentis pedidos, em ms."""
+
+    if not latencias:
+        return {f"p{q}_ms": None for q in quantis}
+    valores = np.percentile(np.asarray(latencias, dtype="float64") * 1000, quantis)
+    return {f"p{q}_ms": round(float(valor), 2) for q, valor in zip(quantis, valores)}
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Mede a partida a frio da inferência do CardioIA")
+    parser.add_argument("--modelo", type=str, default=None, help="Artefato a carregar (padrão: busca em models/)")
+    parser.add_argument("--runtime", choices=RUNTIMES, default=None, help="Runtime quando --modelo não é informado")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Carrega, aquece e faz uma predição, imprimindo os tempos em JSON (uma linha).
+
+    Rodado como subprocesso por `exportar.py`, que soma a esses tempos o custo de
+    subir o interpretador Python para obter a partida a frio completa.
+    """
+
+    inicio = time.perf_counter()
+    args = _parse_args()
+    artefato = resolver_artefato(args.modelo, args.runtime)
+    modelo, tempos = carregar_e_aquecer(artefato, args.runtime)
+    if modelo is None:
+        raise SystemExit("[inferencia] Modelo não encontrado. Execute o pipeline de treinamento primeiro.")
+
+    # Inclui também os imports e a leitura dos argumentos deste processo
+    tempos["ate_primeira_predicao_s"] = round(time.perf_counter() - inicio, 3)
+    print(json.dumps({"artefato": artefato.name, **tempos}))
+
+
+__all__ = [
+    "CANDIDATOS_MODELO",
+    "IMAGE_SIZE",
+    "LIMIAR",
+    "MEDIA_BGR",
+    "MODELOS_DIR",
+    "ModeloSavedModel",
+    "ModeloTFLite",
+    "RUNTIMES",
+    "RUNTIME_ENV",
+    "SAVEDMODEL_NOME",
+    "URL_ENV",
+    "aquecer",
+    "caminho_tflite",
+    "carregar_e_aquecer",
+    "carregar_modelo",
+    "classificar",
+    "decodificar_bytes",
+    "iniciar_carregamento",
+    "localizar_modelo",
+    "percentis",
+    "predizer_arrays",
+    "predizer_remoto",
+    "preprocessar_lote",
+    "processar_imagem",
+    "redimensionar",
+    "resolver_artefato",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""Instrumentação do tempo de cada passo de treino do CardioIA.
+
+No Keras 3 com TensorFlow, o lote é retirado do `tf.data` dentro da própria
+`train_function`, entre `on_train_batch_begin` e `on_train_batch_end`. Por
+isso `MedidorPassos` envolve o `train_step` do modelo e marca um
+`tf.timestamp()` assim que o lote chega ao grafo. Cada passo fica dividido em:
+
+- espera por dados: do início do passo até o lote ficar disponível;
+- computação: do lote disponível até o fim do passo (forward, backward e otimizador);
+- entre passos: do fim de um passo ao início do seguinte (callbacks, barra de
+  progresso e o restante do laço Python do Keras).
+
+As marcas ficam em um buffer `tf.Variable` no próprio grafo e só são lidas
+no fim de cada época (ou a cada `CAPACIDADE_MARCAS` passos): ler a marca a
+cada lote obrigaria o host a esperar o dispositivo em todo passo. No lote só
+o relógio do host é anotado.
+
+Com `jit_compile=True` o `tf.timestamp` não pode entrar no cluster XLA. Nesse
+caso só o tempo total de cada passo é medido.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from statistics import median
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.callbacks import Callback
+
+try:  # indisponível no Windows
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+# Passos guardados no buffer de marcas entre duas leituras.
+CAPACIDADE_MARCAS = 1024
+
+
+def rss_pico_mb() -> Optional[float]:
+    """Pico de memória residente do processo em MB (None fora de sistemas POSIX)."""
+
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KB; macOS, em bytes.
+    return round(pico / (1024**2 if sys.platform == "darwin" else 1024), 1)
+
+
+def interpretar_janela(texto: str) -> Tuple[int, int]:
+    """Converte "20:40" no intervalo de passos [20, 40)."""
+
+    inicio, _, fim = texto.partition(":")
+    janela = (int(inicio), int(fim))
+    if janela[0] < 0 or janela[1] <= janela[0]:
+        raise ValueError(f"Janela de passos inválida: {texto}. Use INICIO:FIM com FIM > INICIO.")
+    return janela
+
+
+def _percentis_ms(valores: Sequence[float]) -> Dict[str, Optional[float]]:
+    if not valores:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    calculados = np.percentile(np.asarray(valores) * 1000, (50, 95, 99))
+    return {f"p{quantil}_ms": round(float(valor), 3) for quantil, valor in zip((50, 95, 99), calculados)}
+
+
+class MedidorPassos(Callback):
+    """Registra o tempo de cada passo de treino separado em espera por dados e computação.
+
+    Args:
+        janela_trace: Passos globais [inicio, fim) exportados como Chrome trace.
+        destino_trace: Arquivo JSON do trace (formato Trace Event, aberto no
+            chrome://tracing ou no Perfetto).
+    """
+
+    def __init__(
+        self,
+        janela_trace: Optional[Tuple[int, int]] = None,
+        destino_trace: Optional[Path] = None,
+    ) -> None:
+        super().__init__()
+        self.janela_trace = janela_trace
+        self.destino_trace = destino_trace
+        self.separa_espera = True
+        self._marcas: Optional[tf.Variable] = None
+        self._contador: Optional[tf.Variable] = None
+        self._modelo_envolvido = None
+        # Relógio do host (início, fim, fim do passo anterior) dos passos cujas marcas ainda não foram lidas
+        self._pendentes: List[Tuple[float, float, float]] = []
+        self._lidos = 0
+
+        # Uma entrada por passo, em segundos
+        self.epoca: List[int] = []
+        self.espera: List[float] = []
+        self.computacao: List[float] = []
+        self.entre_passos: List[float] = []
+        self.imagens: List[int] = []
+        self.epocas: List[Dict[str, object]] = []
+        self._eventos: List[dict] = []
+
+        self._epoca_atual = 0
+        self._inicio_epoca = self._inicio_passo = self._fim_passo = 0.0
+        self._inicio_validacao = 0.0
+        self._validacao = 0.0
+        self._primeiro_da_epoca = 0
+
+    # ------------------------------------------------------------------ modelo
+    def set_model(self, model) -> None:
+        super().set_model(model)
+        if model is self._modelo_envolvido:
+            return
+        self._modelo_envolvido = model
+
+        self.separa_espera = not getattr(model, "jit_compile", False)
+        if not self.separa_espera:
+            print("[instrumentacao] XLA ativo: registrando só o tempo total de cada passo.")
+            return
+
+        estrategia = getattr(model, "distribute_strategy", None) or tf.distribute.get_strategy()
+        with estrategia.scope():
+            # Linha i % CAPACIDADE_MARCAS: (chegada do lote, tamanho) do i-ésimo passo.
+            self._marcas = tf.Variable(
+                tf.zeros((CAPACIDADE_MARCAS, 2), dtype=tf.float64),
+                trainable=False,
+                aggregation=tf.VariableAggregation.ONLY_FIRST_REPLICA,
+            )
+            self._contador = tf.Variable(
+                0, dtype=tf.int64, trainable=False, aggregation=tf.VariableAggregation.ONLY_FIRST_REPLICA
+            )
+        self._lidos = 0
+        marcas, contador = self._marcas, self._contador
+        train_step_original = model.train_step
+
+        def train_step(data):
+            # A marca só executa depois que o lote sai do iterador, e o modelo
+            # só recebe o lote depois da marca; sem isso o executor pode
+            # adiar o timestamp para depois da computação.
+            with tf.control_dependencies(tf.nest.flatten(data)):
+                chegada = tf.timestamp()
+            with tf.control_dependencies([chegada]):
+                data = tf.nest.map_structure(tf.identity, data)
+            tamanho = tf.cast(tf.shape(tf.nest.flatten(data)[0])[0], tf.float64)
+            linha = tf.math.floormod(contador.read_value(), CAPACIDADE_MARCAS)
+            marcas.assign(tf.tensor_scatter_nd_update(marcas, [[linha]], [tf.stack([chegada, tamanho])]))
+            contador.assign_add(1)
+            return train_step_original(data)
+
+        model.train_step = train_step
+        model.train_function = None  # força o retracing com o passo instrumentado
+
+    def on_train_end(self, logs=None):
+        self._ler_marcas()
+        if self._modelo_envolvido is not None and "train_step" in vars(self._modelo_envolvido):
+            del self._modelo_envolvido.train_step
+            self._modelo_envolvido.train_function = None
+        self._modelo_envolvido = None
+        if self.destino_trace is not None and self._eventos:
+            self.exportar_trace(self.destino_trace)
+
+    # ------------------------------------------------------------------- épocas
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoca_atual = epoch
+        self._validacao = 0.0
+        self._primeiro_da_epoca = len(self.espera)
+        self._inicio_epoca = self._fim_passo = time.time()
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self._inicio_passo = time.time()
+
+    def on_train_batch_end(self, batch, logs=None):
+        fim = time.time()
+        self._pendentes.append((self._inicio_passo, fim, self._fim_passo))
+        self._fim_passo = fim
+        if len(self._pendentes) == CAPACIDADE_MARCAS:
+            self._ler_marcas()
+
+    def _ler_marcas(self) -> None:
+        """Lê o buffer de marcas (uma sincronização) e fecha os passos pendentes."""
+
+        if not self._pendentes:
+            return
+        marcas = self._marcas.numpy() if self._marcas is not None else None
+        for deslocamento, (inicio, fim, fim_anterior) in enumerate(self._pendentes):
+            if marcas is not None:
+                chegada, tamanho = marcas[(self._lidos + deslocamento) % CAPACIDADE_MARCAS].tolist()
+                espera = min(max(chegada - inicio, 0.0), fim - inicio)
+            else:
+                espera, tamanho = 0.0, 0
+            self.epoca.append(self._epoca_atual)
+            self.espera.append(espera)
+            self.computacao.append(fim - inicio - espera)
+            self.entre_passos.append(inicio - fim_anterior)
+            self.imagens.append(int(tamanho))
+            if self.janela_trace and self.janela_trace[0] <= len(self.espera) - 1 < self.janela_trace[1]:
+                self._registrar_evento(fim_anterior, inicio, espera, fim)
+        self._lidos += len(self._pendentes)
+        self._pendentes = []
+
+    def on_test_begin(self, logs=None):
+        self._inicio_validacao = time.time()
+
+    def on_test_end(self, logs=None):
+        self._validacao += time.time() - self._inicio_validacao
+
+    def on_epoch_end(self, epoch, logs=None):
+        self._ler_marcas()
+        inicio = self._primeiro_da_epoca
+        espera = sum(self.espera[inicio:])
+        computacao = sum(self.computacao[inicio:])
+        entre_passos = sum(self.entre_passos[inicio:])
+        treino = espera + computacao + entre_passos
+        passos = len(self.espera) - inicio
+        imagens = sum(self.imagens[inicio:])
+        self.epocas.append(
+            {
+                "epoca": epoch + 1,
+                "passos": passos,
+                "imagens": imagens if self.separa_espera else None,
+                "treino_s": round(treino, 3),
+                "espera_dados_s": round(espera, 3) if self.separa_espera else None,
+                "computacao_s": round(computacao, 3),
+                "entre_passos_s": round(entre_passos, 3),
+                "validacao_s": round(self._validacao, 3),
+                "fracao_espera": round(espera / treino, 4) if self.separa_espera and treino else None,
+                "passos_por_segundo": round(passos / treino, 3) if treino else None,
+                "imagens_por_segundo": (
+                    round(imagens / treino, 2) if self.separa_espera and treino else None
+                ),
+                "rss_pico_mb": rss_pico_mb(),
+            }
+        )
+
+    # -------------------------------------------------------------- resultados
+    def _registrar_evento(self, fim_anterior: float, inicio: float, espera: float, fim: float) -> None:
+        passo = len(self.espera) - 1
+        trechos = [("entre_passos", fim_anterior, inicio), ("computacao", inicio + espera, fim)]
+        if self.separa_espera:
+            trechos.insert(1, ("espera_dados", inicio, inicio + espera))
+        for nome, comeco, termino in trechos:
+            self._eventos.append(
+                {
+                    "name": nome,
+                    "cat": "treino",
+                    "ph": "X",
+                    "ts": round(comeco * 1e6, 1),
+                    "dur": round((termino - comeco) * 1e6, 1),
+                    "pid": os.getpid(),
+                    "tid": 0,
+                    "args": {"passo": passo, "epoca": self.epoca[-1] + 1},
+                }
+            )
+
+    def exportar_trace(self, destino: Path) -> Path:
+        """Grava os passos da janela no formato Trace Event do Chrome."""
+
+        destino = Path(destino)
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        destino.write_text(
+            json.dumps({"traceEvents": self._eventos, "displayTimeUnit": "ms"}),
+            encoding="utf-8",
+        )
+        print(f"[instrumentacao] Trace de {len(self._eventos)} eventos salvo em {destino}")
+        return destino
+
+    def resumo(self) -> Dict[str, object]:
+        """Seção `performance` do metrics.json.
+
+        Os valores agregados de vazão usam a mediana por época ignorando a
+        primeira, que inclui tracing e compilação do grafo. As séries por
+        época e por passo ficam em `colunas()`.
+        """
+
+        estaveis = self.epocas[1:] or self.epocas
+        passos_por_segundo = [epoca["passos_por_segundo"] for epoca in estaveis if epoca["passos_por_segundo"]]
+        imagens_por_segundo = [epoca["imagens_por_segundo"] for epoca in estaveis if epoca["imagens_por_segundo"]]
+        espera = sum(self.espera)
+        treino = espera + sum(self.computacao) + sum(self.entre_passos)
+        return {
+            "separa_espera": self.separa_espera,
+            "passos": len(self.espera),
+            "passos_por_segundo": round(median(passos_por_segundo), 3) if passos_por_segundo else None,
+            "imagens_por_segundo": round(median(imagens_por_segundo), 2) if imagens_por_segundo else None,
+            "treino_s": round(treino, 3),
+            "espera_dados_s": round(espera, 3) if self.separa_espera else None,
+            "computacao_s": round(sum(self.computacao), 3),
+            "entre_passos_s": round(sum(self.entre_passos), 3),
+            "validacao_s": round(sum(epoca["validacao_s"] for epoca in self.epocas), 3),
+            "fracao_espera": round(espera / treino, 4) if self.separa_espera and treino else None,
+            "passo": _percentis_ms([a + b for a, b in zip(self.espera, self.computacao)]),
+            "espera_dados": _percentis_ms(self.espera) if self.separa_espera else None,
+            "rss_pico_mb": rss_pico_mb(),
+            "trace": os.fspath(self.destino_trace) if self.destino_trace and self._eventos else None,
+        }
+
+    def colunas(self) -> Dict[str, np.ndarray]:
+        """Séries por época (`perf_*`) e por passo (`passo_*`) para o histórico colunar."""
+
+        colunas: Dict[str, np.ndarray] = {}
+        for campo in self.epocas[0] if self.epocas else ():
+            if campo == "epoca":
+                continue
+            valores = [epoca[campo] for epoca in self.epocas]
+            colunas[f"perf_{campo}"] = np.asarray(
+                [np.nan if valor is None else valor for valor in valores], dtype="float32"
+            )
+        colunas["passo_epoca"] = np.asarray(self.epoca, dtype="int32") + 1
+        colunas["passo_espera_ms"] = np.asarray(self.espera, dtype="float32") * 1000
+        colunas["passo_computacao_ms"] = np.asarray(self.computacao, dtype="float32") * 1000
+        colunas["passo_entre_passos_ms"] = np.asarray(self.entre_passos, dtype="float32") * 1000
+        colunas["passo_imagens"] = np.asarray(self.imagens, dtype="int32")
+        return colunas
+
+
+class RegistradorLotes(Callback):
+    """Guarda os logs de cada lote de treino para o histórico por lote.
+
+    Os valores são os que o Keras entrega ao fim do lote: a média acumulada
+    na época, a mesma da barra de progresso.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._epoca_atual = 0
+        self.colunas: Dict[str, List[float]] = {"epoca": []}
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoca_atual = epoch + 1
+
+    def on_train_batch_end(self, batch, logs=None):
+        linha = len(self.colunas["epoca"])
+        self.colunas["epoca"].append(self._epoca_atual)
+        for chave, valor in (logs or {}).items():
+            # Métricas que surgem depois do primeiro lote são completadas com NaN.
+            self.colunas.setdefault(chave, [float("nan")] * linha).append(float(valor))
+
+
+__all__ = ["MedidorPassos", "RegistradorLotes", "interpretar_janela", "rss_pico_mb"]
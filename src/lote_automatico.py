@@ -0,0 +1,314 @@
+"""Escolha automática do tamanho de lote pelo orçamento de memória.
+
+Com `--batch-size auto`, cada tamanho candidato (8, 16, 32, ...) é testado em
+um subprocesso. O subprocesso monta o modelo com o mesmo perfil de CPU, roda
+alguns passos de treino sobre um lote sintético e informa o pico de memória
+residente e as imagens/s. O teste é feito fora do processo de treino para que
+um lote grande demais, morto pelo OOM killer, não derrube o treino. A
+sondagem para no primeiro lote que passa do orçamento.
+
+Entre os lotes que cabem, vence o de maior vazão. Se o lote efetivo desejado
+(`--lote-efetivo`) não cabe, o treino usa um micro-lote que cabe e acumula
+gradientes (`gradient_accumulation_steps` do otimizador) até chegar ao lote
+efetivo. Os resultados ficam em `cache/lote_automatico.json` por máquina,
+modelo e perfil, e só são refeitos com `--ressondar-lote`.
+
+Uso direto (um candidato, saída JSON):
+    python src/lote_automatico.py --modelo resnet --lote 64 --passos 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - dependência opcional
+    psutil = None  # type: ignore[assignment]
+
+CANDIDATOS = (8, 16, 32, 64, 128, 256)
+MEMORIA_ENV = "CARDIOIA_MEMORIA_MAX_MB"
+CACHE_PADRAO = Path(__file__).resolve().parents[1] / "cache" / "lote_automatico.json"
+# O lote sintético não inclui os buffers do pipeline de dados nem a validação.
+FOLGA = 0.9
+LOTE_PADRAO = 32
+
+
+def memoria_disponivel_mb() -> float:
+    """Memória que o treino pode usar: a disponível no sistema, limitada pelo cgroup (Docker/Colab)."""
+
+    if psutil is not None:
+        disponivel = psutil.virtual_memory().available / 2**20
+    else:
+        disponivel = os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / 2**20
+    for arquivo in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            limite = Path(arquivo).read_text().strip()
+        except OSError:
+            continue
+        if limite.isdigit():
+            disponivel = min(disponivel, int(limite) / 2**20)
+        break
+    return disponivel
+
+
+def orcamento_mb(memoria_max_mb: Optional[float] = None) -> float:
+    """Orçamento de memória: argumento, `CARDIOIA_MEMORIA_MAX_MB` ou 80% da disponível."""
+
+    if memoria_max_mb:
+        return float(memoria_max_mb)
+    if os.environ.get(MEMORIA_ENV):
+        return float(os.environ[MEMORIA_ENV])
+    return 0.8 * memoria_disponivel_mb()
+
+
+def sondar(modelo: str, lote: int, passos: int = 3, perf_profile: str = "default") -> Dict[str, object]:
+    """Roda um candidato em subprocesso e devolve pico de RSS e vazão.
+
+    Returns:
+        {"lote", "coube", "rss_pico_mb", "imagens_por_segundo"}; `coube` é
+        False se o processo morreu (OOM) ou falhou.
+    """
+
+    comando = [
+        sys.executable,
+        os.fspath(Path(__file__).resolve()),
+        "--modelo",
+        modelo,
+        "--lote",
+        str(lote),
+        "--passos",
+        str(passos),
+        "--perf-profile",
+        perf_profile,
+    ]
+    resultado = subprocess.run(comando, capture_output=True, text=True, check=False)
+    linhas = [linha for linha in resultado.stdout.splitlines() if linha.startswith("{")]
+    if resultado.returncode != 0 or not linhas:
+        motivo = "morto pelo sistema (OOM?)" if resultado.returncode < 0 else resultado.stderr.strip()[-300:]
+        print(f"[lote_automatico] Lote {lote}: falhou ({motivo}).")
+        return {"lote": lote, "coube": False, "rss_pico_mb": None, "imagens_por_segundo": None}
+    medida = json.loads(linhas[-1])
+    medida["coube"] = True
+    return medida
+
+
+def _dividir(lote_efetivo: int, limite: int) -> Tuple[int, int]:
+    """Micro-lote de até `limite` imagens e acumulação que somam o lote efetivo.
+
+    Usa o maior divisor do lote efetivo até `limite`. Se ele for menor que a
+    metade do limite (ex.: lote efetivo primo), mantém `limite` e arredonda o
+    lote efetivo para cima, com aviso.
+    """
+
+    divisor = next(candidato for candidato in range(limite, 0, -1) if lote_efetivo % candidato == 0)
+    if 2 * divisor >= limite:
+        return divisor, lote_efetivo // divisor
+    acumulacao = math.ceil(lote_efetivo / limite)
+    print(
+        f"[lote_automatico] Aviso: o lote efetivo {lote_efetivo} não se divide em micro-lotes próximos de "
+        f"{limite}; usando {limite} x {acumulacao} = {limite * acumulacao}."
+    )
+    return limite, acumulacao
+
+
+def _chave_cache(modelo: str, perf_profile: str) -> str:
+    return f"{platform.node()}|{os.cpu_count()}|{modelo}|{perf_profile}"
+
+
+def escolher(
+    modelo: str,
+    perf_profile: str = "default",
+    lote_efetivo: Optional[int] = None,
+    memoria_max_mb: Optional[float] = None,
+    passos: int = 3,
+    cache_path: Path = CACHE_PADRAO,
+    ressondar: bool = False,
+) -> Dict[str, object]:
+    """Sonda os candidatos e escolhe micro-lote e acumulação de gradientes.
+
+    Args:
+        modelo: "cnn" ou "resnet".
+        perf_profile: Perfil de CPU do treino (afeta memória e vazão).
+        lote_efetivo: Lote efetivo desejado; sem valor, vale o lote de maior vazão.
+        memoria_max_mb: Orçamento de memória do processo de treino.
+        passos: Passos medidos por candidato, após um de aquecimento.
+        cache_path: Arquivo com as sondagens anteriores.
+        ressondar: Ignora as medidas guardadas no cache.
+
+    Returns:
+        Configuração escolhida e as medidas de cada candidato, para o metrics.json.
+    """
+
+    orcamento = orcamento_mb(memoria_max_mb)
+    cache = json.loads(cache_path.read_text(encoding="utf-8")) if cache_path.exists() else {}
+    chave = _chave_cache(modelo, perf_profile)
+    guardadas = {} if ressondar else {int(lote): medida for lote, medida in cache.get(chave, {}).items()}
+
+    medidas: List[Dict[str, object]] = []
+    for lote in CANDIDATOS:
+        if lote in guardadas:
+            medida = guardadas[lote]
+        else:
+            inicio = time.perf_counter()
+            medida = sondar(modelo, lote, passos, perf_profile)
+            print(
+                f"[lote_automatico] Lote {lote}: RSS {medida['rss_pico_mb']} MB, "
+                f"{medida['imagens_por_segundo']} imagens/s ({time.perf_counter() - inicio:.0f}s)."
+            )
+            guardadas[lote] = medida
+        cabe = bool(medida["coube"]) and medida["rss_pico_mb"] <= FOLGA * orcamento
+        medidas.append({**medida, "dentro_do_orcamento": cabe})
+        if not cabe:
+            break
+
+    cache[chave] = {str(lote): medida for lote, medida in guardadas.items()}
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    cache_path.write_text(json.dumps(cache, indent=2), encoding="utf-8")
+
+    validos = [medida for medida in medidas if medida["dentro_do_orcamento"]]
+    if not validos:
+        raise RuntimeError(
+            f"Nenhum lote a partir de {CANDIDATOS[0]} cabe em {orcamento:.0f} MB. "
+            f"Aumente --memoria-max-mb ou use um perfil mais econômico."
+        )
+    maior = validos[-1]["lote"]
+    if lote_efetivo and lote_efetivo <= maior:
+        # Cabe inteiro (um candidato maior coube): sem acumulação.
+        micro, acumulacao = lote_efetivo, 1
+    elif lote_efetivo:
+        # Candidatos que dividem o lote efetivo; o de maior vazão define a acumulação.
+        divisores = [medida for medida in validos if lote_efetivo % medida["lote"] == 0]
+        if divisores:
+            micro = max(divisores, key=lambda medida: medida["imagens_por_segundo"])["lote"]
+            acumulacao = lote_efetivo // micro
+        else:
+            micro, acumulacao = _dividir(lote_efetivo, maior)
+    else:
+        micro, acumulacao = max(validos, key=lambda medida: medida["imagens_por_segundo"])["lote"], 1
+
+    return {
+        "modo": "auto",
+        "micro_lote": micro,
+        "acumulacao": acumulacao,
+        "lote_efetivo": micro * acumulacao,
+        "lote_efetivo_pedido": lote_efetivo,
+        "memoria_max_mb": round(orcamento, 1),
+        "candidatos": medidas,
+    }
+
+
+def configurar(
+    batch_size: int | str,
+    modelo: str,
+    perf_profile: str = "default",
+    lote_efetivo: Optional[int] = None,
+    memoria_max_mb: Optional[float] = None,
+    sondar_memoria: bool = True,
+    ressondar: bool = False,
+) -> Dict[str, object]:
+    """Resolve `--batch-size` (número ou "auto") e `--lote-efetivo` em micro-lote e acumulação.
+
+    Com `--batch-size` fixo e um lote efetivo maior, o micro-lote passa a ser o
+    maior divisor do lote efetivo até `batch_size` (veja `_dividir`), para não
+    mudar o lote efetivo pedido. O resultado traz o pedido em `lote_efetivo_pedido`.
+
+    Args:
+        sondar_memoria: Com False (ex.: cache de embeddings, em que o lote não
+            pesa na memória), o modo auto não sonda e usa o lote efetivo.
+    """
+
+    if batch_size != "auto":
+        micro, acumulacao = int(batch_size), 1
+        if lote_efetivo and lote_efetivo > micro:
+            # `--batch-size` é o teto do micro-lote; o lote efetivo pedido é mantido quando possível.
+            micro, acumulacao = _dividir(lote_efetivo, int(batch_size))
+            if micro != int(batch_size):
+                print(
+                    f"[lote_automatico] Micro-lote {batch_size} -> {micro} para o lote efetivo "
+                    f"{lote_efetivo} ({micro} x {acumulacao})."
+                )
+        return {
+            "modo": "fixo",
+            "micro_lote": micro,
+            "acumulacao": acumulacao,
+            "lote_efetivo": micro * acumulacao,
+            "lote_efetivo_pedido": lote_efetivo,
+        }
+    if not sondar_memoria:
+        lote = lote_efetivo or LOTE_PADRAO
+        return {
+            "modo": "auto",
+            "micro_lote": lote,
+            "acumulacao": 1,
+            "lote_efetivo": lote,
+            "lote_efetivo_pedido": lote_efetivo,
+            "candidatos": [],
+        }
+    return escolher(modelo, perf_profile, lote_efetivo, memoria_max_mb, ressondar=ressondar)
+
+
+def _medir(modelo_nome: str, lote: int, passos: int, perf_profile: str) -> Dict[str, object]:
+    """Executado no subprocesso: alguns passos de treino sobre um lote sintético."""
+
+    import numpy as np
+
+    if __package__ in (None, ""):
+        sys.path.append(str(Path(__file__).resolve().parent))
+        import instrumentacao  # type: ignore
+        import model_resnet  # type: ignore
+        import model_simple_cnn  # type: ignore
+        import perfil_cpu  # type: ignore
+    else:  # pragma: no cover
+        from . import instrumentacao, model_resnet, model_simple_cnn, perfil_cpu
+
+    perfil = perfil_cpu.aplicar_perfil(perf_profile)
+    if modelo_nome == "cnn":
+        modelo = model_simple_cnn.construir_modelo(jit_compile=perfil["jit_compile"])
+    else:
+        # Pesos aleatórios: mesma memória, sem download
+        modelo = model_resnet.construir_modelo(jit_compile=perfil["jit_compile"], weights=None)
+
+    gerador = np.random.default_rng(0)
+    x = gerador.random((lote, 224, 224, 3), dtype=np.float32)
+    y = gerador.integers(0, 2, (lote, 1)).astype("float32")
+    modelo.train_on_batch(x, y)  # aquecimento: tracing e alocações
+    inicio = time.perf_counter()
+    for _ in range(passos):
+        modelo.train_on_batch(x, y)
+    duracao = time.perf_counter() - inicio
+    return {
+        "lote": lote,
+        "rss_pico_mb": instrumentacao.rss_pico_mb(),
+        "imagens_por_segundo": round(lote * passos / duracao, 2),
+    }
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Mede memória e vazão de um tamanho de lote")
+    parser.add_argument("--modelo", choices=["cnn", "resnet"], default="cnn", help="Modelo a sondar")
+    parser.add_argument("--lote", type=int, required=True, help="Tamanho do lote")
+    parser.add_argument("--passos", type=int, default=3, help="Passos medidos após o aquecimento")
+    parser.add_argument("--perf-profile", type=str, default="default", help="Perfil de CPU (perfil_cpu.PERFIS)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    print(json.dumps(_medir(args.modelo, args.lote, args.passos, args.perf_profile)))
+
+
+__all__ = ["configurar", "escolher", "memoria_disponivel_mb", "orcamento_mb", "sondar"]
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 """Definição do modelo ResNet50 com cabeça customizada para o CardioIA."""
 
-from typing import Tuple
+from typing import Optional, Tuple
 
 from tensorflow.keras.applications import ResNet50
 from tensorflow.keras.layers import (Dense, Dropout, GlobalAveragePooling2D,
@@ -9,15 +9,34 @@ from tensorflow.keras.models import Model
 from tensorflow.keras.optimizers import Adam
 
 
+def criar_otimizador(learning_rate: float, acumulacao_gradientes: int = 1) -> Adam:
+    """Cria o Adam usado pelos modelos do projeto.
+
+    O Keras recusa `gradient_accumulation_steps=1`; sem acumulação, o argumento fica de fora.
+    """
+
+    if acumulacao_gradientes > 1:
+        return Adam(learning_rate=learning_rate, gradient_accumulation_steps=acumulacao_gradientes)
+    return Adam(learning_rate=learning_rate)
+
+
 def construir_modelo(
     input_shape: Tuple[int, int, int] = (224, 224, 3),
     learning_rate: float = 1e-4,
+    jit_compile: bool = False,
+    weights: Optional[str] = "imagenet",
+    acumulacao_gradientes: int = 1,
 ) -> Model:
     """Monta um modelo de transferência de aprendizado baseado na ResNet50.
 
     Args:
         input_shape: Dimensão das imagens de entrada (altura, largura, canais).
         learning_rate: Taxa de aprendizado para o otimizador Adam.
+        jit_compile: Compila os passos de treino e inferência com XLA.
+        weights: Pesos do backbone; None inicializa aleatoriamente (sem download),
+            útil para benchmarks.
+        acumulacao_gradientes: Lotes cujos gradientes são acumulados (média) antes de cada
+            atualização dos pesos (lote efetivo = lote x acumulação).
 
     Returns:
         Instância compilada de `tensorflow.keras.Model` pronta para treinamento.
@@ -25,7 +44,7 @@ def construir_modelo(
 
     entradas = Input(shape=input_shape)
     base_model = ResNet50(
-        weights="imagenet",
+        weights=weights,
         include_top=False,
         input_tensor=entradas,
     )
@@ -37,14 +56,65 @@ def construir_modelo(
     x = GlobalAveragePooling2D()(x)
     x = Dense(128, activation="relu")(x)
     x = Dropout(0.5)(x)
-    saidas = Dense(1, activation="sigmoid")(x)
+    # Saída em float32 mesmo sob precisão mista, para a sigmoide e a loss
+    saidas = Dense(1, activation="sigmoid", dtype="float32")(x)
 
     modelo = Model(inputs=entradas, outputs=saidas, name="CardioIA_ResNet50")
 
     modelo.compile(
-        optimizer=Adam(learning_rate=learning_rate),
+        optimizer=criar_otimizador(learning_rate, acumulacao_gradientes),
         loss="binary_crossentropy",
         metrics=["accuracy", "Precision", "Recall"],
+        jit_compile=jit_compile,
     )
 
     return modelo
+
+
+def construir_cabeca(
+    dim_entrada: int = 2048,
+    learning_rate: float = 1e-4,
+    jit_compile: bool = False,
+    acumulacao_gradientes: int = 1,
+) -> Model:
+    """Monta apenas a cabeça densa, treinável sobre embeddings pré-calculados.
+
+    As camadas espelham as que `construir_modelo` empilha após o
+    GlobalAveragePooling2D, permitindo transferir os pesos com `transferir_cabeca`.
+    """
+
+    entradas = Input(shape=(dim_entrada,))
+    x = Dense(128, activation="relu")(entradas)
+    x = Dropout(0.5)(x)
+    saidas = Dense(1, activation="sigmoid", dtype="float32")(x)
+
+    cabeca = Model(inputs=entradas, outputs=saidas, name="CardioIA_ResNet50_Cabeca")
+
+    cabeca.compile(
+        optimizer=criar_otimizador(learning_rate, acumulacao_gradientes),
+        loss="binary_crossentropy",
+        metrics=["accuracy", "Precision", "Recall"],
+        jit_compile=jit_compile,
+    )
+
+    return cabeca
+
+
+def extrair_backbone(modelo: Model) -> Model:
+    """Retorna o sub-modelo que vai da entrada até o GlobalAveragePooling2D."""
+
+    pooling = next(layer for layer in modelo.layers if isinstance(layer, GlobalAveragePooling2D))
+    return Model(inputs=modelo.inputs, outputs=pooling.output, name="CardioIA_ResNet50_Backbone")
+
+
+def transferir_cabeca(modelo: Model, cabeca: Model) -> None:
+    """Copia os pesos das camadas densas da cabeça para o modelo completo."""
+
+    densas_modelo = [layer for layer in modelo.layers if isinstance(layer, Dense)]
+    densas_cabeca = [layer for layer in cabeca.layers if isinstance(layer, Dense)]
+
+    if len(densas_modelo) != len(densas_cabeca):
+        raise ValueError("A cabeça não corresponde às camadas densas do modelo completo.")
+
+    for destino, origem in zip(densas_modelo, densas_cabeca):
+        destino.set_weights(origem.get_weights())
@@ -1,18 +1,32 @@
 """Modelo base CNN simples para comparação no CardioIA."""
 
+import sys
+from pathlib import Path
 from typing import Tuple
 
 from tensorflow.keras.layers import (Conv2D, Dense, Dropout, Flatten, Input,
                                      MaxPooling2D)
 from tensorflow.keras.models import Model
-from tensorflow.keras.optimizers import Adam
+
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parent))
+    import model_resnet  # type: ignore
+else:  # pragma: no cover
+    from . import model_resnet
 
 
 def construir_modelo(
     input_shape: Tuple[int, int, int] = (224, 224, 3),
     learning_rate: float = 1e-3,
+    jit_compile: bool = False,
+    acumulacao_gradientes: int = 1,
 ) -> Model:
-    """Constrói uma CNN rasa para servir de baseline ao projeto."""
+    """Constrói uma CNN rasa para servir de baseline ao projeto.
+
+    Com `jit_compile=True`, os passos de treino e inferência são compilados com XLA.
+    Com `acumulacao_gradientes > 1`, os gradientes de vários lotes são acumulados (média)
+    antes de cada atualização dos pesos.
+    """
 
     entradas = Input(shape=input_shape)
 
@@ -28,14 +42,16 @@ def construir_modelo(
     x = Flatten()(x)
     x = Dense(64, activation="relu")(x)
     x = Dropout(0.5)(x)
-    saida = Dense(1, activation="sigmoid")(x)
+    # Saída em float32 mesmo sob precisão mista, para a sigmoide e a loss
+    saida = Dense(1, activation="sigmoid", dtype="float32")(x)
 
     modelo = Model(inputs=entradas, outputs=saida, name="CardioIA_CNN_Simples")
 
     modelo.compile(
-        optimizer=Adam(learning_rate=learning_rate),
+        optimizer=model_resnet.criar_otimizador(learning_rate, acumulacao_gradientes),
         loss="binary_crossentropy",
         metrics=["accuracy"],
+        jit_compile=jit_compile,
     )
 
     return modelo
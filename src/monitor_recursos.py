@@ -0,0 +1,221 @@
+"""Monitor de recursos do processo de treino do CardioIA.
+
+Uma thread amostra, em intervalo fixo, o uso de CPU do processo e do sistema,
+a memória residente (RSS), a memória disponível na máquina, os bytes lidos e
+escritos em disco, os arquivos abertos e o número de threads. As amostras
+ficam em colunas e são gravadas em um `.npz` compacto. O arquivo é regravado
+periodicamente durante o treino, de modo que mesmo um processo morto pelo OOM
+killer deixa a linha do tempo até poucos segundos antes do fim.
+
+Depende do `psutil`; sem ele o monitor apenas avisa e não coleta nada.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.figure import Figure
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - dependência opcional
+    psutil = None  # type: ignore[assignment]
+
+COLUNAS = (
+    "cpu_processo",
+    "cpu_sistema",
+    "rss_mb",
+    "memoria_disponivel_mb",
+    "leitura_mb",
+    "escrita_mb",
+    "arquivos_abertos",
+    "threads",
+)
+MB = 1024 * 1024
+
+
+class MonitorRecursos:
+    """Amostrador em segundo plano do consumo de recursos do processo atual.
+
+    Args:
+        intervalo_s: Segundos entre amostras.
+        destino: Arquivo `.npz` regravado a cada `gravar_a_cada_s` segundos
+            e ao parar (None mantém as amostras só em memória).
+        gravar_a_cada_s: Intervalo das gravações parciais em `destino`.
+    """
+
+    def __init__(
+        self,
+        intervalo_s: float = 1.0,
+        destino: str | Path | None = None,
+        gravar_a_cada_s: float = 30.0,
+    ) -> None:
+        self.intervalo_s = intervalo_s
+        self.destino = Path(destino) if destino else None
+        self.gravar_a_cada_s = gravar_a_cada_s
+        self.ativo = psutil is not None
+        self.inicio = 0.0
+        self.tempo: List[float] = []
+        self.colunas: Dict[str, List[float]] = {nome: [] for nome in COLUNAS}
+        self._parar = threading.Event()
+        self._trava = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        if not self.ativo:
+            print("[monitor_recursos] psutil não instalado; monitor de recursos desligado.")
+
+    def __enter__(self) -> "MonitorRecursos":
+        self.iniciar()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.parar()
+
+    def iniciar(self) -> None:
+        if not self.ativo or self._thread is not None:
+            return
+        self._processo = psutil.Process(os.getpid())
+        # A primeira leitura de cpu_percent só estabelece a referência.
+        self._processo.cpu_percent(None)
+        psutil.cpu_percent(None)
+        self.inicio = time.time()
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, name="monitor-recursos", daemon=True)
+        self._thread.start()
+
+    def parar(self) -> Optional[Path]:
+        """Encerra a amostragem e grava o arquivo final, se houver destino."""
+
+        if self._thread is None:
+            return None
+        self._parar.set()
+        self._thread.join()
+        self._thread = None
+        return self.salvar(self.destino) if self.destino else None
+
+    def _executar(self) -> None:
+        ultima_gravacao = time.monotonic()
+        while not self._parar.wait(self.intervalo_s):
+            self._amostrar()
+            if self.destino and time.monotonic() - ultima_gravacao >= self.gravar_a_cada_s:
+                self.salvar(self.destino)
+                ultima_gravacao = time.monotonic()
+
+    def _amostrar(self) -> None:
+        processo = self._processo
+        try:
+            with processo.oneshot():
+                cpu = processo.cpu_percent(None)
+                rss = processo.memory_info().rss / MB
+                threads = processo.num_threads()
+                arquivos = processo.num_fds() if hasattr(processo, "num_fds") else processo.num_handles()
+                try:
+                    io = processo.io_counters()
+                    leitura, escrita = io.read_bytes / MB, io.write_bytes / MB
+                except (AttributeError, psutil.AccessDenied):  # indisponível no macOS
+                    leitura = escrita = float("nan")
+        except psutil.Error:
+            return
+        valores = (
+            cpu,
+            psutil.cpu_percent(None),
+            rss,
+            psutil.virtual_memory().available / MB,
+            leitura,
+            escrita,
+            arquivos,
+            threads,
+        )
+        with self._trava:
+            self.tempo.append(time.time() - self.inicio)
+            for nome, valor in zip(COLUNAS, valores):
+                self.colunas[nome].append(valor)
+
+    def salvar(self, destino: str | Path) -> Path:
+        """Grava as colunas em `.npz` (substituição atômica do arquivo anterior)."""
+
+        destino = Path(destino)
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        with self._trava:
+            arrays = {nome: np.asarray(valores, dtype="float32") for nome, valores in self.colunas.items()}
+            arrays["tempo_s"] = np.asarray(self.tempo, dtype="float32")
+        temporario = destino.with_name(f".{destino.stem}.tmp.npz")
+        np.savez_compressed(
+            temporario,
+            inicio=np.float64(self.inicio),
+            intervalo_s=np.float32(self.intervalo_s),
+            cpus=np.int32(psutil.cpu_count() if psutil is not None else os.cpu_count() or 1),
+            **arrays,
+        )
+        os.replace(temporario, destino)
+        return destino
+
+    def resumo(self) -> Dict[str, Optional[float]]:
+        """Picos e médias para o metrics.json."""
+
+        with self._trava:
+            if not self.tempo:
+                return {"amostras": 0}
+            colunas = {nome: np.asarray(valores, dtype="float64") for nome, valores in self.colunas.items()}
+            duracao = self.tempo[-1]
+
+        def _arredondar(valor: float) -> Optional[float]:
+            return None if np.isnan(valor) else round(float(valor), 2)
+
+        return {
+            "amostras": len(colunas["rss_mb"]),
+            "intervalo_s": self.intervalo_s,
+            "cpu_processo_medio": _arredondar(colunas["cpu_processo"].mean()),
+            "cpu_sistema_medio": _arredondar(colunas["cpu_sistema"].mean()),
+            "rss_pico_mb": _arredondar(colunas["rss_mb"].max()),
+            "memoria_disponivel_min_mb": _arredondar(colunas["memoria_disponivel_mb"].min()),
+            "leitura_total_mb": _arredondar(colunas["leitura_mb"][-1] - colunas["leitura_mb"][0]),
+            "escrita_total_mb": _arredondar(colunas["escrita_mb"][-1] - colunas["escrita_mb"][0]),
+            "arquivos_abertos_max": _arredondar(colunas["arquivos_abertos"].max()),
+            "duracao_s": round(duracao, 1),
+        }
+
+
+def desenhar(caminho: str | Path) -> Figure:
+    """Figura de utilização (CPU, memória, disco e arquivos abertos) a partir do `.npz`."""
+
+    with np.load(caminho) as dados:
+        colunas = {nome: dados[nome] for nome in dados.files}
+
+    minutos = colunas["tempo_s"] / 60
+    fig, axes = plt.subplots(3, 1, figsize=(12, 9), sharex=True)
+
+    axes[0].plot(minutos, colunas["cpu_processo"], label="Processo")
+    axes[0].plot(minutos, colunas["cpu_sistema"] * int(colunas["cpus"]), label="Sistema", alpha=0.7)
+    axes[0].set_ylabel("CPU (%)")
+    axes[0].set_title(f"CPU (100% = 1 núcleo; {int(colunas['cpus'])} disponíveis)")
+
+    axes[1].plot(minutos, colunas["rss_mb"], label="RSS do processo")
+    axes[1].plot(minutos, colunas["memoria_disponivel_mb"], label="Disponível no sistema", alpha=0.7)
+    axes[1].set_ylabel("Memória (MB)")
+    axes[1].set_title("Memória")
+
+    intervalos = np.diff(colunas["tempo_s"], prepend=0.0)
+    intervalos[intervalos <= 0] = np.nan
+    for nome, rotulo in (("leitura_mb", "Leitura"), ("escrita_mb", "Escrita")):
+        axes[2].plot(minutos, np.diff(colunas[nome], prepend=colunas[nome][:1]) / intervalos, label=rotulo)
+    axes[2].set_ylabel("Disco (MB/s)")
+    axes[2].set_xlabel("Minutos desde o início")
+    axes[2].set_title("Disco e arquivos abertos")
+    arquivos = axes[2].twinx()
+    arquivos.plot(minutos, colunas["arquivos_abertos"], color="gray", linestyle="--", label="Arquivos abertos")
+    arquivos.set_ylabel("Arquivos abertos")
+
+    for ax in axes:
+        if ax.lines:
+            ax.legend(loc="upper left")
+    fig.tight_layout()
+    return fig
+
+
+__all__ = ["COLUNAS", "MonitorRecursos", "desenhar"]
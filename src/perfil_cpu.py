@@ -0,0 +1,91 @@
+"""Perfis de desempenho de CPU para o treinamento do CardioIA.
+
+Cada perfil combina compilação XLA (`jit_compile`) e precisão mista bfloat16,
+além de fixar o número de threads intra-op/inter-op e, opcionalmente, a
+afinidade de CPU do processo. `aplicar_perfil` precisa ser chamado antes de o
+modelo ser construído e antes da primeira operação do TensorFlow.
+
+As threads são configuradas só por `tf.config.threading`. Variáveis como
+`OMP_NUM_THREADS` e `KMP_BLOCKTIME` são lidas quando o TensorFlow é
+importado, antes deste módulo rodar, e o build padrão (oneDNN sobre o pool
+de threads do Eigen) as ignora; quem usar um build com OpenMP deve
+exportá-las no shell.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Dict, List, Optional
+
+import tensorflow as tf
+
+PERFIS = ("default", "xla", "bf16", "xla+bf16")
+
+
+def _cpus_disponiveis() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _interpretar_afinidade(afinidade: str) -> List[int]:
+    """Converte "0-3,6" em [0, 1, 2, 3, 6]."""
+
+    cpus: List[int] = []
+    for trecho in afinidade.split(","):
+        inicio, _, fim = trecho.strip().partition("-")
+        cpus.extend(range(int(inicio), int(fim or inicio) + 1))
+    return cpus
+
+
+def aplicar_perfil(
+    perfil: str = "default",
+    intra_op_threads: Optional[int] = None,
+    inter_op_threads: Optional[int] = None,
+    afinidade: Optional[str] = None,
+) -> Dict[str, object]:
+    """Configura threads, afinidade e política de precisão do processo.
+
+    Args:
+        perfil: Um dos `PERFIS`. "default" mantém os padrões do TensorFlow.
+        intra_op_threads: Threads por operação; sem valor, usa todas as CPUs
+            disponíveis nos perfis diferentes de "default".
+        inter_op_threads: Operações independentes em paralelo (padrão 2 fora de "default").
+        afinidade: CPUs às quais o processo fica preso, ex.: "0-7" (Linux).
+
+    Returns:
+        Configuração efetivamente aplicada, para registro no experimento.
+    """
+
+    if perfil not in PERFIS:
+        raise ValueError(f"Perfil desconhecido: {perfil}. Opções: {', '.join(PERFIS)}")
+
+    if afinidade:
+        if not hasattr(os, "sched_setaffinity"):
+            raise ValueError("Afinidade de CPU só é suportada no Linux.")
+        os.sched_setaffinity(0, _interpretar_afinidade(afinidade))
+
+    if perfil != "default":
+        intra_op_threads = intra_op_threads or _cpus_disponiveis()
+        inter_op_threads = inter_op_threads or 2
+
+    if intra_op_threads:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    if inter_op_threads:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+    politica = "mixed_bfloat16" if "bf16" in perfil else "float32"
+    tf.keras.mixed_precision.set_global_policy(politica)
+
+    return {
+        "nome": perfil,
+        "jit_compile": "xla" in perfil,
+        "politica_precisao": politica,
+        "intra_op_threads": tf.config.threading.get_intra_op_parallelism_threads(),
+        "inter_op_threads": tf.config.threading.get_inter_op_parallelism_threads(),
+        "cpus": _cpus_disponiveis(),
+        "afinidade": afinidade,
+    }
+
+
+__all__ = ["PERFIS", "aplicar_perfil"]
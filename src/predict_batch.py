@@ -0,0 +1,329 @@
+"""Inferência em lote do CardioIA sobre diretórios inteiros de radiografias.
+
+Percorre uma pasta (recursivamente), decodifica as imagens em um pool de
+threads enquanto o modelo processa o lote anterior e grava uma linha por
+imagem em CSV ou JSONL à medida que os lotes terminam. Com `--retomar`, as
+imagens já pontuadas no arquivo de saída são ignoradas e as que falharam são
+tentadas de novo.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from PIL import Image
+
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parent))
+    import inferencia  # type: ignore
+else:  # pragma: no cover
+    from . import inferencia
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg"}
+FORMATOS = ("csv", "jsonl")
+CAMPOS = ("caminho", "probabilidade", "classe", "erro")
+WORKERS_PADRAO = min(32, (os.cpu_count() or 1) * 2)
+
+Decodificada = Tuple[Optional[np.ndarray], Optional[str]]
+
+
+def listar_entradas(entrada: str | Path) -> List[Path]:
+    """Lista as imagens de um arquivo ou pasta (recursivamente), em ordem estável."""
+
+    entrada = Path(entrada).resolve()
+    if entrada.is_file():
+        return [entrada]
+    return sorted(
+        arquivo
+        for arquivo in entrada.rglob("*")
+        if arquivo.is_file() and arquivo.suffix.lower() in IMAGE_EXTENSIONS
+    )
+
+
+def _decodificar(caminho: Path) -> Decodificada:
+    """Abre e redimensiona uma imagem; erros de leitura viram mensagem, não exceção."""
+
+    try:
+        with Image.open(caminho) as imagem:
+            return inferencia.redimensionar(imagem), None
+    except (OSError, ValueError) as erro:
+        return None, f"{type(erro).__name__}: {erro}"
+
+
+def _lotes_decodificados(
+    caminhos: Sequence[Path],
+    batch_size: int,
+    executor: ThreadPoolExecutor,
+    profundidade: int = 2,
+) -> Iterator[Tuple[Sequence[Path], List[Decodificada]]]:
+    """Entrega lotes já decodificados mantendo `profundidade` lotes em preparo.
+
+    Enquanto o chamador roda o modelo sobre um lote, os próximos são
+    decodificados no pool, sobrepondo leitura de disco e inferência.
+    """
+
+    pendentes: deque[Tuple[Sequence[Path], List[Future]]] = deque()
+    for inicio in range(0, len(caminhos), batch_size):
+        bloco = caminhos[inicio : inicio + batch_size]
+        pendentes.append((bloco, [executor.submit(_decodificar, caminho) for caminho in bloco]))
+        if len(pendentes) > profundidade:
+            pronto, futuros = pendentes.popleft()
+            yield pronto, [futuro.result() for futuro in futuros]
+    while pendentes:
+        pronto, futuros = pendentes.popleft()
+        yield pronto, [futuro.result() for futuro in futuros]
+
+
+def _descartar_linha_incompleta(saida: Path) -> None:
+    """Corta a última linha da saída se ela não terminou (execução interrompida no meio da escrita).
+
+    Sem isso, a primeira linha anexada na retomada emendaria na linha truncada.
+    """
+
+    if not saida.exists():
+        return
+    with open(saida, "rb+") as arquivo:
+        fim = posicao = arquivo.seek(0, os.SEEK_END)
+        while posicao > 0:
+            inicio = max(0, posicao - (1 << 16))
+            arquivo.seek(inicio)
+            bloco = arquivo.read(posicao - inicio)
+            if posicao == fim and bloco.endswith(b"\n"):
+                return
+            quebra = bloco.rfind(b"\n")
+            if quebra >= 0:
+                arquivo.truncate(inicio + quebra + 1)
+                return
+            posicao = inicio
+        arquivo.truncate(0)
+
+
+def _ja_processados(saida: Path, formato: str) -> Set[str]:
+    """Lê o arquivo de saída existente e retorna os caminhos pontuados com sucesso.
+
+    Linhas com erro de leitura (sem probabilidade) não contam: a retomada
+    tenta essas imagens de novo.
+    """
+
+    if not saida.exists():
+        return set()
+    with open(saida, encoding="utf-8", newline="") as arquivo:
+        if formato == "csv":
+            return {
+                linha["caminho"]
+                for linha in csv.DictReader(arquivo)
+                if linha.get("caminho") and linha.get("probabilidade")
+            }
+        processados = set()
+        for linha in arquivo:
+            try:
+                registro = json.loads(linha)
+            except json.JSONDecodeError:
+                continue
+            if registro.get("caminho") and registro.get("probabilidade") is not None:
+                processados.add(registro["caminho"])
+        return processados
+
+
+class _Escritor:
+    """Grava resultados em CSV ou JSONL com flush ao fim de cada lote."""
+
+    def __init__(self, saida: Path, formato: str, anexar: bool) -> None:
+        saida.parent.mkdir(parents=True, exist_ok=True)
+        novo = not (anexar and saida.exists() and saida.stat().st_size > 0)
+        self.formato = formato
+        self.arquivo = open(saida, "a" if anexar else "w", encoding="utf-8", newline="")
+        if formato == "csv":
+            self.csv = csv.DictWriter(self.arquivo, fieldnames=CAMPOS)
+            if novo:
+                self.csv.writeheader()
+
+    def escrever(self, registros: Sequence[dict]) -> None:
+        if self.formato == "csv":
+            self.csv.writerows(registros)
+        else:
+            self.arquivo.writelines(json.dumps(registro, ensure_ascii=False) + "\n" for registro in registros)
+        self.arquivo.flush()
+
+    def fechar(self) -> None:
+        self.arquivo.close()
+
+
+def predizer_lote(
+    modelo,
+    caminhos: Sequence[Path],
+    saida: str | Path,
+    formato: str = "csv",
+    batch_size: int = 64,
+    workers: int = WORKERS_PADRAO,
+    retomar: bool = False,
+) -> dict:
+    """Pontua `caminhos` em lotes de tamanho fixo e grava os resultados em `saida`.
+
+    Args:
+        modelo: Objeto com `predict_on_batch` (modelo Keras ou `ModeloTFLite`).
+        caminhos: Imagens a processar.
+        saida: Arquivo CSV ou JSONL de resultados.
+        formato: "csv" ou "jsonl".
+        batch_size: Tamanho fixo dos lotes; o último é completado com zeros para
+            manter sempre o mesmo formato de entrada.
+        workers: Threads de decodificação.
+        retomar: Ignora imagens já pontuadas em `saida` e anexa as novas. Imagens
+            que falharam antes são tentadas de novo; vale a linha mais recente.
+
+    Returns:
+        Resumo com contagens, vazão e percentis de latência por lote.
+    """
+
+    saida = Path(saida)
+    if retomar:
+        _descartar_linha_incompleta(saida)
+    ja_feitos = _ja_processados(saida, formato) if retomar else set()
+    pendentes = [caminho for caminho in caminhos if os.fspath(caminho) not in ja_feitos]
+    print(
+        f"[predict_batch] {len(pendentes)} imagens a processar "
+        f"({len(caminhos) - len(pendentes)} já presentes em {saida.name})."
+    )
+
+    escritor = _Escritor(saida, formato, anexar=retomar)
+    entrada = np.zeros((batch_size, *inferencia.IMAGE_SIZE, 3), dtype="uint8")
+    latencias_lote: List[float] = []
+    espera_decodificacao = 0.0
+    processadas = erros = 0
+
+    inicio = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            marca = time.perf_counter()
+            for bloco, decodificadas in _lotes_decodificados(pendentes, batch_size, executor):
+                espera_decodificacao += time.perf_counter() - marca
+
+                validos = [indice for indice, (array, _) in enumerate(decodificadas) if array is not None]
+                entrada[:] = 0
+                for posicao, indice in enumerate(validos):
+                    entrada[posicao] = decodificadas[indice][0]
+
+                inicio_lote = time.perf_counter()
+                probabilidades = np.asarray(
+                    modelo.predict_on_batch(inferencia.preprocessar_lote(entrada))
+                ).reshape(-1)
+                latencias_lote.append(time.perf_counter() - inicio_lote)
+
+                por_indice = dict(zip(validos, probabilidades[: len(validos)].tolist()))
+                registros = []
+                for indice, caminho in enumerate(bloco):
+                    probabilidade = por_indice.get(indice)
+                    registros.append(
+                        {
+                            "caminho": os.fspath(caminho),
+                            "probabilidade": None if probabilidade is None else round(probabilidade, 6),
+                            "classe": None if probabilidade is None else inferencia.classificar(probabilidade),
+                            "erro": decodificadas[indice][1],
+                        }
+                    )
+                escritor.escrever(registros)
+
+                processadas += len(validos)
+                erros += len(bloco) - len(validos)
+                marca = time.perf_counter()
+    finally:
+        escritor.fechar()
+    duracao = time.perf_counter() - inicio
+
+    resumo = {
+        "imagens": processadas,
+        "erros": erros,
+        "ignoradas_retomada": len(caminhos) - len(pendentes),
+        "lotes": len(latencias_lote),
+        "batch_size": batch_size,
+        "duracao_s": round(duracao, 3),
+        "imagens_por_segundo": round(processadas / duracao, 2) if duracao > 0 else None,
+        "espera_decodificacao_s": round(espera_decodificacao, 3),
+        "latencia_lote": inferencia.percentis(latencias_lote),
+        "latencia_por_imagem_ms": (
+            round(sum(latencias_lote) * 1000 / max(processadas, 1), 3) if latencias_lote else None
+        ),
+    }
+    return resumo
+
+
+def _imprimir_resumo(resumo: dict) -> None:
+    print(
+        f"[predict_batch] {resumo['imagens']} imagens ({resumo['erros']} com erro) "
+        f"em {resumo['duracao_s']:.2f}s -> {resumo['imagens_por_segundo']} imagens/s."
+    )
+    latencia = resumo["latencia_lote"]
+    print(
+        f"[predict_batch] Latência por lote de {resumo['batch_size']}: "
+        f"p50={latencia['p50_ms']} ms, p95={latencia['p95_ms']} ms, p99={latencia['p99_ms']} ms; "
+        f"{resumo['latencia_por_imagem_ms']} ms/imagem."
+    )
+    print(f"[predict_batch] Tempo esperando decodificação: {resumo['espera_decodificacao_s']:.2f}s.")
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Inferência em lote do CardioIA")
+    parser.add_argument("entrada", type=str, help="Imagem ou pasta de radiografias (busca recursiva)")
+    parser.add_argument(
+        "--saida",
+        type=str,
+        default="predicoes.csv",
+        help="Arquivo de resultados; a extensão .jsonl seleciona JSON Lines",
+    )
+    parser.add_argument("--formato", choices=FORMATOS, default=None, help="Força o formato de saída")
+    parser.add_argument(
+        "--modelo", type=str, default=None, help="Modelo .h5, .tflite ou pasta SavedModel (padrão: busca em models/)"
+    )
+    parser.add_argument(
+        "--runtime",
+        choices=inferencia.RUNTIMES,
+        default=None,
+        help=(
+            "Artefato de models/ a usar quando --modelo não é informado (padrão: $CARDIOIA_RUNTIME ou auto, "
+            "que usa o SavedModel quando ele não é mais antigo que o .h5)"
+        ),
+    )
+    parser.add_argument("--batch-size", type=int, default=64, help="Imagens por chamada ao modelo")
+    parser.add_argument("--workers", type=int, default=WORKERS_PADRAO, help="Threads de decodificação")
+    parser.add_argument("--retomar", action="store_true", help="Pula imagens já presentes na saída")
+    parser.add_argument("--resumo", type=str, default=None, help="Grava o resumo de desempenho em JSON")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    saida = Path(args.saida)
+    formato = args.formato or ("jsonl" if saida.suffix.lower() == ".jsonl" else "csv")
+
+    modelo = inferencia.carregar_modelo(args.modelo, args.runtime)
+    if modelo is None:
+        raise SystemExit("[predict_batch] Modelo não encontrado. Execute o pipeline de treinamento primeiro.")
+
+    caminhos = listar_entradas(args.entrada)
+    resumo = predizer_lote(
+        modelo,
+        caminhos,
+        saida,
+        formato=formato,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        retomar=args.retomar,
+    )
+    _imprimir_resumo(resumo)
+
+    if args.resumo:
+        Path(args.resumo).write_text(json.dumps(resumo, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
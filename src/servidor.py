@@ -0,0 +1,252 @@
+"""Servidor HTTP de inferência do CardioIA com micro-lotes dinâmicos.
+
+Carrega o modelo uma única vez e recebe radiografias via `POST /predict`
+(corpo = bytes da imagem). Cada requisição é decodificada na própria thread
+do servidor e entra em uma fila; uma thread de inferência junta as imagens que
+chegarem dentro de `max_wait_ms` (até `max_batch`) e chama o modelo uma vez
+por lote. `GET /metrics` expõe latência (p50/p99), profundidade da fila e
+tamanho médio dos lotes; `GET /health` indica se o modelo está pronto.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Deque, List, Tuple
+
+import numpy as np
+from PIL import Image, UnidentifiedImageError
+
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parent))
+    import inferencia  # type: ignore
+else:  # pragma: no cover
+    from . import inferencia
+
+HOST_PADRAO = os.getenv("CARDIOIA_SERVIDOR_HOST", "127.0.0.1")
+PORTA_PADRAO = int(os.getenv("CARDIOIA_SERVIDOR_PORTA", "8500"))
+MAX_BATCH_PADRAO = 32
+MAX_WAIT_MS_PADRAO = 10.0
+JANELA_METRICAS = 2048
+TAMANHO_MAXIMO_CORPO = 50 * 1024 * 1024
+
+Pedido = Tuple[np.ndarray, float, Future]
+
+
+class MicroLote:
+    """Agrupa pedidos individuais em lotes e os envia ao modelo em uma thread dedicada."""
+
+    def __init__(self, modelo, max_batch: int = MAX_BATCH_PADRAO, max_wait_ms: float = MAX_WAIT_MS_PADRAO) -> None:
+        self.modelo = modelo
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.fila: "queue.Queue[Pedido]" = queue.Queue()
+        self._trava = threading.Lock()
+        self._latencias: Deque[float] = deque(maxlen=JANELA_METRICAS)
+        self._tamanhos: Deque[int] = deque(maxlen=JANELA_METRICAS)
+        self._requisicoes = 0
+        self._lotes = 0
+        self._erros = 0
+        self._fila_maxima = 0
+        self._thread = threading.Thread(target=self._laco, name="cardioia-microlote", daemon=True)
+        self._thread.start()
+
+    def submeter(self, array: np.ndarray) -> Future:
+        """Enfileira uma imagem já redimensionada (224, 224, 3) e retorna o futuro da probabilidade."""
+
+        futuro: Future = Future()
+        self.fila.put((array, time.perf_counter(), futuro))
+        with self._trava:
+            self._fila_maxima = max(self._fila_maxima, self.fila.qsize())
+        return futuro
+
+    def _coletar(self) -> List[Pedido]:
+        lote = [self.fila.get()]
+        prazo = time.perf_counter() + self.max_wait
+        while len(lote) < self.max_batch:
+            restante = prazo - time.perf_counter()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self.fila.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _laco(self) -> None:
+        while True:
+            lote = self._coletar()
+            try:
+                entrada = inferencia.preprocessar_lote(np.stack([array for array, _, _ in lote]))
+                probabilidades = np.asarray(self.modelo.predict_on_batch(entrada)).reshape(-1).tolist()
+            except Exception as erro:  # noqa: BLE001 - o erro é repassado a cada requisição
+                for _, _, futuro in lote:
+                    futuro.set_exception(erro)
+                with self._trava:
+                    self._erros += len(lote)
+                continue
+
+            fim = time.perf_counter()
+            for (_, chegada, futuro), probabilidade in zip(lote, probabilidades):
+                futuro.set_result(probabilidade)
+            with self._trava:
+                self._lotes += 1
+                self._requisicoes += len(lote)
+                self._tamanhos.append(len(lote))
+                self._latencias.extend(fim - chegada for _, chegada, _ in lote)
+
+    def metricas(self) -> dict:
+        with self._trava:
+            latencias = list(self._latencias)
+            tamanhos = list(self._tamanhos)
+            return {
+                "requisicoes": self._requisicoes,
+                "lotes": self._lotes,
+                "erros": self._erros,
+                "tamanho_medio_lote": round(float(np.mean(tamanhos)), 2) if tamanhos else None,
+                "fila": self.fila.qsize(),
+                "fila_maxima": self._fila_maxima,
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+                "latencia": inferencia.percentis(latencias, (50, 99)),
+            }
+
+
+class _Servidor(ThreadingHTTPServer):
+    # O backlog padrão do socketserver (5) recusa conexões sob rajadas de clientes
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def _criar_handler(micro_lote: MicroLote):
+    class _Handler(BaseHTTPRequestHandler):
+        server_version = "CardioIA/1.0"
+
+        def _responder(self, status: int, corpo: dict) -> None:
+            dados = json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def do_GET(self) -> None:  # noqa: N802 - nome exigido pelo http.server
+            if self.path == "/metrics":
+                self._responder(200, micro_lote.metricas())
+            elif self.path == "/health":
+                self._responder(200, {"status": "ok"})
+            else:
+                self._responder(404, {"erro": "rota não encontrada"})
+
+        def do_POST(self) -> None:  # noqa: N802
+            if self.path != "/predict":
+                self._responder(404, {"erro": "rota não encontrada"})
+                return
+
+            tamanho = int(self.headers.get("Content-Length") or 0)
+            if not 0 < tamanho <= TAMANHO_MAXIMO_CORPO:
+                self._responder(400, {"erro": "envie os bytes da imagem no corpo da requisição"})
+                return
+
+            inicio = time.perf_counter()
+            try:
+                with Image.open(io.BytesIO(self.rfile.read(tamanho))) as imagem:
+                    array = inferencia.redimensionar(imagem)
+            except (UnidentifiedImageError, OSError, ValueError) as erro:
+                self._responder(400, {"erro": f"imagem inválida: {erro}"})
+                return
+
+            try:
+                probabilidade = micro_lote.submeter(array).result()
+            except Exception as erro:  # noqa: BLE001
+                self._responder(500, {"erro": str(erro)})
+                return
+
+            self._responder(
+                200,
+                {
+                    "probabilidade": probabilidade,
+                    "classe": inferencia.classificar(probabilidade),
+                    "latencia_ms": round((time.perf_counter() - inicio) * 1000, 2),
+                },
+            )
+
+        def log_message(self, formato: str, *args) -> None:
+            pass  # uma linha por requisição poluiria o terminal sob carga
+
+    return _Handler
+
+
+def criar_servidor(
+    modelo,
+    host: str = HOST_PADRAO,
+    porta: int = PORTA_PADRAO,
+    max_batch: int = MAX_BATCH_PADRAO,
+    max_wait_ms: float = MAX_WAIT_MS_PADRAO,
+) -> ThreadingHTTPServer:
+    """Monta o servidor HTTP com o micro-lote já em execução (sem iniciar o `serve_forever`)."""
+
+    micro_lote = MicroLote(modelo, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    servidor = _Servidor((host, porta), _criar_handler(micro_lote))
+    servidor.micro_lote = micro_lote  # type: ignore[attr-defined]
+    return servidor
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Servidor HTTP de inferência do CardioIA")
+    parser.add_argument("--host", type=str, default=HOST_PADRAO, help="Endereço de escuta")
+    parser.add_argument("--porta", type=int, default=PORTA_PADRAO, help="Porta de escuta")
+    parser.add_argument(
+        "--modelo", type=str, default=None, help="Modelo .h5, .tflite ou pasta SavedModel (padrão: busca em models/)"
+    )
+    parser.add_argument(
+        "--runtime",
+        choices=inferencia.RUNTIMES,
+        default=None,
+        help=(
+            "Artefato de models/ a usar quando --modelo não é informado (padrão: $CARDIOIA_RUNTIME ou auto, "
+            "que usa o SavedModel quando ele não é mais antigo que o .h5)"
+        ),
+    )
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_PADRAO, help="Imagens máximas por lote")
+    parser.add_argument(
+        "--max-wait-ms",
+        type=float,
+        default=MAX_WAIT_MS_PADRAO,
+        help="Tempo máximo que a primeira imagem espera por companhia no lote",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+
+    modelo = inferencia.carregar_modelo(args.modelo, args.runtime)
+    if modelo is None:
+        raise SystemExit("[servidor] Modelo não encontrado. Execute o pipeline de treinamento primeiro.")
+
+    servidor = criar_servidor(modelo, args.host, args.porta, args.max_batch, args.max_wait_ms)
+    print(
+        f"[servidor] Ouvindo em http://{args.host}:{args.porta} "
+        f"(max_batch={args.max_batch}, max_wait={args.max_wait_ms} ms)."
+    )
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("[servidor] Encerrando.")
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""Busca de hiperparâmetros do CardioIA com trials em paralelo e parada ASHA.
+
+Recebe um espaço de busca em JSON, por exemplo::
+
+    {"model": ["cnn"], "epochs": [20], "batch_size": [16, 32],
+     "learning_rate": {"min": 1e-5, "max": 1e-2, "log": true}}
+
+Listas viram grade (produto cartesiano); faixas `min`/`max` exigem
+`--amostras`, que sorteia configurações com semente fixa. Cada trial chama
+`train.treinar` em um processo próprio do pool, com o número de threads do
+TensorFlow limitado. A parada segue o ASHA (successive halving assíncrono):
+nos degraus `min_epocas * eta**k`, um trial só continua se o seu `val_loss`
+estiver entre a melhor fração `1/eta` dos trials que já passaram pelo mesmo
+degrau.
+
+Cada trial grava o seu metrics.json em `experiments/sweep_<timestamp>/trial_NNN/`
+e o resumo de todos fica em `resumo.json` e `resumo.csv` na mesma pasta, que é
+versionada com um único commit ao final.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import json
+import math
+import multiprocessing as mp
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+from tensorflow.keras.callbacks import Callback
+
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parent))
+    import auth  # type: ignore
+    import indice_experimentos  # type: ignore
+    import train  # type: ignore
+    import utils_git  # type: ignore
+else:  # pragma: no cover
+    from . import auth, indice_experimentos, train, utils_git
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+# Chave do espaço de busca (mesmos nomes de `params` no metrics.json) -> argumento de `treinar`
+PARAMETROS = {
+    "model": "model_name",
+    "epochs": "epochs",
+    "batch_size": "batch_size",
+    "lote_efetivo": "lote_efetivo",
+    "learning_rate": "learning_rate",
+    "data_backend": "data_backend",
+    "embedding_cache": "cache_embeddings",
+    "vistas": "vistas",
+    "perf_profile": "perf_profile",
+}
+PADROES = {"model": "cnn", "epochs": 20, "batch_size": 32, "learning_rate": 1e-4}
+CAMPOS_RESUMO = (
+    "trial",
+    "status",
+    "podado_na_epoca",
+    "epocas",
+    "melhor_val_loss",
+    "val_accuracy",
+    "passos_por_segundo",
+    "duracao_s",
+    "config",
+    "erro",
+)
+
+
+def gerar_configuracoes(
+    espaco: Mapping[str, object],
+    amostras: Optional[int] = None,
+    seed: int = 42,
+) -> List[Dict[str, object]]:
+    """Expande o espaço de busca em configurações completas de trial.
+
+    Raises:
+        ValueError: Chave desconhecida, ou faixa contínua sem `amostras`.
+    """
+
+    desconhecidas = set(espaco) - set(PARAMETROS)
+    if desconhecidas:
+        raise ValueError(f"Parâmetros desconhecidos no espaço de busca: {', '.join(sorted(desconhecidas))}")
+
+    valores = {chave: valor if isinstance(valor, (list, dict)) else [valor] for chave, valor in espaco.items()}
+    if amostras is None:
+        faixas = [chave for chave, valor in valores.items() if isinstance(valor, dict)]
+        if faixas:
+            raise ValueError(f"Faixas contínuas ({', '.join(faixas)}) exigem --amostras.")
+        chaves = list(valores)
+        return [
+            {**PADROES, **dict(zip(chaves, combinacao))}
+            for combinacao in itertools.product(*(valores[chave] for chave in chaves))
+        ]
+
+    gerador = np.random.default_rng(seed)
+    configuracoes = []
+    for _ in range(amostras):
+        config = dict(PADROES)
+        for chave, valor in valores.items():
+            if isinstance(valor, dict):
+                minimo, maximo = float(valor["min"]), float(valor["max"])
+                if valor.get("log"):
+                    config[chave] = float(math.exp(gerador.uniform(math.log(minimo), math.log(maximo))))
+                else:
+                    config[chave] = float(gerador.uniform(minimo, maximo))
+            else:
+                config[chave] = valor[int(gerador.integers(len(valor)))]
+        configuracoes.append(config)
+    return configuracoes
+
+
+def degraus_asha(min_epocas: int, eta: int, max_epocas: int) -> List[int]:
+    """Épocas em que o ASHA avalia os trials: min_epocas * eta**k < max_epocas."""
+
+    degraus = []
+    epoca = min_epocas
+    while epoca < max_epocas:
+        degraus.append(epoca)
+        epoca *= eta
+    return degraus
+
+
+class ParadaASHA(Callback):
+    """Interrompe o trial se o `val_loss` não estiver no melhor 1/eta do degrau.
+
+    Os valores de cada degrau ficam em um dicionário compartilhado entre os
+    processos (`multiprocessing.Manager`). O corte é calculado sobre os trials
+    que chegaram antes ao degrau; o primeiro a chegar sempre continua.
+
+    Args:
+        degraus: Épocas (contadas a partir de 1) em que há avaliação.
+        registros: Dicionário compartilhado degrau -> lista de `val_loss`.
+        trava: Lock compartilhado que protege `registros`.
+        eta: Fator de redução do successive halving.
+    """
+
+    def __init__(self, degraus: Sequence[int], registros, trava, eta: int = 3, monitor: str = "val_loss") -> None:
+        super().__init__()
+        self.degraus = set(degraus)
+        self.registros = registros
+        self.trava = trava
+        self.eta = eta
+        self.monitor = monitor
+        self.podado_na_epoca: Optional[int] = None
+
+    def on_epoch_end(self, epoch, logs=None):
+        epoca = epoch + 1
+        if epoca not in self.degraus:
+            return
+        valor = (logs or {}).get(self.monitor)
+        valor = float(valor) if valor is not None else math.nan
+
+        with self.trava:
+            anteriores = list(self.registros.get(epoca, []))
+            self.registros[epoca] = anteriores + [valor]
+
+        validos = [anterior for anterior in anteriores if math.isfinite(anterior)]
+        corte = float(np.quantile(validos, 1 / self.eta)) if validos else math.inf
+        if not math.isfinite(valor) or valor > corte:
+            print(f"[sweep] ASHA: época {epoca}, {self.monitor}={valor:.4f} > corte {corte:.4f}; trial interrompido.")
+            self.podado_na_epoca = epoca
+            self.model.stop_training = True
+
+
+def _executar_trial(
+    indice: int,
+    config: Dict[str, object],
+    comum: Dict[str, object],
+    registros,
+    trava,
+) -> Dict[str, object]:
+    """Roda um trial em um processo do pool e devolve a linha do resumo."""
+
+    nome = f"trial_{indice:03d}"
+    destino = Path(comum["sweep_dir"]) / nome
+    trabalho = Path(comum["models_dir"]) / nome
+    parada = ParadaASHA(
+        degraus_asha(comum["min_epocas"], comum["eta"], int(config["epochs"])),
+        registros,
+        trava,
+        eta=comum["eta"],
+    )
+    argumentos = {PARAMETROS[chave]: valor for chave, valor in config.items()}
+
+    linha: Dict[str, object] = {"trial": nome, "config": config, "erro": None}
+    inicio = time.perf_counter()
+    try:
+        metricas = train.treinar(
+            data_dir=Path(comum["data_dir"]),
+            credenciais={},
+            manifesto_path=Path(comum["manifesto"]) if comum["manifesto"] else None,
+            intra_op_threads=comum["threads"],
+            inter_op_threads=1,
+            intervalo_recursos=comum["intervalo_recursos"],
+            checkpoint_a_cada=0,  # trials não são retomados
+            callbacks_extras=[parada],
+            models_dir=trabalho,
+            reports_dir=trabalho,
+            destino_experimento=destino,
+            verbose=2,  # uma linha por época; barras de progresso se misturam entre trials
+            **argumentos,
+        )
+    except Exception as exc:  # noqa: BLE001 - um trial com erro não derruba o sweep
+        linha.update(status="erro", erro=f"{type(exc).__name__}: {exc}")
+        return linha
+
+    melhores = metricas["best_metrics"]
+    linha.update(
+        status="podado" if parada.podado_na_epoca else "completo",
+        podado_na_epoca=parada.podado_na_epoca,
+        epocas=metricas["epocas_treinadas"],
+        melhor_val_loss=round(melhores["val_loss"], 5) if "val_loss" in melhores else None,
+        val_accuracy=round(melhores["val_accuracy"], 5) if "val_accuracy" in melhores else None,
+        passos_por_segundo=metricas["performance"]["passos_por_segundo"],
+        duracao_s=round(time.perf_counter() - inicio, 1),
+    )
+
+    # O metrics.json do trial também registra a que sweep ele pertence.
+    metricas["sweep"] = {
+        "id": Path(comum["sweep_dir"]).name,
+        "trial": nome,
+        "status": linha["status"],
+        "podado_na_epoca": parada.podado_na_epoca,
+        "eta": comum["eta"],
+    }
+    (destino / "metrics.json").write_text(json.dumps(metricas, indent=2, ensure_ascii=False), encoding="utf-8")
+    indice_experimentos.indexar(destino)
+    return linha
+
+
+def _gravar_resumo(sweep_dir: Path, linhas: List[Dict[str, object]], metadados: Dict[str, object]) -> None:
+    ordenadas = sorted(
+        linhas,
+        key=lambda linha: (linha.get("melhor_val_loss") is None, linha.get("melhor_val_loss") or 0.0),
+    )
+    (sweep_dir / "resumo.json").write_text(
+        json.dumps({**metadados, "trials": ordenadas}, indent=2, ensure_ascii=False),
+        encoding="utf-8",
+    )
+    with open(sweep_dir / "resumo.csv", "w", encoding="utf-8", newline="") as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=CAMPOS_RESUMO, extrasaction="ignore")
+        escritor.writeheader()
+        for linha in ordenadas:
+            escritor.writerow({**linha, "config": json.dumps(linha["config"], sort_keys=True)})
+
+
+def executar_sweep(
+    configuracoes: Sequence[Dict[str, object]],
+    data_dir: Path,
+    paralelo: int = 2,
+    threads_por_trial: Optional[int] = None,
+    eta: int = 3,
+    min_epocas: int = 1,
+    manifesto_path: Optional[Path] = None,
+    intervalo_recursos: float = 1.0,
+    experiments_dir: Path = REPO_ROOT / "experiments",
+) -> Path:
+    """Executa os trials em um pool de processos e grava o resumo.
+
+    Args:
+        configuracoes: Saída de `gerar_configuracoes`.
+        data_dir: Pasta com train/ e validation/.
+        paralelo: Trials simultâneos.
+        threads_por_trial: Threads intra-op de cada trial (padrão: CPUs / paralelo).
+        eta: Fator de redução do ASHA.
+        min_epocas: Primeiro degrau do ASHA.
+        manifesto_path: Manifesto do ETL, repassado ao `treinar`.
+        intervalo_recursos: Amostragem do monitor de recursos em cada trial.
+        experiments_dir: Onde criar a pasta `sweep_<timestamp>`.
+
+    Returns:
+        A pasta do sweep.
+    """
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    threads = threads_por_trial or max(1, cpus // paralelo)
+    sweep_id = f"sweep_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+    sweep_dir = experiments_dir / sweep_id
+    sweep_dir.mkdir(parents=True, exist_ok=False)
+
+    comum = {
+        "sweep_dir": os.fspath(sweep_dir),
+        "models_dir": os.fspath(REPO_ROOT / "models" / sweep_id),
+        "data_dir": os.fspath(data_dir),
+        "manifesto": os.fspath(manifesto_path) if manifesto_path else None,
+        "threads": threads,
+        "eta": eta,
+        "min_epocas": min_epocas,
+        "intervalo_recursos": intervalo_recursos,
+    }
+    metadados = {
+        "id": sweep_id,
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "trials_planejados": len(configuracoes),
+        "paralelo": paralelo,
+        "threads_por_trial": threads,
+        "eta": eta,
+        "min_epocas": min_epocas,
+    }
+    print(f"[sweep] {len(configuracoes)} trials, {paralelo} em paralelo com {threads} thread(s) cada -> {sweep_dir}")
+
+    # "spawn" evita herdar o estado do TensorFlow; um processo novo por trial
+    # isola memória, threads e a política de precisão de cada configuração.
+    contexto = mp.get_context("spawn")
+    linhas: List[Dict[str, object]] = []
+    inicio = time.perf_counter()
+    with contexto.Manager() as gerente:
+        registros, trava = gerente.dict(), gerente.Lock()
+        with ProcessPoolExecutor(max_workers=paralelo, mp_context=contexto, max_tasks_per_child=1) as pool:
+            futuros = {
+                pool.submit(_executar_trial, indice, config, comum, registros, trava): indice
+                for indice, config in enumerate(configuracoes)
+            }
+            for futuro in as_completed(futuros):
+                linha = futuro.result()
+                linhas.append(linha)
+                _gravar_resumo(sweep_dir, linhas, metadados)
+                print(
+                    f"[sweep] {linha['trial']} {linha['status']} ({len(linhas)}/{len(configuracoes)}): "
+                    f"val_loss={linha.get('melhor_val_loss')} após {linha.get('epocas')} época(s)."
+                )
+
+    metadados["duracao_s"] = round(time.perf_counter() - inicio, 1)
+    _gravar_resumo(sweep_dir, linhas, metadados)
+    return sweep_dir
+
+
+def _carregar_espaco(valor: str) -> Dict[str, object]:
+    """Aceita o caminho de um arquivo JSON ou o próprio JSON na linha de comando."""
+
+    texto = valor if valor.lstrip().startswith("{") else Path(valor).read_text(encoding="utf-8")
+    return json.loads(texto)
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Busca de hiperparâmetros do CardioIA com parada ASHA")
+    parser.add_argument("--espaco", type=str, required=True, help="Espaço de busca (arquivo JSON ou JSON inline)")
+    parser.add_argument("--amostras", type=int, default=None, help="Sorteia N configurações em vez da grade")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do sorteio de configurações")
+    parser.add_argument(
+        "--data-dir",
+        type=str,
+        default=os.fspath(REPO_ROOT / "data"),
+        help="Diretório contendo as pastas train/ e validation/",
+    )
+    parser.add_argument("--manifest", type=str, default=None, help="Manifesto do ETL (data/manifest.csv)")
+    parser.add_argument("--paralelo", type=int, default=2, help="Trials simultâneos")
+    parser.add_argument("--threads-por-trial", type=int, default=None, help="Threads do TensorFlow por trial")
+    parser.add_argument("--eta", type=int, default=3, help="Fator de redução do successive halving")
+    parser.add_argument("--min-epocas", type=int, default=1, help="Época do primeiro degrau do ASHA")
+    parser.add_argument("--intervalo-recursos", type=float, default=1.0, help="Amostragem de recursos (0 desliga)")
+    parser.add_argument("--sem-registro", action="store_true", help="Não faz commit da pasta do sweep")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    configuracoes = gerar_configuracoes(_carregar_espaco(args.espaco), args.amostras, args.seed)
+
+    sweep_dir = executar_sweep(
+        configuracoes,
+        Path(args.data_dir),
+        paralelo=args.paralelo,
+        threads_por_trial=args.threads_por_trial,
+        eta=args.eta,
+        min_epocas=args.min_epocas,
+        manifesto_path=Path(args.manifest) if args.manifest else None,
+        intervalo_recursos=args.intervalo_recursos,
+    )
+
+    melhores = json.loads((sweep_dir / "resumo.json").read_text(encoding="utf-8"))["trials"][:3]
+    for linha in melhores:
+        print(f"[sweep] {linha['trial']}: val_loss={linha.get('melhor_val_loss')} {linha['config']}")
+
+    if args.sem_registro:
+        return
+    try:
+        utils_git.versionar(sweep_dir, auth.obter_credenciais(), mensagem=f"Add sweep results ({sweep_dir.name})")
+    except Exception as exc:  # noqa: BLE001
+        print(f"[sweep] Aviso: falha ao registrar o sweep: {exc}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,59 +3,48 @@
 from __future__ import annotations
 
 import argparse
+import contextlib
 import os
 import shutil
 import sys
+import tempfile
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Mapping
+from typing import Dict, Optional, Sequence
 
-import matplotlib.pyplot as plt
-from matplotlib.figure import Figure
-from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint, ReduceLROnPlateau
+from tensorflow.keras.callbacks import Callback, EarlyStopping, ModelCheckpoint, ReduceLROnPlateau
 
 if __package__ in (None, ""):
     sys.path.append(str(Path(__file__).resolve().parent))
     import auth  # type: ignore
+    import checkpoints  # type: ignore
     import data_preprocessing  # type: ignore
+    import distribuido  # type: ignore
+    import embeddings  # type: ignore
+    import historico  # type: ignore
+    import instrumentacao  # type: ignore
+    import lote_automatico  # type: ignore
     import model_resnet  # type: ignore
     import model_simple_cnn  # type: ignore
+    import monitor_recursos  # type: ignore
+    import perfil_cpu  # type: ignore
     import utils_git  # type: ignore
 else:  # pragma: no cover
-    from . import auth, data_preprocessing, model_resnet, model_simple_cnn, utils_git
-
-
-def _gerar_curvas(history) -> Figure:
-    """Retorna figura Matplotlib com as curvas de loss e accuracy."""
-
-    history_dict: Mapping[str, list[float]] = history.history
-
-    fig, axes = plt.subplots(1, 2, figsize=(12, 5))
-
-    def _plot(ax, serie, label):
-        if serie:
-            ax.plot(range(1, len(serie) + 1), serie, label=label)
-
-    _plot(axes[0], history_dict.get("loss", []), "Treino")
-    _plot(axes[0], history_dict.get("val_loss", []), "Validação")
-    axes[0].set_title("Loss")
-    axes[0].set_xlabel("Épocas")
-    axes[0].set_ylabel("Loss")
-    if axes[0].lines:
-        axes[0].legend()
-
-    tre_acc = history_dict.get("accuracy") or history_dict.get("acc") or []
-    val_acc = history_dict.get("val_accuracy") or history_dict.get("val_acc") or []
-    _plot(axes[1], tre_acc, "Treino")
-    _plot(axes[1], val_acc, "Validação")
-    axes[1].set_title("Acurácia")
-    axes[1].set_xlabel("Épocas")
-    axes[1].set_ylabel("Acurácia")
-    if axes[1].lines:
-        axes[1].legend()
-
-    fig.tight_layout()
-    return fig
+    from . import (
+        auth,
+        checkpoints,
+        data_preprocessing,
+        distribuido,
+        embeddings,
+        historico,
+        instrumentacao,
+        lote_automatico,
+        model_resnet,
+        model_simple_cnn,
+        monitor_recursos,
+        perfil_cpu,
+        utils_git,
+    )
 
 
 def _construir_metricas(
@@ -63,7 +52,7 @@ def _construir_metricas(
     params: Dict[str, float | int | str],
     modelo_path: Path,
 ) -> Dict[str, object]:
-    """Prepara um dicionário serializável com métricas e histórico."""
+    """Resumo serializável do treino; as séries completas ficam no historico.npz."""
 
     history_dict = {
         chave: [float(valor) for valor in valores]
@@ -72,31 +61,102 @@ def _construir_metricas(
 
     finais = {chave: valores[-1] for chave, valores in history_dict.items() if valores}
 
-    val_loss = history_dict.get("val_loss") or []
-    if val_loss:
-        melhor_idx = min(range(len(val_loss)), key=val_loss.__getitem__)
-        melhor_epoch = melhor_idx + 1
-    else:
-        melhor_epoch = len(next(iter(history_dict.values()), []))
-
     return {
         "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
         "params": params,
         "final_metrics": finais,
-        "history": history_dict,
-        "best_epoch": melhor_epoch,
+        **historico.resumir(history_dict),
         "model_artifact": modelo_path.name,
+        "historico": historico.ARQUIVO,
     }
 
 
-def _criar_callbacks(checkpoint_path: Path) -> list:
-    """Configura callbacks padrão utilizados durante o treinamento."""
+def _criar_callbacks(
+    checkpoint_path: Path,
+    extras: Sequence[Callback] = (),
+    medidor: Optional[Callback] = None,
+    estado_treino: Optional[checkpoints.CheckpointTreino] = None,
+) -> list:
+    """Configura callbacks padrão utilizados durante o treinamento.
+
+    `estado_treino` vem depois dos callbacks cujo estado salva. `medidor` (um
+    `instrumentacao.MedidorPassos`) entra por último para que o tempo gasto
+    pelos demais callbacks conte como sobrecarga entre passos.
+    """
 
-    return [
+    callbacks = [
         EarlyStopping(monitor="val_loss", patience=10, restore_best_weights=True),
         ModelCheckpoint(filepath=os.fspath(checkpoint_path), monitor="val_loss", save_best_only=True),
         ReduceLROnPlateau(monitor="val_loss", factor=0.2, patience=5, min_lr=1e-7),
+        *extras,
     ]
+    if estado_treino is not None:
+        estado_treino.acompanhar(callbacks, melhor_modelo=checkpoint_path)
+        callbacks.append(estado_treino)
+    if medidor is not None:
+        callbacks.append(medidor)
+    return callbacks
+
+
+def _epocas_do_fit(epochs: int, estado_treino: Optional[checkpoints.CheckpointTreino]) -> int:
+    """Total de épocas do `fit`; se o EarlyStopping já encerrou o treino retomado, nenhuma a mais."""
+
+    if estado_treino is not None and estado_treino.encerrado:
+        print("[train] O checkpoint é de um treino já encerrado pelo EarlyStopping; nada a retomar.")
+        return estado_treino.epoca_inicial
+    return epochs
+
+
+def _treinar_com_embeddings(
+    modelo,
+    data_dir: Path,
+    epochs: int,
+    batch_size: int,
+    learning_rate: float,
+    vistas: int,
+    checkpoint_path: Path,
+    manifesto=None,
+    jit_compile: bool = False,
+    acumulacao_gradientes: int = 1,
+    callbacks_extras: Sequence[Callback] = (),
+    medidor: Optional[Callback] = None,
+    estado_treino: Optional[checkpoints.CheckpointTreino] = None,
+    verbose: int | str = "auto",
+):
+    """Treina só a cabeça da ResNet sobre embeddings em cache e a copia para o modelo."""
+
+    backbone = model_resnet.extrair_backbone(modelo)
+    (x_treino, y_treino), validacao = embeddings.preparar_conjuntos(
+        data_dir,
+        backbone,
+        vistas=vistas,
+        batch_size=batch_size,
+        manifesto=manifesto,
+    )
+
+    cabeca = model_resnet.construir_cabeca(
+        x_treino.shape[1],
+        learning_rate=learning_rate,
+        jit_compile=jit_compile,
+        acumulacao_gradientes=acumulacao_gradientes,
+    )
+    history = cabeca.fit(
+        x_treino,
+        y_treino,
+        epochs=_epocas_do_fit(epochs, estado_treino),
+        initial_epoch=estado_treino.epoca_inicial if estado_treino else 0,
+        batch_size=batch_size,
+        validation_data=validacao,
+        verbose=verbose,
+        callbacks=_criar_callbacks(
+            checkpoint_path.with_name(f"{checkpoint_path.stem}_head.h5"), callbacks_extras, medidor, estado_treino
+        ),
+    )
+
+    # EarlyStopping já restaurou os melhores pesos da cabeça.
+    model_resnet.transferir_cabeca(modelo, cabeca)
+    modelo.save(os.fspath(checkpoint_path))
+    return history
 
 
 def _exibir_download_colab(modelo_path: Path) -> None:
@@ -117,39 +177,221 @@ def _exibir_download_colab(modelo_path: Path) -> None:
 def treinar(
     data_dir: Path,
     epochs: int,
-    batch_size: int,
+    batch_size: int | str,
     learning_rate: float,
     model_name: str,
     credenciais: Dict[str, str],
-) -> None:
-    """Executa o treinamento e registra o experimento correspondente."""
+    data_backend: str = "keras",
+    cache_embeddings: bool = False,
+    vistas: int = 0,
+    manifesto_path: Optional[Path] = None,
+    fold: Optional[int] = None,
+    n_folds: int = 5,
+    perf_profile: str = "default",
+    intra_op_threads: Optional[int] = None,
+    inter_op_threads: Optional[int] = None,
+    afinidade: Optional[str] = None,
+    trace_passos: Optional[str] = None,
+    medir_passos: bool = True,
+    intervalo_recursos: float = 1.0,
+    historico_por_lote: bool = False,
+    retomar: bool = False,
+    checkpoint_a_cada: int = 1,
+    checkpoints_mantidos: int = 3,
+    lote_efetivo: Optional[int] = None,
+    memoria_max_mb: Optional[float] = None,
+    ressondar_lote: bool = False,
+    callbacks_extras: Sequence[Callback] = (),
+    models_dir: Optional[Path] = None,
+    reports_dir: Optional[Path] = None,
+    destino_experimento: Optional[Path] = None,
+    verbose: int | str = "auto",
+) -> Dict[str, object]:
+    """Executa o treinamento e registra o experimento correspondente.
+
+    Por padrão os modelos vão para `models/`, os relatórios para `reports/` e o
+    experimento é versionado com `utils_git.registrar_experimento` (commit e
+    push em segundo plano; o treino não espera o git). Com
+    `destino_experimento`, os artefatos são gravados nessa pasta sem commit
+    (usado pelo `sweep`, que versiona todos os trials de uma vez).
+
+    O estado completo do treino vai para `models/checkpoints/<modelo>/` a
+    cada `checkpoint_a_cada` épocas; com `retomar`, o treino continua do
+    checkpoint mais recente.
+
+    Dentro de um cluster local (`python src/train.py --workers N`), o treino
+    roda em todos os processos com `distribuido.ajustar`, e só o chefe grava
+    os artefatos e registra o experimento; os demais devolvem um dicionário
+    vazio.
+
+    Com `medir_passos=False`, o `MedidorPassos` fica de fora e o metrics.json
+    não traz a seção `performance`.
+
+    Com `batch_size="auto"`, o lote é escolhido por `lote_automatico` dentro de
+    `memoria_max_mb`; se `lote_efetivo` não couber, o treino acumula
+    gradientes de micro-lotes até chegar a ele.
+
+    Returns:
+        O dicionário gravado no metrics.json.
+    """
+
+    # Threads e política de precisão precisam ser definidas antes de qualquer operação
+    perfil = perfil_cpu.aplicar_perfil(perf_profile, intra_op_threads, inter_op_threads, afinidade)
+    # A estratégia multi-worker também precisa vir antes de qualquer operação
+    estrategia = distribuido.criar_estrategia() if distribuido.em_cluster() else None
+    workers, indice_worker = distribuido.posicao()
+    chefe = indice_worker == 0
+    print(
+        f"[train] Perfil '{perf_profile}': {perfil['politica_precisao']}, XLA={perfil['jit_compile']}, "
+        f"threads intra={perfil['intra_op_threads']} inter={perfil['inter_op_threads']}."
+    )
 
-    if not data_dir.exists():
+    manifesto = None
+    if manifesto_path is not None:
+        if not manifesto_path.exists():
+            raise FileNotFoundError(
+                f"Manifesto não encontrado: {manifesto_path}. Execute o ETL com --formato manifesto."
+            )
+        manifesto = data_preprocessing.carregar_manifesto(manifesto_path, fold=fold, n_folds=n_folds)
+    elif not data_dir.exists():
         raise FileNotFoundError(
             f"Diretório de dados não encontrado: {data_dir}. Execute o ETL antes do treino."
         )
 
-    models_dir = Path(__file__).resolve().parents[1] / "models"
+    if cache_embeddings and model_name != "resnet":
+        raise ValueError("O cache de embeddings só se aplica ao modelo 'resnet'.")
+    if estrategia is not None and (cache_embeddings or data_backend != "tfdata"):
+        raise ValueError("O treino distribuído usa --data-backend tfdata, sem --embedding-cache.")
+
+    models_dir = models_dir or Path(__file__).resolve().parents[1] / "models"
+    reports_dir = reports_dir or Path(__file__).resolve().parents[1] / "reports"
+    diretorio_checkpoints = models_dir / "checkpoints" / (f"{model_name}_cabeca" if cache_embeddings else model_name)
+    descartavel = None
+    if not chefe:
+        # Os demais workers gravam o que os callbacks pedirem em uma pasta descartável.
+        descartavel = Path(tempfile.mkdtemp(prefix=f"cardioia_worker_{indice_worker}_"))
+        models_dir = reports_dir = descartavel
+        intervalo_recursos = 0
+        trace_passos = None
+        verbose = 0
     models_dir.mkdir(parents=True, exist_ok=True)
 
-    treino_gen, valid_gen = data_preprocessing.configurar_geradores(
-        diretorio_base=data_dir,
-        batch_size=batch_size,
+    # A sondagem roda antes de montar o modelo, enquanto este processo ainda ocupa pouca memória.
+    # No cache de embeddings só a cabeça densa treina, e o lote não pesa na memória.
+    lote = lote_automatico.configurar(
+        batch_size,
+        model_name,
+        perf_profile,
+        lote_efetivo=lote_efetivo,
+        memoria_max_mb=memoria_max_mb,
+        sondar_memoria=not cache_embeddings,
+        ressondar=ressondar_lote,
+    )
+    batch_size = lote["micro_lote"]
+    acumulacao = lote["acumulacao"]
+    print(
+        f"[train] Lote {batch_size} x {acumulacao} acumulação = lote efetivo {lote['lote_efetivo']} "
+        f"(modo {lote['modo']})."
     )
 
-    if model_name == "cnn":
-        modelo = model_simple_cnn.construir_modelo(learning_rate=learning_rate)
-    else:
-        modelo = model_resnet.construir_modelo(learning_rate=learning_rate)
+    with estrategia.scope() if estrategia is not None else contextlib.nullcontext():
+        if model_name == "cnn":
+            modelo = model_simple_cnn.construir_modelo(
+                learning_rate=learning_rate, jit_compile=perfil["jit_compile"], acumulacao_gradientes=acumulacao
+            )
+        else:
+            # No cache de embeddings quem treina é a cabeça; a acumulação vai para ela
+            modelo = model_resnet.construir_modelo(
+                learning_rate=learning_rate,
+                jit_compile=perfil["jit_compile"],
+                acumulacao_gradientes=1 if cache_embeddings else acumulacao,
+            )
 
     checkpoint_path = models_dir / f"best_model_{model_name}.h5"
+    if trace_passos and not medir_passos:
+        raise ValueError("--trace-passos exige a medição de passos (sem --sem-medir-passos).")
+    medidor = None
+    if medir_passos:
+        medidor = instrumentacao.MedidorPassos(
+            janela_trace=instrumentacao.interpretar_janela(trace_passos) if trace_passos else None,
+            destino_trace=reports_dir / f"trace_passos_{model_name}.json",
+        )
+
+    estado_treino = None
+    if checkpoint_a_cada > 0:
+        estado_treino = checkpoints.CheckpointTreino(
+            diretorio_checkpoints,
+            retomar=retomar,
+            a_cada_epocas=checkpoint_a_cada,
+            mantidos=checkpoints_mantidos,
+            gravar=chefe,
+        )
+    elif retomar:
+        raise ValueError("--resume precisa de checkpoints (--checkpoint-a-cada > 0).")
+
+    registrador = instrumentacao.RegistradorLotes() if historico_por_lote else None
+    if registrador is not None:
+        callbacks_extras = [*callbacks_extras, registrador]
 
-    history = modelo.fit(
-        treino_gen,
-        epochs=epochs,
-        validation_data=valid_gen,
-        callbacks=_criar_callbacks(checkpoint_path),
+    # O .npz é regravado durante o treino para sobreviver a um OOM kill
+    monitor = monitor_recursos.MonitorRecursos(
+        intervalo_recursos, destino=reports_dir / f"recursos_{model_name}.npz"
     )
+    if intervalo_recursos > 0:
+        monitor.iniciar()
+    try:
+        if cache_embeddings:
+            history = _treinar_com_embeddings(
+                modelo,
+                data_dir,
+                epochs,
+                batch_size,
+                learning_rate,
+                vistas,
+                checkpoint_path,
+                manifesto=manifesto,
+                jit_compile=perfil["jit_compile"],
+                acumulacao_gradientes=acumulacao,
+                callbacks_extras=callbacks_extras,
+                medidor=medidor,
+                estado_treino=estado_treino,
+                verbose=verbose,
+            )
+        else:
+            treino_gen, valid_gen = data_preprocessing.configurar_geradores(
+                diretorio_base=data_dir,
+                batch_size=batch_size,
+                backend=data_backend,
+                manifesto=manifesto,
+                fragmento=(workers, indice_worker) if estrategia is not None else None,
+            )
+            callbacks = _criar_callbacks(checkpoint_path, callbacks_extras, medidor, estado_treino)
+            epocas = _epocas_do_fit(epochs, estado_treino)
+            epoca_inicial = estado_treino.epoca_inicial if estado_treino else 0
+
+            if estrategia is not None:
+                history = distribuido.ajustar(
+                    modelo, estrategia, treino_gen, valid_gen, epocas, epoca_inicial, callbacks, verbose
+                )
+            else:
+                history = modelo.fit(
+                    treino_gen,
+                    epochs=epocas,
+                    initial_epoch=epoca_inicial,
+                    validation_data=valid_gen,
+                    verbose=verbose,
+                    callbacks=callbacks,
+                )
+    finally:
+        recursos_path = monitor.parar()
+
+    if not chefe:
+        shutil.rmtree(descartavel, ignore_errors=True)
+        print(f"[train] Worker {indice_worker} concluído; artefatos ficam com o chefe.")
+        return {}
+
+    if estado_treino is not None:
+        history.history = estado_treino.historico_completo(history.history)
 
     timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     modelo_path = models_dir / f"model_{model_name}.h5"
@@ -162,32 +404,85 @@ def treinar(
         shutil.copy2(source_best, best_model_path)
         print(f"[train] Modelo principal atualizado em {best_model_path}")
 
-    reports_dir = Path(__file__).resolve().parents[1] / "reports"
     reports_dir.mkdir(parents=True, exist_ok=True)
 
-    figura = _gerar_curvas(history)
-    curvas_path = reports_dir / f"training_curves_{model_name}.png"
-    figura.savefig(curvas_path, dpi=150, bbox_inches="tight")
-    print(f"[train] Curvas de treinamento salvas em {curvas_path}")
+    # Só os dados; as figuras são geradas sob demanda por src/historico.py
+    historico_path = historico.salvar(
+        reports_dir / f"historico_{model_name}.npz",
+        history.history,
+        extras=medidor.colunas() if medidor is not None else None,
+        por_lote=registrador.colunas if registrador is not None else None,
+    )
+    print(f"[train] Histórico salvo em {historico_path} (figuras: python src/historico.py {historico_path})")
 
     params = {
         "epochs": epochs,
         "batch_size": batch_size,
+        "lote_efetivo": lote["lote_efetivo"],
+        "acumulacao_gradientes": acumulacao,
         "learning_rate": learning_rate,
         "model": model_name,
+        "data_backend": data_backend,
+        "embedding_cache": cache_embeddings,
+        "vistas": vistas,
+        "perf_profile": perf_profile,
     }
+    if estrategia is not None:
+        params["workers"] = workers
+    if manifesto_path is not None:
+        params["manifesto"] = manifesto_path.name
+        if fold is not None:
+            params["fold"] = f"{fold}/{n_folds}"
     metricas = _construir_metricas(history, params, modelo_path)
+    metricas["performance"] = medidor.resumo() if medidor is not None else None
+    passos_por_segundo = metricas["performance"]["passos_por_segundo"] if medidor is not None else None
+    metricas["recursos"] = monitor.resumo()
+    metricas["lote"] = lote
+    if estrategia is not None:
+        metricas["distribuido"] = {
+            "workers": workers,
+            "estrategia": type(estrategia).__name__,
+            "lote_global": batch_size * workers,
+            "imagens_por_segundo_globais": (
+                round(passos_por_segundo * batch_size * workers, 2) if passos_por_segundo else None
+            ),
+        }
+    metricas["perfil"] = {
+        **perfil,
+        "steps_por_segundo": passos_por_segundo,
+        "val_metrics": {
+            chave: valor for chave, valor in metricas["final_metrics"].items() if chave.startswith("val_")
+        },
+    }
+    desempenho = metricas["performance"]
+    if desempenho is not None:
+        print(
+            f"[train] {desempenho['passos_por_segundo']} passos/s (perfil '{perf_profile}'), "
+            f"{desempenho['imagens_por_segundo']} imagens/s, espera por dados={desempenho['fracao_espera']}, "
+            f"pico de RSS={desempenho['rss_pico_mb']} MB."
+        )
+
+    if destino_experimento is not None:
+        utils_git.salvar_artefatos(destino_experimento, metricas, {}, recursos_path, historico_path)
+        return metricas
 
     try:
         utils_git.registrar_experimento(
             metrics_dict=metricas,
-            figures_dict={"training_curves": figura},
+            figures_dict={},
             credenciais=credenciais,
+            recursos=recursos_path,
+            historico=historico_path,
         )
     except Exception as exc:  # noqa: BLE001
         print(f"[train] Aviso: falha ao registrar experimento: {exc}")
 
     _exibir_download_colab(modelo_path)
+    return metricas
+
+
+def _tamanho_lote(valor: str) -> int | str:
+    return valor if valor == "auto" else int(valor)
 
 
 def _parse_args() -> argparse.Namespace:
@@ -199,7 +494,29 @@ def _parse_args() -> argparse.Namespace:
         help="Diretório contendo as pastas train/ e validation/",
     )
     parser.add_argument("--epochs", type=int, default=20, help="Número de épocas para treinamento")
-    parser.add_argument("--batch-size", type=int, default=32, help="Tamanho do batch")
+    parser.add_argument(
+        "--batch-size",
+        type=_tamanho_lote,
+        default=32,
+        help="Tamanho do batch ou 'auto' (maior vazão dentro de --memoria-max-mb)",
+    )
+    parser.add_argument(
+        "--lote-efetivo",
+        type=int,
+        default=None,
+        help="Lote efetivo por atualização; se o batch não couber, acumula gradientes até ele",
+    )
+    parser.add_argument(
+        "--memoria-max-mb",
+        type=float,
+        default=None,
+        help=f"Orçamento de memória do --batch-size auto (padrão: ${lote_automatico.MEMORIA_ENV} ou 80%% da disponível)",
+    )
+    parser.add_argument(
+        "--ressondar-lote",
+        action="store_true",
+        help="Refaz a sondagem do --batch-size auto em vez de usar cache/lote_automatico.json",
+    )
     parser.add_argument(
         "--learning-rate", type=float, default=1e-4, help="Taxa de aprendizado do otimizador"
     )
@@ -209,14 +526,129 @@ def _parse_args() -> argparse.Namespace:
         default="resnet",
         help="Define qual arquitetura será treinada",
     )
+    parser.add_argument(
+        "--data-backend",
+        choices=data_preprocessing.BACKENDS,
+        default="keras",
+        help="Pipeline de entrada: 'keras' (ImageDataGenerator), 'tfdata' (tf.data paralelo) ou 'memmap' (store uint8 do ETL)",
+    )
+    parser.add_argument(
+        "--embedding-cache",
+        action="store_true",
+        help="Treina só a cabeça da ResNet sobre embeddings do backbone guardados em cache",
+    )
+    parser.add_argument(
+        "--perf-profile",
+        choices=perfil_cpu.PERFIS,
+        default="default",
+        help="Perfil de CPU: XLA (jit_compile), precisão mista bfloat16 ou ambos",
+    )
+    parser.add_argument("--intra-op-threads", type=int, default=None, help="Threads por operação do TensorFlow")
+    parser.add_argument("--inter-op-threads", type=int, default=None, help="Operações paralelas do TensorFlow")
+    parser.add_argument("--afinidade", type=str, default=None, help="CPUs do processo, ex.: 0-7 (Linux)")
+    parser.add_argument(
+        "--intervalo-recursos",
+        type=float,
+        default=1.0,
+        help="Segundos entre amostras de CPU, memória e disco do treino (0 desliga)",
+    )
+    parser.add_argument(
+        "--trace-passos",
+        type=str,
+        default=None,
+        help="Exporta os passos INICIO:FIM como Chrome trace em reports/trace_passos_<modelo>.json",
+    )
+    parser.add_argument(
+        "--sem-medir-passos",
+        action="store_true",
+        help="Desliga a medição de espera por dados x computação de cada passo (seção performance)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continua do checkpoint mais recente em models/checkpoints/<modelo>/",
+    )
+    parser.add_argument(
+        "--checkpoint-a-cada",
+        type=int,
+        default=1,
+        help="Épocas entre checkpoints do estado completo do treino (0 desliga)",
+    )
+    parser.add_argument("--checkpoints-mantidos", type=int, default=3, help="Checkpoints mantidos em disco")
+    parser.add_argument(
+        "--historico-por-lote",
+        action="store_true",
+        help="Grava também os logs de cada lote de treino no historico.npz",
+    )
+    parser.add_argument(
+        "--vistas",
+        type=int,
+        default=0,
+        help="Vistas aumentadas fixas por imagem no modo --embedding-cache",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        default=None,
+        help="Manifesto do ETL (data/manifest.csv); substitui as pastas de --data-dir",
+    )
+    parser.add_argument(
+        "--fold",
+        type=int,
+        default=None,
+        help="Refaz a divisão do manifesto por k-fold e usa este fold como validação",
+    )
+    parser.add_argument("--n-folds", type=int, default=5, help="Quantidade de folds para --fold")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processos locais de treino data-parallel (MultiWorkerMirroredStrategy; exige --data-backend tfdata)",
+    )
     return parser.parse_args()
 
 
+def _sem_opcao(argumentos: Sequence[str], opcao: str) -> list:
+    """Remove `opcao` e o seu valor (`--opcao valor` ou `--opcao=valor`) da linha de comando."""
+
+    restantes, pular = [], False
+    for argumento in argumentos:
+        if pular:
+            pular = False
+        elif argumento == opcao:
+            pular = True
+        elif not argumento.startswith(f"{opcao}="):
+            restantes.append(argumento)
+    return restantes
+
+
+def _lancar_workers(args: argparse.Namespace) -> int:
+    """Reinicia este script em `args.workers` processos que formam um cluster local."""
+
+    argumentos = _sem_opcao(sys.argv[1:], "--workers")
+    if args.batch_size == "auto":
+        # A sondagem roda uma vez aqui, com o orçamento de memória dividido entre os workers
+        lote = lote_automatico.configurar(
+            "auto",
+            args.model,
+            args.perf_profile,
+            lote_efetivo=args.lote_efetivo,
+            memoria_max_mb=lote_automatico.orcamento_mb(args.memoria_max_mb) / args.workers,
+            ressondar=args.ressondar_lote,
+        )
+        argumentos = _sem_opcao(_sem_opcao(argumentos, "--batch-size"), "--lote-efetivo")
+        argumentos += ["--batch-size", str(lote["micro_lote"]), "--lote-efetivo", str(lote["lote_efetivo"])]
+    return distribuido.lancar([sys.executable, os.fspath(Path(__file__).resolve()), *argumentos], args.workers)
+
+
 def main() -> None:
     args = _parse_args()
+    if args.workers > 1 and not distribuido.em_cluster():
+        raise SystemExit(_lancar_workers(args))
     data_dir = Path(args.data_dir)
 
-    credenciais = auth.obter_credenciais()
+    # Só o chefe registra o experimento; os demais workers não pedem credenciais
+    credenciais = auth.obter_credenciais() if distribuido.eh_chefe() else {}
 
     treinar(
         data_dir=data_dir,
@@ -225,6 +657,26 @@ def main() -> None:
         learning_rate=args.learning_rate,
         model_name=args.model,
         credenciais=credenciais,
+        data_backend=args.data_backend,
+        cache_embeddings=args.embedding_cache,
+        vistas=args.vistas,
+        manifesto_path=Path(args.manifest) if args.manifest else None,
+        fold=args.fold,
+        n_folds=args.n_folds,
+        perf_profile=args.perf_profile,
+        intra_op_threads=args.intra_op_threads,
+        inter_op_threads=args.inter_op_threads,
+        afinidade=args.afinidade,
+        trace_passos=args.trace_passos,
+        medir_passos=not args.sem_medir_passos,
+        intervalo_recursos=args.intervalo_recursos,
+        historico_por_lote=args.historico_por_lote,
+        retomar=args.resume,
+        checkpoint_a_cada=args.checkpoint_a_cada,
+        checkpoints_mantidos=args.checkpoints_mantidos,
+        lote_efetivo=args.lote_efetivo,
+        memoria_max_mb=args.memoria_max_mb,
+        ressondar_lote=args.ressondar_lote,
     )
 
 
@@ -1,29 +1,54 @@
-"""Utilitários para versionar experimentos diretamente no repositório Git."""
+"""Utilitários para versionar experimentos diretamente no repositório Git.
+
+Os artefatos de cada experimento são gravados na hora. O commit e o push
+ficam para um worker em segundo plano: cada registro vira um pedido em uma
+fila em disco (`.fila_git/`, ou `CARDIOIA_FILA_GIT`), e o worker junta os
+pedidos pendentes em um único commit e faz o push com retentativas e backoff
+exponencial. `python src/utils_git.py flush` processa a fila em primeiro plano
+e falha se algo não subir, para uso em CI.
+"""
 
 from __future__ import annotations
 
+import argparse
 import json
 import os
+import random
 import shutil
 import subprocess
 import sys
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Mapping, Optional, Union
+from typing import Dict, Iterator, Mapping, Optional, Union
 
 import matplotlib.pyplot as plt
 from matplotlib.figure import Figure
 
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+REPO_ROOT = Path(__file__).resolve().parents[1]
+FILA_ENV = "CARDIOIA_FILA_GIT"
+TENTATIVAS_PUSH = 5
+ESPERA_PUSH_S = 2.0
+JANELA_S = 3.0
+AUTOR = ("cardioia-bot", "cardioia-bot@example.com")
+
+try:  # indisponível no Windows
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
 
 if __package__ in (None, ""):
     sys.path.append(str(Path(__file__).resolve().parent))
     import auth  # type: ignore
+    import indice_experimentos  # type: ignore
 else:  # pragma: no cover
-    from . import auth
+    from . import auth, indice_experimentos
 
 
 FigureLike = Union[Figure, Path, str]
+_WORKERS: list[subprocess.Popen] = []
 
 
 def _run_git(args: list[str], cwd: Path) -> subprocess.CompletedProcess[str]:
@@ -90,27 +115,42 @@ def _guardar_figuras(destino: Path, figuras: Mapping[str, FigureLike]) -> list[P
     return salvos
 
 
-def registrar_experimento(
+def _copiar(destino: Path, origem: Path, nome: str) -> Path:
+    """Copia uma série colunar (`.npz`) para a pasta do experimento."""
+
+    alvo = destino / nome
+    shutil.copy2(origem, alvo)
+    return alvo
+
+
+def salvar_artefatos(
+    destino: Path,
     metrics_dict: Mapping[str, object],
     figures_dict: Mapping[str, FigureLike],
-    credenciais: Optional[Dict[str, str]] = None,
-) -> Optional[Path]:
-    """Salva artefatos e realiza commit + push automático do experimento."""
+    recursos: Optional[Union[Path, str]] = None,
+    historico: Optional[Union[Path, str]] = None,
+) -> list[Path]:
+    """Grava métricas, figuras, histórico e recursos em `destino`, sem versionar.
 
-    repo_root = Path(__file__).resolve().parents[1]
-    experiments_dir = repo_root / "experiments"
-    experiments_dir.mkdir(parents=True, exist_ok=True)
+    As séries ficam em `historico.npz` e `recursos.npz`; as figuras delas são
+    geradas sob demanda por `src/historico.py`.
 
-    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    exp_dir = experiments_dir / f"exp_{timestamp}"
-    exp_dir.mkdir(parents=True, exist_ok=False)
+    Arquivos acima de `MAX_FILE_SIZE` são removidos. Se `destino` estiver em
+    `experiments/`, o experimento também entra no índice SQLite. Retorna os
+    artefatos mantidos.
+    """
 
+    destino.mkdir(parents=True, exist_ok=True)
     artefatos: list[Path] = []
 
-    metrics_path = _guardar_metricas(exp_dir, metrics_dict)
+    metrics_path = _guardar_metricas(destino, metrics_dict)
     artefatos.append(metrics_path)
 
-    artefatos.extend(_guardar_figuras(exp_dir, figures_dict))
+    artefatos.extend(_guardar_figuras(destino, figures_dict))
+    if historico is not None and Path(historico).exists():
+        artefatos.append(_copiar(destino, Path(historico), "historico.npz"))
+    if recursos is not None and Path(recursos).exists():
+        artefatos.append(_copiar(destino, Path(recursos), "recursos.npz"))
 
     # Filtra arquivos pesados
     finais: list[Path] = []
@@ -123,51 +163,309 @@ def registrar_experimento(
             continue
         finais.append(arquivo)
 
-    if not finais:
-        print("[utils_git] Nenhum artefato válido para registro.")
-        return None
+    indice_experimentos.indexar(destino)
+    return finais
 
-    credenciais = credenciais or auth.obter_credenciais()
-    token = credenciais.get("GITHUB_TOKEN") if credenciais else None
 
-    _run_git(["config", "user.name", "cardioia-bot"], cwd=repo_root)
-    _run_git(["config", "user.email", "cardioia-bot@example.com"], cwd=repo_root)
+def _fila_dir() -> Path:
+    return Path(os.environ.get(FILA_ENV, REPO_ROOT / ".fila_git"))
 
-    _run_git(["add", os.fspath(exp_dir.relative_to(repo_root))], cwd=repo_root)
 
-    diff_cached = _run_git(["diff", "--cached", "--name-only"], cwd=repo_root)
-    if not diff_cached.stdout.strip():
-        print("[utils_git] Nenhuma alteração para commit.")
-        return exp_dir
+def enfileirar(caminho: Path, mensagem: str = "Add experiment results") -> Path:
+    """Registra na fila um pedido de commit para `caminho` (pasta ou arquivo do repositório)."""
+
+    fila = _fila_dir()
+    fila.mkdir(parents=True, exist_ok=True)
+    pedido = {
+        "caminho": Path(caminho).resolve().relative_to(REPO_ROOT).as_posix(),
+        "mensagem": mensagem,
+        "criado": datetime.utcnow().isoformat(timespec="seconds"),
+    }
+    alvo = fila / f"{time.time_ns()}_{os.getpid()}.json"
+    temporario = fila / f".{alvo.name}.tmp"
+    temporario.write_text(json.dumps(pedido, ensure_ascii=False), encoding="utf-8")
+    os.replace(temporario, alvo)  # o worker nunca lê um pedido pela metade
+    return alvo
+
+
+def _ler_fila(fila: Path) -> list[tuple[Path, Dict[str, str]]]:
+    pedidos = []
+    for arquivo in sorted(fila.glob("*.json")):
+        try:
+            pedidos.append((arquivo, json.loads(arquivo.read_text(encoding="utf-8"))))
+        except (OSError, json.JSONDecodeError) as erro:
+            print(f"[utils_git] Pedido ilegível descartado ({arquivo.name}): {erro}")
+            arquivo.unlink(missing_ok=True)
+    return pedidos
+
+
+def pendencias() -> Dict[str, object]:
+    """Pedidos na fila e se há commits aguardando push."""
+
+    fila = _fila_dir()
+    return {
+        "pedidos": [pedido["caminho"] for _, pedido in _ler_fila(fila)] if fila.exists() else [],
+        "push_pendente": (fila / "push_pendente").exists(),
+    }
+
+
+@contextmanager
+def _trava_fila(fila: Path) -> Iterator[None]:
+    """Garante um único processo mexendo no git por vez; os demais esperam."""
+
+    fila.mkdir(parents=True, exist_ok=True)
+    with open(fila / ".trava", "w") as trava:
+        if fcntl is not None:
+            fcntl.flock(trava, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(trava, fcntl.LOCK_UN)
 
-    _run_git(["commit", "-m", "Add experiment results"], cwd=repo_root)
 
-    if not token:
-        print("[utils_git] GITHUB_TOKEN ausente. Realize o push manualmente.")
-        return exp_dir
+def _commitar(pedidos: list[Dict[str, str]]) -> bool:
+    """Um único commit com todos os caminhos pedidos. Retorna False se não houve mudança."""
 
-    remote_url = _run_git(["remote", "get-url", "origin"], cwd=repo_root).stdout.strip()
-    branch = _run_git(["rev-parse", "--abbrev-ref", "HEAD"], cwd=repo_root).stdout.strip()
+    caminhos = list(dict.fromkeys(p["caminho"] for p in pedidos if (REPO_ROOT / p["caminho"]).exists()))
+    if not caminhos:
+        return False
+    _run_git(["add", "--", *caminhos], cwd=REPO_ROOT)
+    if not _run_git(["diff", "--cached", "--name-only", "--", *caminhos], cwd=REPO_ROOT).stdout.strip():
+        print("[utils_git] Nenhuma alteração para commit.")
+        return False
 
-    auth_url = _sanitize_remote(remote_url, token)
-    if not auth_url:
-        print(
-            "[utils_git] Remote não usa HTTPS ou token inválido. Push automático não realizado."
+    if len(pedidos) == 1:
+        mensagem = pedidos[0]["mensagem"]
+    else:
+        mensagem = f"Add experiment results ({len(pedidos)} registros)\n\n" + "\n".join(
+            f"- {pedido['caminho']}: {pedido['mensagem']}" for pedido in pedidos
         )
-        return exp_dir
+    # O pathspec deixa de fora qualquer outra coisa que o usuário tenha no índice.
+    _run_git(
+        ["-c", f"user.name={AUTOR[0]}", "-c", f"user.email={AUTOR[1]}", "commit", "-m", mensagem, "--", *caminhos],
+        cwd=REPO_ROOT,
+    )
+    print(f"[utils_git] Commit de {len(caminhos)} caminho(s): {', '.join(caminhos)}")
+    return True
+
+
+def _push(token: Optional[str]) -> bool:
+    """Envia HEAD ao `origin`. Retorna False quando o push automático não é possível.
 
+    Remotes HTTPS usam o `GITHUB_TOKEN`; os demais (SSH, caminho local) usam a
+    autenticação do próprio git.
+    """
+
+    try:
+        remote_url = _run_git(["remote", "get-url", "origin"], cwd=REPO_ROOT).stdout.strip()
+    except RuntimeError:
+        print("[utils_git] Remote 'origin' inexistente. Realize o push manualmente.")
+        return False
+
+    if remote_url.startswith("https://"):
+        if not token:
+            print("[utils_git] GITHUB_TOKEN ausente. Realize o push manualmente.")
+            return False
+        alvo = _sanitize_remote(remote_url, token)
+    else:
+        alvo = "origin"
+
+    branch = _run_git(["rev-parse", "--abbrev-ref", "HEAD"], cwd=REPO_ROOT).stdout.strip()
     resultado = subprocess.run(
-        ["git", "push", auth_url, f"HEAD:{branch}"],
-        cwd=os.fspath(repo_root),
+        ["git", "push", alvo, f"HEAD:{branch}"],
+        cwd=os.fspath(REPO_ROOT),
         capture_output=True,
         text=True,
         check=False,
+        env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},
     )
     if resultado.returncode != 0:
-        raise RuntimeError("Falha no git push automático. Verifique o GITHUB_TOKEN e permissões.")
+        erro = resultado.stderr.strip()
+        raise RuntimeError(f"Falha no git push: {erro.replace(token, '***') if token else erro}")
+    return True
+
+
+def processar_fila(
+    token: Optional[str] = None,
+    tentativas: int = TENTATIVAS_PUSH,
+    espera_s: float = ESPERA_PUSH_S,
+    janela_s: float = 0.0,
+) -> bool:
+    """Consome a fila: um commit por lote de pedidos e push com retentativas.
+
+    Pedidos que chegam enquanto o push espera o próximo backoff entram no
+    lote seguinte e sobem no mesmo push.
+
+    Args:
+        token: `GITHUB_TOKEN` para remotes HTTPS (padrão: segredo do Colab,
+            variável de ambiente ou `.env`, sem prompt interativo).
+        tentativas: Falhas seguidas de commit/push antes de desistir.
+        espera_s: Espera após a primeira falha; dobra a cada nova falha.
+        janela_s: Espera inicial para agrupar registros quase simultâneos.
+
+    Returns:
+        True se a fila ficou vazia e não há commits aguardando push.
+    """
+
+    fila = _fila_dir()
+    if not fila.exists():
+        return True
+    token = token or auth.obter_credencial("GITHUB_TOKEN")
+    marcador = fila / "push_pendente"
+
+    with _trava_fila(fila):
+        if janela_s and _ler_fila(fila):
+            time.sleep(janela_s)
+        falhas = 0
+        while True:
+            try:
+                pedidos = _ler_fila(fila)
+                if pedidos:
+                    if _commitar([pedido for _, pedido in pedidos]):
+                        marcador.touch()
+                    for arquivo, _ in pedidos:
+                        arquivo.unlink(missing_ok=True)
+                if not marcador.exists():
+                    return True
+                if not _push(token):
+                    # Sem remote ou sem token: o marcador fica para o próximo `flush`.
+                    return False
+                marcador.unlink(missing_ok=True)
+                print("[utils_git] Experimentos registrados e enviados.")
+                falhas = 0
+            except RuntimeError as erro:
+                falhas += 1
+                if falhas >= tentativas:
+                    print(f"[utils_git] Desistindo após {falhas} falhas: {erro}")
+                    return False
+                espera = espera_s * 2 ** (falhas - 1) * random.uniform(1.0, 1.2)
+                print(f"[utils_git] {erro} Nova tentativa em {espera:.1f}s ({falhas}/{tentativas}).")
+                time.sleep(espera)
+
+
+def iniciar_worker(credenciais: Optional[Dict[str, str]] = None) -> None:
+    """Dispara `processar_fila` em um processo desacoplado, que sobrevive ao treino.
+
+    A saída vai para `worker.log` na pasta da fila. Sem `fcntl` (Windows), a
+    fila é processada no próprio processo.
+    """
+
+    token = (credenciais or {}).get("GITHUB_TOKEN")
+    if fcntl is None:
+        processar_fila(token)
+        return
+
+    _WORKERS[:] = [worker for worker in _WORKERS if worker.poll() is None]
+    fila = _fila_dir()
+    fila.mkdir(parents=True, exist_ok=True)
+    ambiente = dict(os.environ)
+    if token:
+        ambiente["GITHUB_TOKEN"] = token
+    with open(fila / "worker.log", "a", encoding="utf-8") as log:
+        _WORKERS.append(
+            subprocess.Popen(
+                [sys.executable, os.fspath(Path(__file__).resolve()), "processar", "--janela", str(JANELA_S)],
+                cwd=os.fspath(REPO_ROOT),
+                env=ambiente,
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,
+            )
+        )
+    print(f"[utils_git] Registro no git em segundo plano (log em {fila / 'worker.log'}).")
 
-    print(f"[utils_git] Experimento registrado e enviado: {exp_dir}")
+
+def versionar(
+    caminho: Path,
+    credenciais: Optional[Dict[str, str]] = None,
+    mensagem: str = "Add experiment results",
+    em_segundo_plano: bool = True,
+) -> None:
+    """Enfileira o commit de `caminho` e dispara o worker que faz commit e push.
+
+    Com `em_segundo_plano=False`, processa a fila antes de retornar.
+    """
+
+    enfileirar(caminho, mensagem)
+    if em_segundo_plano:
+        iniciar_worker(credenciais)
+    elif not processar_fila((credenciais or {}).get("GITHUB_TOKEN")):
+        raise RuntimeError("Falha no registro do experimento; rode `python src/utils_git.py flush`.")
+
+
+def registrar_experimento(
+    metrics_dict: Mapping[str, object],
+    figures_dict: Mapping[str, FigureLike],
+    credenciais: Optional[Dict[str, str]] = None,
+    recursos: Optional[Union[Path, str]] = None,
+    em_segundo_plano: bool = True,
+    historico: Optional[Union[Path, str]] = None,
+) -> Optional[Path]:
+    """Salva artefatos e enfileira o commit + push automático do experimento.
+
+    `historico` e `recursos` são os `.npz` do treino e do `monitor_recursos`;
+    eles são versionados junto do metrics.json. Os artefatos são gravados na
+    hora; o git roda em segundo plano (veja `versionar`).
+    """
+
+    experiments_dir = REPO_ROOT / "experiments"
+    experiments_dir.mkdir(parents=True, exist_ok=True)
+
+    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    exp_dir = experiments_dir / f"exp_{timestamp}"
+    exp_dir.mkdir(parents=True, exist_ok=False)
+
+    if not salvar_artefatos(exp_dir, metrics_dict, figures_dict, recursos, historico):
+        print("[utils_git] Nenhum artefato válido para registro.")
+        return None
+
+    versionar(exp_dir, credenciais, em_segundo_plano=em_segundo_plano)
     return exp_dir
 
 
-__all__ = ["registrar_experimento"]
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Fila de registro de experimentos no git")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    flush = comandos.add_parser("flush", help="Processa a fila e espera o push (uso em CI)")
+    flush.add_argument("--tentativas", type=int, default=TENTATIVAS_PUSH, help="Falhas seguidas antes de desistir")
+    flush.add_argument("--espera", type=float, default=ESPERA_PUSH_S, help="Espera inicial do backoff (s)")
+
+    processar = comandos.add_parser("processar", help="Worker em segundo plano (uso interno)")
+    processar.add_argument("--janela", type=float, default=JANELA_S, help="Espera para agrupar registros (s)")
+
+    comandos.add_parser("status", help="Mostra os pedidos pendentes")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    if args.comando == "status":
+        estado = pendencias()
+        print(f"[utils_git] {len(estado['pedidos'])} pedido(s) na fila; push pendente: {estado['push_pendente']}")
+        for caminho in estado["pedidos"]:
+            print(f"  {caminho}")
+        return
+    if args.comando == "processar":
+        processar_fila(janela_s=args.janela)
+        return
+    if not processar_fila(tentativas=args.tentativas, espera_s=args.espera):
+        raise SystemExit(1)
+    print("[utils_git] Fila vazia e nada aguardando push.")
+
+
+__all__ = [
+    "enfileirar",
+    "iniciar_worker",
+    "pendencias",
+    "processar_fila",
+    "registrar_experimento",
+    "salvar_artefatos",
+    "versionar",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""Configuração comum dos testes: os módulos de `src/` são importados como scripts."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
@@ -0,0 +1,20 @@
+"""Cache de predições com artefatos diferentes compartilhando a mesma instância."""
+
+import cache_predicoes
+
+
+def test_identidades_nao_se_misturam(tmp_path):
+    cache = cache_predicoes.CachePredicoes(capacidade=4, diretorio=tmp_path)
+    cache.guardar(b"exame", "modelo-a", 0.9)
+
+    assert cache.obter(b"exame", "modelo-a") == 0.9
+    assert cache.obter(b"exame", "modelo-b") is None
+
+    cache.guardar(b"exame", "modelo-b", 0.2)
+    assert cache.obter(b"exame", "modelo-a") == 0.9
+    assert cache.obter(b"exame", "modelo-b") == 0.2
+
+    # Uma instância nova (reinício do app) só tem a camada em disco
+    reiniciado = cache_predicoes.CachePredicoes(capacidade=4, diretorio=tmp_path)
+    assert reiniciado.obter(b"exame", "modelo-b") == 0.2
+    assert reiniciado.estatisticas()["acertos_disco"] == 1
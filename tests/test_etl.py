@@ -0,0 +1,118 @@
+"""ETL sobre um ZIP falso no formato do NIH Chest X-ray."""
+
+import io
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from PIL import Image
+
+import etl
+
+
+def _zip_falso(destino, imagens=24):
+    """ZIP com o Data_Entry_2017.csv e PNGs pequenos, metade de cada classe."""
+
+    destino.mkdir(parents=True, exist_ok=True)
+    linhas = ["Image Index,Finding Labels,Patient Age"]
+    with zipfile.ZipFile(destino / "dataset.zip", "w") as zip_ref:
+        for indice in range(imagens):
+            nome = f"{indice:08d}_000.png"
+            rotulo = "Cardiomegaly" if indice % 2 else "No Finding"
+            linhas.append(f"{nome},{rotulo},{40 + indice}")
+            pixels = np.random.default_rng(indice).integers(0, 255, (32, 32), dtype=np.uint8)
+            buffer = io.BytesIO()
+            Image.fromarray(pixels).save(buffer, format="PNG")
+            zip_ref.writestr(f"images_{indice % 2 + 1:03d}/images/{nome}", buffer.getvalue())
+        linhas.append("00000999_000.png,Effusion,50")
+        zip_ref.writestr(etl.CSV_NOME, "\n".join(linhas))
+    return destino / "dataset.zip"
+
+
+@pytest.fixture(autouse=True)
+def _cache_isolado(tmp_path, monkeypatch):
+    monkeypatch.setenv(etl.CACHE_DIR_ENV, str(tmp_path / "cache"))
+
+
+def _arquivos(data_dir):
+    return {
+        caminho.relative_to(data_dir).as_posix(): caminho.read_bytes()
+        for caminho in sorted(data_dir.rglob("*.png"))
+    }
+
+
+def test_streaming_igual_a_extracao_completa(tmp_path):
+    arquivo = _zip_falso(tmp_path / "cache_zip")
+    extraidos = tmp_path / "extraidos"
+    with zipfile.ZipFile(arquivo) as zip_ref:
+        zip_ref.extractall(extraidos)
+
+    completo, streaming = tmp_path / "completo", tmp_path / "streaming"
+    etl._preparar_splits(extraidos, completo, amostras_por_classe=8)
+    etl._preparar_splits(arquivo.parent, streaming, streaming=True, amostras_por_classe=8)
+
+    metadados = pd.read_csv(completo / etl.METADADOS_NOME)
+    pd.testing.assert_frame_equal(metadados, pd.read_csv(streaming / etl.METADADOS_NOME))
+    assert metadados.groupby("split")["classe"].value_counts().to_dict() == {
+        ("train", "cardiomegaly"): 6,
+        ("train", "normal"): 6,
+        ("validation", "cardiomegaly"): 2,
+        ("validation", "normal"): 2,
+    }
+    assert _arquivos(completo) == _arquivos(streaming)
+    assert len(_arquivos(streaming)) == 16
+
+
+class _KaggleFalso:
+    """Substituto local do `KaggleApi`: grava o ZIP falso e conta os downloads."""
+
+    def __init__(self):
+        self.downloads = 0
+
+    def dataset_download_files(self, dataset, path, force, unzip, quiet):
+        self.downloads += 1
+        _zip_falso(Path(path))
+
+
+def test_cache_quente_nao_baixa_nem_recalcula_hash(tmp_path, monkeypatch):
+    api = _KaggleFalso()
+    hashes = []
+    sha256 = etl._sha256
+    monkeypatch.setattr(etl, "_criar_api", lambda: api)
+    monkeypatch.setattr(etl, "_sha256", lambda caminho: hashes.append(caminho) or sha256(caminho))
+    monkeypatch.setattr(etl, "_preparar_splits", lambda *args, **kwargs: None)
+    monkeypatch.setattr(etl, "_imprimir_estatisticas", lambda data_dir: None)
+
+    etl.executar_etl(streaming=True)
+    assert (api.downloads, len(hashes)) == (1, 1)
+
+    etl.executar_etl(streaming=True)
+    assert (api.downloads, len(hashes)) == (1, 1)
+
+    etl.executar_etl(streaming=True, verificar_cache=True)
+    assert (api.downloads, len(hashes)) == (1, 2)
+
+
+def test_cache_quente_reaproveita_a_extracao(tmp_path, monkeypatch):
+    api = _KaggleFalso()
+    extracoes, origens = [], []
+    extrair = etl._extrair_arquivos
+    monkeypatch.setattr(etl, "_criar_api", lambda: api)
+    monkeypatch.setattr(etl, "_extrair_arquivos", lambda raiz: extracoes.append(raiz) or extrair(raiz))
+    monkeypatch.setattr(etl, "_preparar_splits", lambda downloads_dir, *args, **kwargs: origens.append(downloads_dir))
+    monkeypatch.setattr(etl, "_imprimir_estatisticas", lambda data_dir: None)
+
+    etl.executar_etl()
+    etl.executar_etl()
+
+    assert (api.downloads, len(extracoes)) == (1, 1)
+    assert origens[0] == origens[1]
+    assert len(list(origens[0].rglob("*.png"))) == 24
+
+
+@pytest.mark.parametrize("slug", ["dataset-sem-dono", "dono/", "a/b/c/d"])
+def test_slug_invalido(slug):
+    with pytest.raises(ValueError, match="Dataset inválido"):
+        etl._diretorio_cache(slug)
@@ -0,0 +1,21 @@
+"""Consultas ao índice SQLite de experimentos."""
+
+import pytest
+
+import indice_experimentos
+
+
+@pytest.mark.parametrize("chave", ["val_loss') --", 'x" FROM experimentos --', "a b"])
+def test_chaves_fora_do_formato_sao_rejeitadas(tmp_path, chave):
+    banco = tmp_path / "indice.sqlite"
+    with pytest.raises(ValueError):
+        indice_experimentos.consultar(metrica=chave, banco=banco)
+    with pytest.raises(ValueError):
+        indice_experimentos.consultar(colunas=["id", chave], banco=banco)
+
+
+def test_chaves_validas_consultam_params(tmp_path):
+    tabela = indice_experimentos.consultar(
+        metrica="learning_rate", colunas=["id", "params.model"], banco=tmp_path / "indice.sqlite"
+    )
+    assert list(tabela.columns) == ["id", "params.model", "learning_rate"]
@@ -0,0 +1,52 @@
+"""Retomada da inferência em lote."""
+
+import csv
+import json
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import predict_batch
+
+
+class _ModeloFalso:
+    def predict_on_batch(self, entrada):
+        return np.full((len(entrada), 1), 0.75, dtype="float32")
+
+
+def _imagens(pasta, quantidade=3):
+    pasta.mkdir()
+    for indice in range(quantidade):
+        Image.fromarray(np.full((16, 16), indice * 40, dtype=np.uint8)).save(pasta / f"img_{indice}.png")
+    (pasta / "a_quebrada.png").write_bytes(b"nao e png")
+    return predict_batch.listar_entradas(pasta)
+
+
+def _linhas(saida, formato):
+    with open(saida, encoding="utf-8", newline="") as arquivo:
+        if formato == "csv":
+            return list(csv.DictReader(arquivo))
+        return [json.loads(linha) for linha in arquivo]
+
+
+@pytest.mark.parametrize("formato", ["csv", "jsonl"])
+def test_retomada_refaz_erros_e_descarta_linha_truncada(tmp_path, formato):
+    caminhos = _imagens(tmp_path / "imagens")
+    saida = tmp_path / f"saida.{formato}"
+    predict_batch.predizer_lote(_ModeloFalso(), caminhos, saida, formato=formato, batch_size=2, workers=1)
+
+    # A imagem quebrada é consertada e a última linha fica pela metade, como num processo morto.
+    Image.fromarray(np.zeros((16, 16), dtype=np.uint8)).save(tmp_path / "imagens" / "a_quebrada.png", "PNG")
+    conteudo = saida.read_bytes()
+    saida.write_bytes(conteudo[: conteudo.rstrip(b"\r\n").rfind(b"\n") + 10])
+
+    resumo = predict_batch.predizer_lote(
+        _ModeloFalso(), caminhos, saida, formato=formato, batch_size=2, workers=1, retomar=True
+    )
+
+    assert (resumo["imagens"], resumo["erros"], resumo["ignoradas_retomada"]) == (2, 0, 2)
+    linhas = _linhas(saida, formato)
+    pontuadas = {linha["caminho"] for linha in linhas if linha["probabilidade"] not in (None, "")}
+    assert pontuadas == {str(caminho) for caminho in caminhos}
+    assert all(linha["caminho"] in {str(caminho) for caminho in caminhos} for linha in linhas)
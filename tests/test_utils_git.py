@@ -0,0 +1,69 @@
+"""Fila de registro de experimentos contra um remote bare local."""
+
+import json
+import subprocess
+
+import pytest
+
+import auth
+import utils_git
+
+
+def _git(*args, cwd):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def _repositorio(tmp_path, monkeypatch, com_remote=True):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    _git("init", "-q", "-b", "main", cwd=repo)
+    (repo / "README.md").write_text("teste\n", encoding="utf-8")
+    _git("add", "README.md", cwd=repo)
+    _git("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-q", "-m", "inicial", cwd=repo)
+    remote = tmp_path / "remote.git"
+    if com_remote:
+        _git("init", "-q", "--bare", str(remote), cwd=tmp_path)
+        _git("remote", "add", "origin", str(remote), cwd=repo)
+        _git("push", "-q", "origin", "main", cwd=repo)
+
+    monkeypatch.setattr(utils_git, "REPO_ROOT", repo)
+    monkeypatch.setenv(utils_git.FILA_ENV, str(tmp_path / "fila"))
+    for nome in ("exp_a", "exp_b"):
+        pasta = repo / "experiments" / nome
+        pasta.mkdir(parents=True)
+        (pasta / "metrics.json").write_text(json.dumps({"nome": nome}), encoding="utf-8")
+        utils_git.enfileirar(pasta, f"Add {nome}")
+    return repo, remote
+
+
+def test_processar_fila_envia_um_commit_ao_remote(tmp_path, monkeypatch):
+    repo, remote = _repositorio(tmp_path, monkeypatch)
+
+    assert utils_git.processar_fila(tentativas=1)
+
+    assert _git("rev-list", "--count", "main", cwd=remote) == "2"
+    arquivos = _git("show", "--name-only", "--format=", "main", cwd=remote).splitlines()
+    assert arquivos == ["experiments/exp_a/metrics.json", "experiments/exp_b/metrics.json"]
+    assert utils_git.pendencias() == {"pedidos": [], "push_pendente": False}
+
+
+def test_processar_fila_sem_remote_mantem_push_pendente(tmp_path, monkeypatch):
+    repo, _ = _repositorio(tmp_path, monkeypatch, com_remote=False)
+
+    assert not utils_git.processar_fila(tentativas=1)
+
+    assert _git("rev-list", "--count", "main", cwd=repo) == "2"
+    assert utils_git.pendencias() == {"pedidos": [], "push_pendente": True}
+
+
+def test_processar_fila_usa_o_token_do_env(tmp_path, monkeypatch):
+    _repositorio(tmp_path, monkeypatch)
+    monkeypatch.delenv("GITHUB_TOKEN", raising=False)
+    monkeypatch.setattr(auth, "_carregar_env", lambda: {"GITHUB_TOKEN": "token-do-env"})
+    monkeypatch.setattr(auth, "_prompt_interativo", lambda chave: pytest.fail("não deve perguntar"))
+    tokens = []
+    monkeypatch.setattr(utils_git, "_push", lambda token: tokens.append(token) or True)
+
+    assert utils_git.processar_fila(tentativas=1)
+
+    assert tokens == ["token-do-env"]